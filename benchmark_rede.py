@@ -0,0 +1,553 @@
+"""
+Benchmarks do simulador de rede.
+
+Uso:
+    python benchmark_rede.py caminhos [--hosts 10000] [--queries 2000]
+    python benchmark_rede.py encaminhamento [--hosts 100000] [--lookups 5000000]
+    python benchmark_rede.py memoria [--hosts 10000 100000]
+    python benchmark_rede.py eventos [--hosts 1000] [--flows 200] [--rate 1] [--duration 1.0]
+    python benchmark_rede.py paralelo [--hosts 1000] [--flows 200] [--duration 0.05] [--probes 10] [--max-workers N]
+    python benchmark_rede.py cenarios [--topologies 200] [--max-workers N]
+    python benchmark_rede.py carga [--hosts 100000] [--entries 10000000] [--uplinks 1]
+    python benchmark_rede.py trace [--hosts 100000] [--records 5000000]
+    python benchmark_rede.py suite [--sizes 10 1000 10000 100000] [--output resultados.json]
+                                   [--baseline benchmark_baseline.json] [--threshold 0.25] [--save-baseline]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import random
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+
+import networkx as nx
+import numpy as np
+
+import simulador_rede as sim
+
+
+def build_topology(num_hosts, fanout=(4, 16), uplinks=1):
+    """Hierarquia gerada por `generate_hierarchy` com pelo menos `num_hosts` hosts."""
+    num_edges = fanout[0] * fanout[1]
+    hosts_per_edge = -(-num_hosts // num_edges)
+    return sim.generate_hierarchy(fanout, hosts_per_edge, uplinks=uplinks)
+
+
+def timed(func, *args, repeat=1):
+    """Executa `func` e retorna (resultado, segundos por execução)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def bench_paths(num_hosts, num_queries, seed=0):
+    """Compara o índice LCA com nx.shortest_path para caminho, saltos e atraso."""
+    tree, _, _, _ = build_topology(num_hosts)
+    nodes = list(tree.nodes)
+    rng = random.Random(seed)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(num_queries)]
+
+    def networkx_queries():
+        for src, dst in pairs:
+            if nx.has_path(tree, src, dst):
+                path = nx.shortest_path(tree, src, dst)
+                hops = len(path) - 1
+                delay = 0
+                for u, v in zip(path, path[1:]):
+                    link = tree[u][v]
+                    delay += (8000 / sim.parse_bandwidth(link["bandwidth"])
+                              + sim.PROPAGATION_DELAY_MAP[link["connection_type"]]) * 1000
+
+    index, build_time = timed(lambda: sim.PathIndex(sim.CompactTopology.from_graph(tree)))
+
+    def index_queries():
+        for src, dst in pairs:
+            if index.has_path(src, dst):
+                index.path(src, dst)
+                index.hop_count(src, dst)
+                index.path_delay(src, dst)
+
+    src_ids = np.array([index.ids[src] for src, _ in pairs])
+    dst_ids = np.array([index.ids[dst] for _, dst in pairs])
+
+    def batch_queries():
+        lca = index.lca_ids(src_ids, dst_ids)
+        index.depth[src_ids] + index.depth[dst_ids] - 2 * index.depth[lca]
+        root_delay = index.root_delay(8000)
+        root_delay[src_ids] + root_delay[dst_ids] - 2 * root_delay[lca]
+
+    _, nx_time = timed(networkx_queries)
+    _, index_time = timed(index_queries)
+    _, batch_time = timed(batch_queries, repeat=10)
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: CONSULTAS DE CAMINHO ({tree.number_of_nodes()} nós, {num_queries} pares)")
+    print("=" * 60)
+    print(f"  Construção do índice:        {build_time * 1000:10.2f} ms")
+    print(f"  networkx (has_path + BFS):   {nx_time / num_queries * 1e6:10.2f} µs/consulta")
+    print(f"  PathIndex (escalar):         {index_time / num_queries * 1e6:10.2f} µs/consulta")
+    print(f"  PathIndex (lote vetorizado): {batch_time / num_queries * 1e6:10.2f} µs/consulta")
+    print(f"  Aceleração (escalar):        {nx_time / index_time:10.1f}x")
+    print("=" * 60 + "\n")
+
+
+def bench_forwarding(num_hosts, num_lookups, num_checks=2_000, seed=0):
+    """Vazão do lookup LPM em lote por roteador e conferência com o caminho mínimo."""
+    graph, ip_addresses, hosts, routing_table = build_topology(num_hosts)
+    tables, compile_time = timed(sim.compile_forwarding_tables, graph, ip_addresses, routing_table)
+
+    rng = np.random.default_rng(seed)
+    host_ips = np.array([sim.ip_to_int(ip_addresses[host]) for host in hosts], dtype=np.int64)
+    destinations = host_ips[rng.integers(0, len(host_ips), num_lookups)]
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: ENCAMINHAMENTO LPM ({len(hosts)} hosts, {num_lookups} destinos)")
+    print("=" * 60)
+    print(f"  Compilação das tabelas:      {compile_time * 1000:10.2f} ms")
+    for router in ["root", "a1", "e1"]:
+        _, lookup_time = timed(tables[router].lookup_many, destinations)
+        print(f"  {router:<6} ({len(tables[router]):>6} intervalos): "
+              f"{num_lookups / lookup_time / 1e6:10.2f} M lookups/s")
+
+    pairs = [(hosts[i], hosts[j]) for i, j in rng.integers(0, len(hosts), (num_checks, 2))]
+    sim.hosts = hosts
+    mismatches, verify_time = timed(sim.verify_forwarding, graph, ip_addresses, routing_table, pairs)
+    print(f"  Conferência ({num_checks} pares):  {len(mismatches)} divergências "
+          f"em {verify_time * 1000:.2f} ms")
+    print("=" * 60 + "\n")
+
+
+def retained_memory(build):
+    """Executa `build` e retorna (resultado, bytes ainda alocados por ele)."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def bench_memory(host_counts):
+    """Memória do networkx.Graph vs. CompactTopology para a mesma hierarquia."""
+    print("\n" + "=" * 72)
+    print("BENCHMARK: MEMÓRIA DA TOPOLOGIA (networkx.Graph vs. CompactTopology)")
+    print("=" * 72)
+    print(f"{'Hosts':>10} {'Enlaces':>10} {'networkx':>14} {'Compacta':>14} {'Redução':>10}")
+    print("-" * 72)
+    for num_hosts in host_counts:
+        graph, ip_addresses, _, _ = build_topology(num_hosts)
+
+        def copy_graph():
+            copy = nx.Graph()
+            copy.add_nodes_from(graph.nodes(data=True))
+            copy.add_edges_from(graph.edges(data=True))
+            return copy
+
+        _, graph_bytes = retained_memory(copy_graph)
+        _, compact_bytes = retained_memory(lambda: sim.CompactTopology.from_graph(graph, ip_addresses))
+        print(f"{num_hosts:>10} {graph.number_of_edges():>10} {graph_bytes / 2**20:>11.1f} MB "
+              f"{compact_bytes / 2**20:>11.1f} MB {graph_bytes / compact_bytes:>9.1f}x")
+    print("=" * 72 + "\n")
+
+
+def bench_events(num_hosts, num_flows, duration, rate_mbps=1.0, seed=0):
+    """
+    Vazão do simulador de eventos discretos com fluxos de `rate_mbps` cada.
+
+    A razão tempo virtual / real é a vazão dividida pelos eventos por segundo
+    virtual que a carga gera (um por pacote por salto), então só passa de 1
+    em cargas leves: o padrão (200 fluxos de 1 Mbps) roda mais rápido que o
+    tempo real, e 200 fluxos de 200 Mbps ficam dezenas de vezes mais lentos.
+    """
+    graph, _, hosts, _ = build_topology(num_hosts)
+    rng = random.Random(seed)
+    simulator = sim.EventSimulator(graph, seed=seed)
+    for _ in range(num_flows):
+        simulator.add_flow(rng.choice(hosts), rng.choice(hosts), rate_bps=rate_mbps * 1e6, stop=duration)
+    for _ in range(10):
+        simulator.add_probe(rng.choice(hosts), rng.choice(hosts), num_samples=10, interval=duration / 10)
+
+    results, wall_time = timed(simulator.run)
+    busiest = max(results["links"], key=lambda link: link["utilization"])
+    probe_rtts = [probe["rtt_mean"] for probe in results["probes"] if probe["rtt_mean"] is not None]
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: EVENTOS DISCRETOS ({len(hosts)} hosts, {num_flows} fluxos de {rate_mbps:g} Mbps)")
+    print("=" * 60)
+    print(f"  Eventos processados:         {results['events']:>10}")
+    print(f"  Vazão:                       {results['events'] / wall_time / 1e6:10.2f} M eventos/s")
+    print(f"  Carga:                       {results['events'] / results['time_s'] / 1e6:10.2f} M eventos/s virtual")
+    print(f"  Tempo virtual / real:        {results['time_s'] / wall_time:10.4f}")
+    print(f"  Enlace mais carregado:       {busiest['from']} → {busiest['to']} "
+          f"({busiest['utilization'] * 100:.1f}%)")
+    print(f"  RTT médio das sondas:        {sum(probe_rtts) / len(probe_rtts):10.4f} ms")
+    print("=" * 60 + "\n")
+
+
+def bench_sharded(num_hosts, num_flows, duration, max_workers, num_probes=10, seed=0):
+    """Simulação por subárvore de agregação com 1 até `max_workers` processos vs. o `EventSimulator`."""
+    graph, _, hosts, _ = build_topology(num_hosts)
+
+    def simulate(simulator):
+        rng = random.Random(seed)
+        for _ in range(num_flows):
+            simulator.add_flow(rng.choice(hosts), rng.choice(hosts), rate_bps=200e6, stop=duration)
+        for _ in range(num_probes):
+            simulator.add_probe(rng.choice(hosts), rng.choice(hosts), num_samples=10, interval=duration / 10)
+        cpu = time.process_time()
+        results, wall_time = timed(simulator.run)
+        return results, wall_time, time.process_time() - cpu
+
+    reference, baseline, baseline_cpu = simulate(sim.EventSimulator(graph, seed=seed))
+
+    print("\n" + "=" * 78)
+    print(f"BENCHMARK: SIMULAÇÃO POR SUBÁRVORE ({len(hosts)} hosts, {num_flows} fluxos, {num_probes} sondas)")
+    print("=" * 78)
+    print(f"{'Workers':>8} {'Tempo':>12} {'Rodadas':>9} {'Aceleração':>12} {'Cam. crítico':>14} "
+          f"{'Estimada':>10} {'Idêntico':>9}")
+    print("-" * 78)
+    print(f"{'sequen.':>8} {baseline:>10.2f} s {'-':>9} {1:>11.2f}x {baseline_cpu:>12.2f} s {1:>9.2f}x {'-':>9}")
+    worker_counts = sorted({1, max_workers} | {2 ** k for k in range(max_workers.bit_length()) if 2 ** k <= max_workers})
+    for workers in worker_counts:
+        simulator = sim.ShardedSimulator(graph, seed=seed, workers=workers)
+        results, wall_time, _ = simulate(simulator)
+        critical = simulator.critical_path_s
+        print(f"{workers:>8} {wall_time:>10.2f} s {simulator.rounds:>9} {baseline / wall_time:>11.2f}x "
+              f"{critical:>12.2f} s {baseline_cpu / critical:>9.2f}x {'sim' if results == reference else 'NÃO':>9}")
+    print("-" * 78)
+    print(f"  Eventos processados:         {reference['events']:>10}")
+    print(f"  Núcleos disponíveis:         {os.cpu_count() or 1:>10}")
+    print("  Aceleração: tempo do EventSimulator / tempo do ShardedSimulator (parede)")
+    print("  Estimada: com um núcleo por grupo (CPU do EventSimulator / caminho crítico)")
+    print("=" * 78 + "\n")
+
+
+def bench_scenarios(num_topologies, max_workers, seed=0):
+    """Escalabilidade da varredura de cenários de 1 até `max_workers` processos."""
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: VARREDURA DE CENÁRIOS ({num_topologies} topologias)")
+    print("=" * 60)
+    print(f"{'Workers':>8} {'Tempo':>12} {'Topologias/s':>14} {'Aceleração':>12}")
+    print("-" * 60)
+    worker_counts = sorted({1, max_workers} | {2 ** k for k in range(max_workers.bit_length()) if 2 ** k <= max_workers})
+    baseline = None
+    for workers in worker_counts:
+        def sweep():
+            for update in sim.scenario_sweep(num_topologies, seed=seed, workers=workers):
+                pass
+            return update["distributions"]
+        distributions, wall_time = timed(sweep)
+        baseline = baseline or wall_time
+        print(f"{workers:>8} {wall_time:>10.2f} s {num_topologies / wall_time:>14.1f} {baseline / wall_time:>11.2f}x")
+    print("-" * 60)
+    print(f"  Misturas de meios distintas: {len(distributions)}")
+    print("=" * 60 + "\n")
+
+
+def directed_loads(graph, loads):
+    """Carga por sentido de enlace, {(origem, destino): bits/s}, a partir do resultado de `link_loads`."""
+    index = sim.get_path_index(graph)
+    names = index.nodes
+    result = {}
+    for child in np.flatnonzero(index.parent >= 0).tolist():
+        parent = names[int(index.parent[child])]
+        result[(names[child], parent)] = loads["up"][child]
+        result[(parent, names[child])] = loads["down"][child]
+    for edge, up, down in zip(loads.get("extra_edges", []), loads.get("extra_up", []), loads.get("extra_down", [])):
+        lower, upper = (names[end] for end in sim._link_ends(index, int(edge)))
+        result[(lower, upper)] = up
+        result[(upper, lower)] = down
+    return {link: load for link, load in result.items() if load}
+
+
+def path_loads(graph, hosts, src, dst, demand):
+    """Carga por sentido de enlace somando cada demanda no caminho do seu fluxo (`PathIndex.path`)."""
+    index = sim.get_path_index(graph)
+    result = {}
+    for s, d, amount in zip(src.tolist(), dst.tolist(), demand.tolist()):
+        path = index.path(hosts[s], hosts[d])
+        for link in zip(path, path[1:]):
+            result[link] = result.get(link, 0.0) + amount
+    return result
+
+
+def bench_loads(num_hosts, num_entries, chunk_size=1_000_000, uplinks=1, num_checks=20_000, seed=0):
+    """Carga dos enlaces para uma matriz de tráfego esparsa entregue em lotes, conferida com os caminhos por fluxo."""
+    graph, _, hosts, _ = build_topology(num_hosts, uplinks=uplinks)
+    sim.get_path_index(graph)
+    rng = np.random.default_rng(seed)
+
+    def traffic():
+        for start in range(0, num_entries, chunk_size):
+            size = min(chunk_size, num_entries - start)
+            yield rng.integers(0, len(hosts), size), rng.integers(0, len(hosts), size), rng.random(size) * 1e4
+
+    loads, load_time = timed(sim.link_loads, graph, traffic(), hosts)
+    report, report_time = timed(sim.link_utilization, graph, loads)
+
+    # Conferência: as cargas de uma amostra batem com a soma pelos caminhos de cada fluxo (ECMP, se houver)
+    src, dst = rng.integers(0, len(hosts), (2, num_checks))
+    demand = rng.random(num_checks) * 1e4
+    expected = path_loads(graph, hosts, src, dst, demand)
+    computed = directed_loads(graph, sim.link_loads(graph, [(src, dst, demand)], hosts))
+    mismatches = sum(not np.isclose(computed.get(link, 0.0), expected.get(link, 0.0))
+                     for link in computed.keys() | expected.keys())
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: CARGA DOS ENLACES ({len(hosts)} hosts, {num_entries} demandas, {uplinks} uplink(s))")
+    print("=" * 60)
+    print(f"  Cargas (lotes de {chunk_size}):  {load_time:10.2f} s")
+    print(f"  Vazão:                       {num_entries / load_time / 1e6:10.2f} M demandas/s")
+    print(f"  Relatório de utilização:     {report_time * 1000:10.2f} ms")
+    busiest = report["bottlenecks"][0]
+    print(f"  Enlace mais carregado:       {busiest['from']} → {busiest['to']} "
+          f"({busiest['utilization'] * 100:.1f}%)")
+    print(f"  Conferência ({num_checks} demandas): {mismatches} divergências com os caminhos por fluxo")
+    print("=" * 60 + "\n")
+
+
+def bench_replay(num_hosts, num_records, chunk_size=1_000_000, seed=0):
+    """Reprodução de um trace CSV sintético (uniforme entre os hosts, 60 s)."""
+    graph, ip_addresses, hosts, _ = build_topology(num_hosts)
+    sim.get_path_index(graph)
+    rng = np.random.default_rng(seed)
+    host_ips = np.array([ip_addresses[host] for host in hosts])
+
+    with tempfile.TemporaryDirectory() as directory:
+        trace = os.path.join(directory, "trace.csv")
+        with open(trace, "w") as f:
+            f.write("timestamp,src,dst,bytes\n")
+            for start in range(0, num_records, chunk_size):
+                size = min(chunk_size, num_records - start)
+                times = (start + np.arange(size)) * 60.0 / num_records
+                src = host_ips[rng.integers(0, len(hosts), size)]
+                dst = host_ips[rng.integers(0, len(hosts), size)]
+                sizes = rng.integers(40, 1500, size)
+                f.write("".join(f"{t:.6f},{a},{b},{n}\n" for t, a, b, n in
+                                zip(times.tolist(), src.tolist(), dst.tolist(), sizes.tolist())))
+        trace_size = os.path.getsize(trace)
+        _, parse_time = timed(lambda: sum(len(chunk[0]) for chunk in sim.read_trace(trace)))
+        report, replay_time = timed(sim.replay_trace, graph, trace, None, 1.0, ip_addresses)
+
+    print("\n" + "=" * 60)
+    print(f"BENCHMARK: REPRODUÇÃO DE TRACE ({len(hosts)} hosts, {num_records} registros)")
+    print("=" * 60)
+    print(f"  Trace CSV:                   {trace_size / 2 ** 20:10.1f} MB")
+    print(f"  Reprodução:                  {replay_time:10.2f} s")
+    print(f"  Vazão:                       {num_records / replay_time / 1e6:10.2f} M registros/s")
+    print(f"  Só a leitura do CSV:         {num_records / parse_time / 1e6:10.2f} M registros/s")
+    print(f"  Sem a leitura:               {num_records / (replay_time - parse_time) / 1e6:10.2f} M registros/s")
+    print(f"  Fluxos distintos:            {report['flows']['count']:10d}")
+    print(f"  Intervalos de 1 s:           {len(report['intervals']):10d}")
+    print("=" * 60 + "\n")
+
+
+def measure(func, min_time=0.2, max_repeat=50):
+    """Melhor tempo (s) de uma chamada de `func`, repetindo até somar `min_time` ou `max_repeat` execuções."""
+    best = float('inf')
+    total = 0.0
+    for _ in range(max_repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total >= min_time:
+            break
+    return best
+
+
+def suite_config(num_hosts):
+    """Configuração padrão (10 hosts) ou hierarquia gerada com ao menos `num_hosts` hosts."""
+    if num_hosts <= 10:
+        return sim.default_config()
+    fanout = (4, 16) if num_hosts >= 1_000 else (2, 2)
+    return {"hierarchy": {"fanout": list(fanout), "hosts_per_edge": -(-num_hosts // (fanout[0] * fanout[1]))}}
+
+
+def run_suite(sizes, num_pairs=200, seed=0):
+    """Tempos (s por chamada) das operações principais do simulador para cada tamanho de rede."""
+    results = {}
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    with devnull, tempfile.TemporaryDirectory() as workdir:
+        results["setup_network_random"] = measure(lambda: sim.setup_network_random(random.Random(seed)))
+        for num_hosts in sizes:
+            config = suite_config(num_hosts)
+            results[f"setup_network_from_config[{num_hosts}]"] = measure(
+                lambda: sim.setup_network_from_config(config), max_repeat=5)
+            graph, ip_addresses, hosts, routing_table = sim.setup_network_from_config(config)
+            sim.ip_addresses, sim.hosts = ip_addresses, hosts
+
+            results[f"path_index_build[{num_hosts}]"] = measure(
+                lambda: sim.PathIndex(sim.CompactTopology.from_graph(graph)), max_repeat=5)
+            sim.get_path_index(graph)  # consultas medidas com o índice já em cache
+            rng = random.Random(seed)
+            pairs = [(rng.choice(hosts), rng.choice(hosts)) for _ in range(num_pairs)]
+
+            def latencies():
+                for src, dst in pairs:
+                    sim.get_path_latency(graph, src, dst)
+            results[f"get_path_latency[{num_hosts}]"] = measure(latencies) / num_pairs
+
+            src, dst = pairs[0]
+
+            def uncached_probe():
+                # Sem o cache de rotas, cada medição resolve o caminho de novo
+                sim.route_cache.clear()
+                sim.xprobe_rtt(graph, src, dst, sample_interval=0)
+            with contextlib.redirect_stdout(devnull):
+                results[f"xprobe_rtt[{num_hosts}]"] = measure(uncached_probe)
+                sim.xprobe_rtt(graph, src, dst, sample_interval=0)
+                results[f"xprobe_rtt_cached[{num_hosts}]"] = measure(
+                    lambda: sim.xprobe_rtt(graph, src, dst, sample_interval=0))
+                results[f"display_link_capacities[{num_hosts}]"] = measure(
+                    lambda: sim.display_link_capacities(graph), max_repeat=5)
+                results[f"display_connection_types[{num_hosts}]"] = measure(
+                    lambda: sim.display_connection_types(graph), max_repeat=5)
+                results[f"display_routing_tables[{num_hosts}]"] = measure(
+                    lambda: sim.display_routing_tables(routing_table), max_repeat=5)
+
+            image = os.path.join(workdir, "topologia.png")
+            sim.plot_graph(graph, image)  # primeira chamada monta o layout em cache
+            results[f"plot_graph[{num_hosts}]"] = measure(lambda: sim.plot_graph(graph, image), max_repeat=3)
+    return results
+
+
+def compare_results(results, baseline, threshold, noise_floor=0.001):
+    """
+    Compara os tempos com a linha de base. Uma operação regride quando fica
+    mais de `threshold` (fração) mais lenta e a diferença passa de
+    `noise_floor` segundos. Retorna a lista de regressões.
+    """
+    regressions = []
+    print(f"{'Operação':<44} {'Base':>11} {'Atual':>11} {'Variação':>10}")
+    print("-" * 80)
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<44} {'—':>11} {current * 1000:>8.3f} ms {'nova':>10}")
+            continue
+        change = current / reference - 1 if reference else 0.0
+        regressed = change > threshold and current - reference > noise_floor
+        mark = " ✗" if regressed else ""
+        print(f"{name:<44} {reference * 1000:>8.3f} ms {current * 1000:>8.3f} ms {change * 100:>+9.1f}%{mark}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def bench_suite(sizes, output, baseline_file, threshold, save_baseline):
+    """Roda a suíte, grava os resultados em JSON e compara com a linha de base. Retorna o código de saída."""
+    results = run_suite(sizes)
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "sizes": sizes},
+        "results": results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("\n" + "=" * 80)
+    print(f"BENCHMARK: SUÍTE ({', '.join(str(size) for size in sizes)} hosts)")
+    print("=" * 80)
+    if save_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ Linha de base gravada em '{baseline_file}'.")
+
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get("results", {})
+    else:
+        print(f"⚠ Linha de base '{baseline_file}' não encontrada; use --save-baseline para criá-la.")
+    regressions = compare_results(results, baseline, threshold)
+    print("=" * 80)
+    print(f"Resultados gravados em '{output}'.")
+    if regressions:
+        print(f"✗ {len(regressions)} regressão(ões) acima de {threshold * 100:.0f}%: {', '.join(regressions)}")
+        return 1
+    print("✓ Nenhuma regressão.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do simulador de rede")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    paths_parser = subparsers.add_parser("caminhos", help="Índice LCA vs. networkx")
+    paths_parser.add_argument("--hosts", type=int, default=10_000)
+    paths_parser.add_argument("--queries", type=int, default=2_000)
+
+    forwarding_parser = subparsers.add_parser("encaminhamento", help="Vazão do lookup LPM")
+    forwarding_parser.add_argument("--hosts", type=int, default=100_000)
+    forwarding_parser.add_argument("--lookups", type=int, default=5_000_000)
+
+    memory_parser = subparsers.add_parser("memoria", help="Memória do Graph vs. topologia compacta")
+    memory_parser.add_argument("--hosts", type=int, nargs="+", default=[10_000, 100_000])
+
+    events_parser = subparsers.add_parser("eventos", help="Vazão do simulador de eventos discretos")
+    events_parser.add_argument("--hosts", type=int, default=1_000)
+    events_parser.add_argument("--flows", type=int, default=200)
+    events_parser.add_argument("--rate", type=float, default=1.0, help="Taxa de cada fluxo (Mbps)")
+    events_parser.add_argument("--duration", type=float, default=1.0)
+
+    sharded_parser = subparsers.add_parser("paralelo", help="Simulação de eventos repartida por subárvore")
+    sharded_parser.add_argument("--hosts", type=int, default=1_000)
+    sharded_parser.add_argument("--flows", type=int, default=200)
+    sharded_parser.add_argument("--duration", type=float, default=0.05)
+    sharded_parser.add_argument("--probes", type=int, default=10)
+    sharded_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    scenarios_parser = subparsers.add_parser("cenarios", help="Escalabilidade da varredura multiprocesso")
+    scenarios_parser.add_argument("--topologies", type=int, default=200)
+    scenarios_parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    loads_parser = subparsers.add_parser("carga", help="Carga dos enlaces por matriz de tráfego esparsa")
+    loads_parser.add_argument("--hosts", type=int, default=100_000)
+    loads_parser.add_argument("--entries", type=int, default=10_000_000)
+    loads_parser.add_argument("--uplinks", type=int, default=1, help="uplinks por switch (2 = bordas dual-homed, ECMP)")
+
+    replay_parser = subparsers.add_parser("trace", help="Vazão da reprodução de traces de tráfego")
+    replay_parser.add_argument("--hosts", type=int, default=100_000)
+    replay_parser.add_argument("--records", type=int, default=5_000_000)
+
+    suite_parser = subparsers.add_parser("suite", help="Suíte completa com JSON e comparação com linha de base")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    suite_parser.add_argument("--output", default="benchmark_resultados.json")
+    suite_parser.add_argument("--baseline", default="benchmark_baseline.json")
+    suite_parser.add_argument("--threshold", type=float, default=0.25,
+                              help="fração de aumento de tempo considerada regressão (padrão 0.25 = 25%%)")
+    suite_parser.add_argument("--save-baseline", action="store_true",
+                              help="grava os resultados desta execução como nova linha de base")
+
+    args = parser.parse_args()
+    if args.benchmark == "caminhos":
+        bench_paths(args.hosts, args.queries)
+    elif args.benchmark == "encaminhamento":
+        bench_forwarding(args.hosts, args.lookups)
+    elif args.benchmark == "memoria":
+        bench_memory(args.hosts)
+    elif args.benchmark == "eventos":
+        bench_events(args.hosts, args.flows, args.duration, args.rate)
+    elif args.benchmark == "paralelo":
+        bench_sharded(args.hosts, args.flows, args.duration, args.max_workers, args.probes)
+    elif args.benchmark == "cenarios":
+        bench_scenarios(args.topologies, args.max_workers)
+    elif args.benchmark == "carga":
+        bench_loads(args.hosts, args.entries, uplinks=args.uplinks)
+    elif args.benchmark == "trace":
+        bench_replay(args.hosts, args.records)
+    elif args.benchmark == "suite":
+        return bench_suite(args.sizes, args.output, args.baseline, args.threshold, args.save_baseline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
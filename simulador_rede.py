@@ -1,41 +1,160 @@
 import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+import numpy as np
 import time
+import asyncio
+import heapq
+import math
 import random
 import json
 import os
+import sys
+import argparse
+import concurrent.futures
+import atexit
+import contextlib
+import csv
+import functools
+import hashlib
+import io
+import urllib.parse
+import warnings
+import zlib
+
+# --- Métricas e Instrumentação (desligadas por padrão) ---
+
+# Limites superiores (s) das faixas dos histogramas de tempo
+METRIC_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+
+class Metrics:
+    """
+    Registro de contadores e histogramas de tempo das operações do simulador.
+
+    Desligado, cada ponto instrumentado custa só a leitura de `enabled`.
+    Ligado (`enable_metrics`), acumula por operação a contagem, o tempo total,
+    o máximo e as faixas de METRIC_BUCKETS, e exporta em formato texto do
+    Prometheus (`to_prometheus`) ou como resumo JSON (`summary`).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.timings = {}
+
+    def count(self, event, value=1):
+        self.counters[event] = self.counters.get(event, 0) + value
+
+    def observe(self, operation, seconds):
+        timing = self.timings.get(operation)
+        if timing is None:
+            timing = self.timings[operation] = {"count": 0, "sum": 0.0, "max": 0.0,
+                                                "buckets": [0] * len(METRIC_BUCKETS)}
+        timing["count"] += 1
+        timing["sum"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+        for i, bound in enumerate(METRIC_BUCKETS):
+            if seconds <= bound:
+                timing["buckets"][i] += 1
+                break
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+
+    def summary(self):
+        """Resumo JSON: contadores e, por operação, contagem, total, média, máximo e faixas."""
+        return {
+            "counters": dict(self.counters),
+            "timings": {
+                operation: {"count": timing["count"], "total_s": timing["sum"],
+                            "mean_s": timing["sum"] / timing["count"], "max_s": timing["max"],
+                            "buckets": dict(zip((f"{bound:g}" for bound in METRIC_BUCKETS), timing["buckets"]))}
+                for operation, timing in self.timings.items()
+            },
+        }
+
+    def to_prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus."""
+        lines = ["# HELP xprobe_operation_seconds Duração das operações instrumentadas do simulador.",
+                 "# TYPE xprobe_operation_seconds histogram"]
+        for operation, timing in sorted(self.timings.items()):
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS, timing["buckets"]):
+                cumulative += count
+                lines.append(f'xprobe_operation_seconds_bucket{{operation="{operation}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'xprobe_operation_seconds_bucket{{operation="{operation}",le="+Inf"}} {timing["count"]}')
+            lines.append(f'xprobe_operation_seconds_sum{{operation="{operation}"}} {timing["sum"]!r}')
+            lines.append(f'xprobe_operation_seconds_count{{operation="{operation}"}} {timing["count"]}')
+        lines += ["# HELP xprobe_events_total Eventos contados pelo simulador.",
+                  "# TYPE xprobe_events_total counter"]
+        for event, value in sorted(self.counters.items()):
+            lines.append(f'xprobe_events_total{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename):
+        """Grava as métricas em JSON (sufixo .json) ou no formato texto do Prometheus."""
+        with open(filename, 'w', encoding='utf-8') as f:
+            if filename.endswith(".json"):
+                json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+            else:
+                f.write(self.to_prometheus())
+
+
+metrics = Metrics()
+
+
+def enable_metrics(output=None):
+    """Liga a instrumentação; com `output`, grava as métricas nesse arquivo ao sair do programa."""
+    metrics.enabled = True
+    if output:
+        atexit.register(metrics.write, output)
+
+
+def instrumented(operation):
+    """Decorador que registra a duração de cada chamada em `metrics` quando ligado."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(operation, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
 
 # --- Funções Auxiliares ---
 
-def generate_ips(subnet, num_hosts, prefix):
-    base_ip_parts = subnet.split('/')[0].split('.')
-    return {
-        f"H{prefix}{i + 1}": f"{base_ip_parts[0]}.{base_ip_parts[1]}.{base_ip_parts[2]}.{int(base_ip_parts[3]) + i + 1}"
-        for i in range(num_hosts)}
+def generate_ips(subnet, num_hosts, prefix, reserved=()):
+    """Nomes e IPs dos hosts de uma sub-rede (H{prefix}1, H{prefix}2, ...), alocados por `allocate_hosts`."""
+    ips = format_ips(allocate_hosts(subnet, num_hosts, reserved)).tolist()
+    return {f"H{prefix}{i}": ip for i, ip in enumerate(ips, start=1)}
 
 
-def create_default_config():
-    """Cria/sobrescreve o arquivo de configuração com valores padrão."""
-    config = {
+def default_config():
+    """Configuração padrão da rede (4 sub-redes, 10 hosts), sem gravar arquivo."""
+    return {
         "subnets": {
             "e1": {
-                "subnet": "192.168.1.0/28",
+                "subnet": "192.168.1.0/27",
                 "num_hosts": 2,
                 "switch_ip": "192.168.1.30"
             },
             "e2": {
-                "subnet": "192.168.1.32/28",
+                "subnet": "192.168.1.32/27",
                 "num_hosts": 2,
                 "switch_ip": "192.168.1.62"
             },
             "e3": {
-                "subnet": "192.168.1.64/27",
+                "subnet": "192.168.1.64/28",
                 "num_hosts": 3,
                 "switch_ip": "192.168.1.78"
             },
             "e4": {
-                "subnet": "192.168.1.80/27",
+                "subnet": "192.168.1.80/28",
                 "num_hosts": 3,
                 "switch_ip": "192.168.1.94"
             }
@@ -59,6 +178,11 @@ def create_default_config():
         }
     }
 
+
+def create_default_config():
+    """Cria/sobrescreve o arquivo de configuração com valores padrão."""
+    config = default_config()
+
     file_exists = os.path.exists('network_config.json')
 
     with open('network_config.json', 'w', encoding='utf-8') as f:
@@ -87,180 +211,492 @@ def load_network_config(filename='network_config.json'):
         print(f"✗ Erro ao ler '{filename}'. Usando configuração padrão.")
         return create_default_config()
 
-def assign_connection_types(graph, hosts):
+def host_name(edge_number, host_number, separator=""):
+    """Nome do host: H{borda}{host} (ex.: H11) ou H{borda}_{host} em redes grandes."""
+    return f"H{edge_number}{separator}{host_number}"
+
+
+def _host_separator(num_edges, max_hosts):
+    # "H111" seria ambíguo (e1/host 11 ou e11/host 1) com mais de 9 bordas ou hosts
+    return "" if num_edges <= 9 and max_hosts <= 9 else "_"
+
+
+BANDWIDTH_UNITS = {"bps": 1, "kbps": 1e3, "mbps": 1e6, "gbps": 1e9, "tbps": 1e12}
+
+
+def parse_bandwidth(text):
+    """Converte uma largura de banda como "10 Gbps" em bits/s (nan se inválida)."""
+    value, _, unit = str(text).strip().partition(' ')
+    try:
+        return float(value) * BANDWIDTH_UNITS[unit.strip().lower() or "bps"]
+    except (ValueError, KeyError):
+        return float('nan')
+
+
+def _format_ip(value):
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+
+def ip_to_int(ip):
+    """Converte um IPv4 em notação decimal pontuada para inteiro."""
+    a, b, c, d = (int(part) for part in ip.split('.'))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def parse_prefix(prefix):
+    """Converte 'a.b.c.d/len' no intervalo inteiro (início, fim, comprimento) da rede."""
+    network, _, length = prefix.partition('/')
+    length = int(length) if length else 32
+    mask = ((1 << 32) - 1) ^ ((1 << (32 - length)) - 1)
+    start = ip_to_int(network) & mask
+    return start, start + (1 << (32 - length)) - 1, length
+
+
+_OCTETS = np.array([str(octet) for octet in range(256)])
+
+
+def format_ips(values):
+    """Converte um array de IPs inteiros em strings "a.b.c.d" de uma vez (array NumPy)."""
+    values = np.asarray(values, dtype=np.uint32)
+    text = _OCTETS[values >> 24]
+    for shift in (16, 8, 0):
+        text = np.char.add(np.char.add(text, "."), _OCTETS[(values >> shift) & 255])
+    return text
+
+
+def allocate_hosts(subnet, num_hosts, reserved=()):
+    """
+    Aloca em bloco `num_hosts` endereços consecutivos a partir do primeiro
+    endereço utilizável de `subnet` e os retorna como array uint32.
+
+    Gera ValueError se a sub-rede não comporta os hosts (rede e broadcast não
+    são utilizáveis) ou se um endereço de `reserved`, como o IP do switch,
+    cair dentro do bloco alocado.
+    """
+    start, end, _ = parse_prefix(subnet)
+    capacity = max(end - start - 1, 0)
+    if num_hosts > capacity:
+        raise ValueError(f"A sub-rede {subnet} comporta {capacity} hosts, não {num_hosts}")
+    for ip in reserved:
+        if start < ip_to_int(ip) <= start + num_hosts:
+            raise ValueError(f"O endereço {ip} já está reservado e conflita com os hosts de {subnet}")
+    return np.arange(start + 1, start + 1 + num_hosts, dtype=np.uint32)
+
+
+def allocate_subnets(base_network, block_addresses):
+    """
+    Reparte `base_network` em blocos CIDR consecutivos, o i-ésimo com ao menos
+    `block_addresses[i]` endereços (arredondado para potência de 2 e alinhado).
+
+    Retorna (início de cada bloco como uint32, comprimento do prefixo de cada
+    bloco). Gera ValueError se os blocos não couberem na rede.
+    """
+    start, end, _ = parse_prefix(base_network)
+    counts = np.maximum(np.asarray(block_addresses, dtype=np.int64), 1)
+    bits = np.maximum(2, np.ceil(np.log2(counts))).astype(np.int64)
+
+    # Blocos seguidos do mesmo tamanho são posicionados de uma vez
+    starts = np.empty(len(bits), dtype=np.int64)
+    cursor = start
+    runs = np.flatnonzero(np.diff(bits)) + 1
+    for lo, hi in zip([0, *runs.tolist()], [*runs.tolist(), len(bits)]):
+        size = 1 << int(bits[lo])
+        cursor = -(-cursor // size) * size
+        starts[lo:hi] = cursor + np.arange(hi - lo, dtype=np.int64) * size
+        cursor += (hi - lo) * size
+    if cursor > end + 1:
+        raise ValueError(f"A rede {base_network} não comporta {len(bits)} blocos com "
+                         f"{int(counts.sum())} endereços")
+    return starts.astype(np.uint32), 32 - bits
+
+
+class SubnetIndex:
+    """
+    Índice de intervalos das sub-redes (nome → prefixo CIDR), ordenado pelo
+    início de cada rede. Acha sobreposições em uma única passada e resolve a
+    sub-rede de um lote de IPs por busca binária.
+    """
+
+    def __init__(self, subnets):
+        names = list(subnets)
+        ranges = np.array([parse_prefix(subnets[name])[:2] for name in names], dtype=np.int64).reshape(-1, 2)
+        order = np.argsort(ranges[:, 0], kind='stable')
+        self.names = [names[i] for i in order.tolist()]
+        self.starts = ranges[order, 0]
+        self.ends = ranges[order, 1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def overlaps(self):
+        """Pares (sub-rede anterior, sub-rede sobreposta a ela), pela ordem de início."""
+        if not len(self):
+            return []
+        # Quem tem o maior fim até cada posição cobre qualquer rede que comece antes desse fim
+        reach = np.maximum.accumulate(self.ends)
+        owner = np.maximum.accumulate(np.where(self.ends == reach, np.arange(len(self)), 0))
+        clashes = np.flatnonzero(self.starts[1:] <= reach[:-1]) + 1
+        return [(self.names[owner[i - 1]], self.names[i]) for i in clashes.tolist()]
+
+    def lookup_many(self, ips):
+        """Posição em `names` da sub-rede de cada IP inteiro (-1 se fora de todas)."""
+        ips = np.asarray(ips, dtype=np.int64)
+        positions = np.searchsorted(self.starts, ips, side='right') - 1
+        inside = (positions >= 0) & (ips <= self.ends[np.maximum(positions, 0)])
+        return np.where(inside, positions, -1)
+
+
+def check_subnets(subnets):
+    """Gera ValueError se alguma sub-rede de config['subnets'] se sobrepõe a outra."""
+    index = SubnetIndex({switch: subnet_config['subnet'] for switch, subnet_config in subnets.items()})
+    overlaps = index.overlaps()
+    if overlaps:
+        pairs = ", ".join(f"{a} ({subnets[a]['subnet']}) e {b} ({subnets[b]['subnet']})" for a, b in overlaps)
+        raise ValueError(f"Sub-redes sobrepostas: {pairs}")
+
+
+def build_routing_tables(parents, edge_subnets, extra_parents=None):
+    """
+    Monta as tabelas de roteamento a partir das referências explícitas de pai.
+
+    Cada switch acima de uma borda recebe a sub-rede dessa borda com o filho
+    em direção a ela como próximo salto. `extra_parents` lista os uplinks
+    redundantes de cada nó: esses switches também anunciam as sub-redes do
+    filho (um roteador que já conhece a sub-rede por um caminho mais curto
+    mantém a rota que tinha), e o filho aprende as sub-redes que cada um
+    dos seus uplinks alcança descendo, em vez de subir pela rota padrão.
+    Custo linear no total de entradas.
+    """
+    extra_parents = extra_parents or {}
+    routing_table = {}
+    # Sobe uma camada por vez, para que as tabelas fiquem da borda para o core
+    frontier = [(edge, subnet) for edge, subnet in edge_subnets.items()]
+    while frontier:
+        next_frontier = []
+        for child, subnet in frontier:
+            for router in [parents.get(child), *extra_parents.get(child, ())]:
+                if router is None:
+                    continue
+                table = routing_table.setdefault(router, {})
+                if subnet not in table:
+                    table[subnet] = child
+                    next_frontier.append((router, subnet))
+        frontier = next_frontier
+
+    # Nós multi-homed aprendem as rotas de descida de cada uplink (o principal
+    # primeiro), então não dependem de qual deles é a rota padrão. As sub-redes
+    # que o próprio nó origina (a sua e as dos descendentes) não são
+    # aprendidas: o uplink as devolveria ao nó, em laço
+    learned = {}
+    for child, uplinks in extra_parents.items():
+        own = set(routing_table.get(child, {}))
+        if child in edge_subnets:
+            own.add(edge_subnets[child])
+        for uplink in [parents.get(child), *uplinks]:
+            for subnet in routing_table.get(uplink, {}):
+                if subnet not in own:
+                    learned.setdefault(child, {}).setdefault(subnet, uplink)
+    for child, routes in learned.items():
+        routing_table.setdefault(child, {}).update(routes)
+    return routing_table
+
+
+def assign_connection_types(graph, hosts, rng=random):
     """
     Define os tipos de conexão obedecendo as regras de camada:
       - Core → Aggregation: fibra óptica
       - Aggregation → Edge: fibra óptica ou par trançado, consistente por switch
       - Edge → Hosts: qualquer tipo, consistente por switch
+
+    `rng` permite sortear os tipos com um gerador próprio (padrão: módulo `random`).
     """
-    # Core → Aggregation
-    for agg in ["a1", "a2"]:
-        graph["root"][agg]['connection_type'] = "fibra_optica"
-
-    # Aggregation → Edge
-    agg_to_edge_type = {}  # guarda o tipo por switch de agregação
-    for agg, edges in {"a1": ["e1", "e2"], "a2": ["e3", "e4"]}.items():
-        tipo = random.choice(["fibra_optica", "par_trancado"])
-        agg_to_edge_type[agg] = tipo
-        for edge in edges:
-            graph[agg][edge]['connection_type'] = tipo
-
-    # Edge → Hosts
-    for edge in ["e1", "e2", "e3", "e4"]:
-        tipo = random.choice(["fibra_optica", "par_trancado", "sem_fio", "cabo_coaxial"])
-        for host in hosts:
-            if host.startswith("H" + edge[-1]):  # H1 → e1, H2 → e2, etc
-                graph[edge][host]['connection_type'] = tipo
+    host_set = set(hosts)
+    for switch, children in nx.bfs_successors(graph, "root"):
+        if switch == "root":
+            # Core → Aggregation
+            tipo = "fibra_optica"
+        elif any(child in host_set for child in children):
+            # Edge → Hosts
+            tipo = rng.choice(["fibra_optica", "par_trancado", "sem_fio", "cabo_coaxial"])
+        else:
+            # Aggregation → Edge (ou entre camadas de agregação)
+            tipo = rng.choice(["fibra_optica", "par_trancado"])
+        for child in children:
+            graph[switch][child]['connection_type'] = tipo
 
+
+DEFAULT_CONNECTIONS = {
+    "core_to_aggregation": "fibra_optica",
+    "aggregation_to_edge": "fibra_optica",
+    "edge_to_host": "par_trancado"
+}
+
+DEFAULT_BANDWIDTH = {
+    "core_to_aggregation": "10 Gbps",
+    "aggregation_to_edge": "1 Gbps",
+    "edge_to_host": "1 Gbps"
+}
+
+
+@instrumented("setup_network_from_config")
 def setup_network_from_config(config):
-    """Configura a rede com base no arquivo de configuração."""
-    graph = nx.Graph()
+    """
+    Configura a rede com base no arquivo de configuração.
 
-    switches_borda = ["e1", "e2", "e3", "e4"]
-    switches_agg = ["a1", "a2"]
+    Se o arquivo tiver a seção "hierarchy", a rede é gerada por
+    `generate_hierarchy`; caso contrário, cada sub-rede de "subnets" vira um
+    switch de borda ligado ao switch de agregação indicado em "aggregation"
+    (ou distribuído em ordem entre os switches de agregação). Para bordas
+    multi-homed, "aggregation" pode ser uma lista (o primeiro é o principal)
+    ou "uplinks": N liga cada borda sem indicação explícita a N switches de
+    agregação consecutivos. A lista de uplinks de cada borda multi-homed, na
+    ordem configurada, fica no atributo "uplinks" do nó.
+    """
+    connections_config = config.get('connections', DEFAULT_CONNECTIONS)
+    bandwidth_config = config.get('bandwidth', DEFAULT_BANDWIDTH)
+
+    if 'hierarchy' in config:
+        return generate_hierarchy(**config['hierarchy'],
+                                  connections=connections_config, bandwidth=bandwidth_config)
+
+    graph = nx.Graph()
     switch_root = "root"
+    switches_agg = list(config['aggregation'])
+    subnets = config['subnets']
+    uplinks = min(int(config.get('uplinks', 1)), len(switches_agg))
+    check_subnets(subnets)
 
     # Dicionários para armazenar IPs e hosts
     all_ips = {}
     hosts = []
+    parents = {switch_root: None}
+    extra_parents = {}
+    edge_subnets = {}
 
-    # Processar cada sub-rede
-    for i, (switch, subnet_config) in enumerate(config['subnets'].items(), start=1):
-        subnet = subnet_config['subnet']
-        num_hosts = subnet_config['num_hosts']
-        ips = generate_ips(subnet, num_hosts, str(i))
-        all_ips.update(ips)
-        hosts.extend(ips.keys())
+    # Core para Aggregation
+    conn_type = connections_config.get("core_to_aggregation", "fibra_optica")
+    bandwidth = bandwidth_config.get("core_to_aggregation", "10 Gbps")
+    graph.add_node(switch_root, layer=0)
+    for agg in switches_agg:
+        graph.add_node(agg, layer=1)
+        graph.add_edge(switch_root, agg, connection_type=conn_type, bandwidth=bandwidth)
+        parents[agg] = switch_root
 
-    # Adicionar IPs dos switches
-    for switch, subnet_config in config['subnets'].items():
+    # Aggregation para Edge e Edge para Hosts, com o pai explícito de cada nó
+    separator = _host_separator(len(subnets), max((s['num_hosts'] for s in subnets.values()), default=0))
+    for i, (switch, subnet_config) in enumerate(subnets.items(), start=1):
+        aggs = subnet_config.get('aggregation')
+        if aggs is None:
+            first = (i - 1) * len(switches_agg) // len(subnets)
+            aggs = [switches_agg[(first + k) % len(switches_agg)] for k in range(uplinks)]
+        elif isinstance(aggs, str):
+            aggs = [aggs]
+        graph.add_node(switch, layer=2, subnet=subnet_config['subnet'])
+        if len(aggs) > 1:
+            graph.nodes[switch]['uplinks'] = list(aggs)
+        for agg in aggs:
+            graph.add_edge(agg, switch,
+                           connection_type=connections_config.get("aggregation_to_edge", "fibra_optica"),
+                           bandwidth=bandwidth_config.get("aggregation_to_edge", "1 Gbps"))
+        parents[switch] = aggs[0]
+        if len(aggs) > 1:
+            extra_parents[switch] = aggs[1:]
+        edge_subnets[switch] = subnet_config['subnet']
         all_ips[switch] = subnet_config['switch_ip']
 
+        ips = generate_ips(subnet_config['subnet'], subnet_config['num_hosts'], f"{i}{separator}",
+                           reserved=[subnet_config['switch_ip']])
+        for host in ips:
+            graph.add_node(host, layer=3)
+            graph.add_edge(switch, host,
+                           connection_type=connections_config.get("edge_to_host", "par_trancado"),
+                           bandwidth=bandwidth_config.get("edge_to_host", "1 Gbps"))
+            parents[host] = switch
+        all_ips.update(ips)
+        hosts.extend(ips)
+
     # Adicionar IPs dos switches de agregação e core
     all_ips.update(config['aggregation'])
     all_ips.update(config['core'])
 
-    # Criar grafo
-    graph.add_nodes_from(hosts + switches_borda + switches_agg + [switch_root])
-
-    # Obter tipos de conexão do config
-    connections_config = config.get('connections', {
-        "core_to_aggregation": "fibra_optica",
-        "aggregation_to_edge": "fibra_optica",
-        "edge_to_host": "par_trancado"
-    })
-
-    # Obter largura de banda do config
-    bandwidth_config = config.get('bandwidth', {
-        "core_to_aggregation": "10 Gbps",
-        "aggregation_to_edge": "1 Gbps",
-        "edge_to_host": "1 Gbps"
-    })
-
-    # Conectar switches na topologia de árvore com tipos de conexão
-    # Core para Aggregation
-    conn_type = connections_config.get("core_to_aggregation", "fibra_optica")
-    bandwidth = bandwidth_config.get("core_to_aggregation", "10 Gbps")
-    graph.add_edge("root", "a1", connection_type=conn_type, bandwidth=bandwidth)
-    graph.add_edge("root", "a2", connection_type=conn_type, bandwidth=bandwidth)
-
-    # Aggregation para Edge
-    conn_type = connections_config.get("aggregation_to_edge", "fibra_optica")
-    bandwidth = bandwidth_config.get("aggregation_to_edge", "1 Gbps")
-    graph.add_edge("a1", "e1", connection_type=conn_type, bandwidth=bandwidth)
-    graph.add_edge("a1", "e2", connection_type=conn_type, bandwidth=bandwidth)
-    graph.add_edge("a2", "e3", connection_type=conn_type, bandwidth=bandwidth)
-    graph.add_edge("a2", "e4", connection_type=conn_type, bandwidth=bandwidth)
-
-    # Edge para Hosts
-    conn_type = connections_config.get("edge_to_host", "par_trancado")
-    bandwidth = bandwidth_config.get("edge_to_host", "1 Gbps")
-    for host in hosts:
-        if host.startswith('H1'):
-            graph.add_edge("e1", host, connection_type=conn_type, bandwidth=bandwidth)
-        elif host.startswith('H2'):
-            graph.add_edge("e2", host, connection_type=conn_type, bandwidth=bandwidth)
-        elif host.startswith('H3'):
-            graph.add_edge("e3", host, connection_type=conn_type, bandwidth=bandwidth)
-        elif host.startswith('H4'):
-            graph.add_edge("e4", host, connection_type=conn_type, bandwidth=bandwidth)
-
     # Tabela de roteamento
-    routing_table = {
-        "a1": {config['subnets']['e1']['subnet']: "e1", config['subnets']['e2']['subnet']: "e2"},
-        "a2": {config['subnets']['e3']['subnet']: "e3", config['subnets']['e4']['subnet']: "e4"},
-        "root": {
-            config['subnets']['e1']['subnet']: "a1", config['subnets']['e2']['subnet']: "a1",
-            config['subnets']['e3']['subnet']: "a2", config['subnets']['e4']['subnet']: "a2"
-        }
-    }
+    routing_table = build_routing_tables(parents, edge_subnets, extra_parents)
 
     return graph, all_ips, hosts, routing_table
 
 
-def setup_network_random():
-    """Configura a rede de forma aleatória (comportamento original)."""
+@instrumented("setup_network_random")
+def setup_network_random(rng=random):
+    """Configura a rede de forma aleatória (comportamento original), sorteando com `rng`."""
     graph = nx.Graph()
 
-    switches_borda = ["e1", "e2", "e3", "e4"]
-    switches_agg = ["a1", "a2"]
-    switch_root = "root"
+    # Layout fixo: (switch de borda, switch de agregação, sub-rede, IP do switch)
+    edge_layout = [
+        ("e1", "a1", "192.168.1.0/27", "192.168.1.30"),
+        ("e2", "a1", "192.168.1.32/27", "192.168.1.62"),
+        ("e3", "a2", "192.168.1.64/28", "192.168.1.78"),
+        ("e4", "a2", "192.168.1.80/28", "192.168.1.94"),
+    ]
+    switches_agg = {"a1": "192.168.1.97", "a2": "192.168.1.109"}
 
     # Gerando número aleatório de hosts para cada sub-rede (1 a 3 hosts)
-    num_hosts_e1 = random.randint(1, 3)
-    num_hosts_e2 = random.randint(1, 3)
-    num_hosts_e3 = random.randint(1, 3)
-    num_hosts_e4 = random.randint(1, 3)
+    num_hosts = [rng.randint(1, 3) for _ in edge_layout]
 
     # Gerando IPs para cada sub-rede
-    ips_e1 = generate_ips("192.168.1.0/28", num_hosts_e1, "1")
-    ips_e2 = generate_ips("192.168.1.32/28", num_hosts_e2, "2")
-    ips_e3 = generate_ips("192.168.1.64/27", num_hosts_e3, "3")
-    ips_e4 = generate_ips("192.168.1.80/27", num_hosts_e4, "4")
-
-    hosts = list(ips_e1.keys()) + list(ips_e2.keys()) + list(ips_e3.keys()) + list(ips_e4.keys())
-
-    graph.add_nodes_from(hosts + switches_borda + switches_agg + [switch_root])
+    edge_ips = [generate_ips(subnet, count, str(i))
+                for i, ((_, _, subnet, _), count) in enumerate(zip(edge_layout, num_hosts), start=1)]
+    hosts = [host for ips in edge_ips for host in ips]
 
     # Tipos de conexão aleatórios
     connection_types = ["par_trancado", "fibra_optica", "sem_fio", "cabo_coaxial"]
 
     # Conectando os switches na topologia de árvore
-    graph.add_edge("root", "a1", connection_type=random.choice(connection_types), bandwidth="10 Gbps")
-    graph.add_edge("root", "a2", connection_type=random.choice(connection_types), bandwidth="10 Gbps")
-    graph.add_edge("a1", "e1", connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    graph.add_edge("a1", "e2", connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    graph.add_edge("a2", "e3", connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    graph.add_edge("a2", "e4", connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-
-    for host in ips_e1.keys():
-        graph.add_edge("e1", host, connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    for host in ips_e2.keys():
-        graph.add_edge("e2", host, connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    for host in ips_e3.keys():
-        graph.add_edge("e3", host, connection_type=random.choice(connection_types), bandwidth="1 Gbps")
-    for host in ips_e4.keys():
-        graph.add_edge("e4", host, connection_type=random.choice(connection_types), bandwidth="1 Gbps")
+    graph.add_node("root", layer=0)
+    parents = {"root": None}
+    for agg in switches_agg:
+        graph.add_node(agg, layer=1)
+        graph.add_edge("root", agg, connection_type=rng.choice(connection_types), bandwidth="10 Gbps")
+        parents[agg] = "root"
+    for edge, agg, subnet, _ in edge_layout:
+        graph.add_node(edge, layer=2, subnet=subnet)
+        graph.add_edge(agg, edge, connection_type=rng.choice(connection_types), bandwidth="1 Gbps")
+        parents[edge] = agg
+
+    for (edge, _, _, _), ips in zip(edge_layout, edge_ips):
+        for host in ips:
+            graph.add_node(host, layer=3)
+            graph.add_edge(edge, host, connection_type=rng.choice(connection_types), bandwidth="1 Gbps")
 
     # Endereçamento IP de cada nó
-    ip_addresses = {
-        **ips_e1, **ips_e2, **ips_e3, **ips_e4,
-        "e1": "192.168.1.30", "e2": "192.168.1.62",
-        "e3": "192.168.1.78", "e4": "192.168.1.94",
-        "a1": "192.168.1.97", "a2": "192.168.1.109",
-        "root": "192.168.1.254"
-    }
+    ip_addresses = {host: ip for ips in edge_ips for host, ip in ips.items()}
+    ip_addresses.update({edge: switch_ip for edge, _, _, switch_ip in edge_layout})
+    ip_addresses.update(switches_agg)
+    ip_addresses["root"] = "192.168.1.254"
 
     # Tabela de roteamento
-    routing_table = {
-        "a1": {"192.168.1.0/27": "e1", "192.168.1.32/27": "e2"},
-        "a2": {"192.168.1.64/28": "e3", "192.168.1.80/28": "e4"},
-        "root": {
-            "192.168.1.0/27": "a1", "192.168.1.32/27": "a1",
-            "192.168.1.64/28": "a2", "192.168.1.80/28": "a2"
+    routing_table = build_routing_tables(parents, {edge: subnet for edge, _, subnet, _ in edge_layout})
+
+    return graph, ip_addresses, hosts, routing_table
+
+
+def _layer_link_key(parent_kind, child_kind):
+    return f"{parent_kind}_to_{child_kind}"
+
+
+@instrumented("generate_hierarchy")
+def generate_hierarchy(fanout=(2, 2), hosts_per_edge=3, base_network="10.0.0.0/8",
+                       connections=None, bandwidth=None, uplinks=1):
+    """
+    Gera uma hierarquia paramétrica com k camadas de switches abaixo da raiz.
+
+    `fanout[l]` é o número de filhos de cada switch da camada l (fanout[0]
+    para a raiz); a última camada de switches é a de borda, cada uma com
+    `hosts_per_edge` hosts. As camadas recebem os nomes root, a*, d{l}_* (se
+    houver mais de uma camada de agregação), e* e H*. Cada borda ganha uma
+    sub-rede própria alocada em sequência dentro de `base_network`, e os
+    switches de core/agregação recebem IPs de um bloco logo após as bordas.
+
+    Com `uplinks` > 1, cada switch abaixo da primeira camada também se liga
+    aos `uplinks - 1` switches seguintes da camada de cima (em ordem
+    circular), como bordas dual-homed a dois switches de agregação; o pai
+    principal e os redundantes ficam, nessa ordem, no atributo "uplinks".
+
+    Grafo, IPs e tabelas de roteamento são montados em tempo linear a partir
+    das referências explícitas de pai de cada nó.
+    """
+    connections = connections or DEFAULT_CONNECTIONS
+    bandwidth = bandwidth or DEFAULT_BANDWIDTH
+    fanout = list(fanout)
+    if not fanout or any(f < 1 for f in fanout) or hosts_per_edge < 0 or uplinks < 1:
+        raise ValueError("fanout precisa de ao menos uma camada com valores >= 1, hosts_per_edge >= 0 e uplinks >= 1")
+
+    depth = len(fanout)
+
+    def kind(layer):
+        if layer == 0:
+            return "core"
+        if layer == depth + 1:
+            return "host"
+        return "edge" if layer == depth else "aggregation"
+
+    def switch_name(layer, number):
+        if layer == depth:
+            return f"e{number}"
+        if layer == 1:
+            return f"a{number}"
+        return f"d{layer}_{number}"
+
+    # Camadas de switches com referência explícita ao pai
+    nodes = [("root", 0)]
+    links = []
+    parents = {"root": None}
+    extra_parents = {}
+    current = ["root"]
+    for layer, layer_fanout in enumerate(fanout, start=1):
+        link_attrs = {
+            "connection_type": connections.get(_layer_link_key(kind(layer - 1), kind(layer)), "fibra_optica"),
+            "bandwidth": bandwidth.get(_layer_link_key(kind(layer - 1), kind(layer)), "1 Gbps"),
         }
+        next_layer = []
+        redundancy = min(uplinks, len(current))
+        for position, parent in enumerate(current):
+            for _ in range(layer_fanout):
+                child = switch_name(layer, len(next_layer) + 1)
+                next_layer.append(child)
+                nodes.append((child, layer))
+                links.append((parent, child, link_attrs))
+                parents[child] = parent
+                if redundancy > 1:
+                    extra_parents[child] = [current[(position + k) % len(current)] for k in range(1, redundancy)]
+                    links += [(uplink, child, link_attrs) for uplink in extra_parents[child]]
+        current = next_layer
+    edges = current
+
+    # Endereçamento: um bloco potência de 2 por borda (rede, hosts, IP do switch,
+    # broadcast) e, depois deles, um bloco para os switches de core/agregação
+    infra_count = len(nodes) - len(edges)
+    try:
+        block_starts, _ = allocate_subnets(base_network, [hosts_per_edge + 3] * len(edges) + [infra_count + 2])
+    except ValueError:
+        raise ValueError(f"A rede {base_network} não comporta {len(edges)} sub-redes "
+                         f"de {hosts_per_edge} hosts e {infra_count} switches") from None
+    block_size = 1 << max(2, (hosts_per_edge + 2).bit_length())
+    edge_starts = block_starts[:-1].astype(np.int64)
+    host_ips = format_ips((edge_starts[:, None] + np.arange(1, hosts_per_edge + 1)).ravel()).tolist()
+    switch_ips = format_ips(edge_starts + block_size - 2).tolist()
+
+    separator = _host_separator(len(edges), hosts_per_edge)
+    host_attrs = {
+        "connection_type": connections.get("edge_to_host", "par_trancado"),
+        "bandwidth": bandwidth.get("edge_to_host", "1 Gbps"),
     }
+    ip_addresses = {}
+    hosts = []
+    edge_subnets = {}
+    edge_prefix = 32 - (block_size.bit_length() - 1)
+    for number, edge in enumerate(edges, start=1):
+        edge_subnets[edge] = f"{_format_ip(int(edge_starts[number - 1]))}/{edge_prefix}"
+        ip_addresses[edge] = switch_ips[number - 1]
+        for host_number in range(1, hosts_per_edge + 1):
+            host = host_name(number, host_number, separator)
+            hosts.append(host)
+            nodes.append((host, depth + 1))
+            links.append((edge, host, host_attrs))
+            parents[host] = edge
+    ip_addresses.update(zip(hosts, host_ips))
+
+    infra_ips = format_ips(int(block_starts[-1]) + 1 + np.arange(infra_count)).tolist()
+    ip_addresses.update(zip((switch for switch, layer in nodes if layer < depth), infra_ips))
+
+    graph = nx.Graph()
+    graph.add_nodes_from((node, {"layer": layer}) for node, layer in nodes)
+    for edge, subnet in edge_subnets.items():
+        graph.nodes[edge]["subnet"] = subnet
+    for child, uplinks in extra_parents.items():
+        graph.nodes[child]["uplinks"] = [parents[child], *uplinks]
+    graph.add_edges_from((u, v, dict(attrs)) for u, v, attrs in links)
+
+    routing_table = build_routing_tables(parents, edge_subnets, extra_parents)
 
     return graph, ip_addresses, hosts, routing_table
 
@@ -286,287 +722,3486 @@ CONNECTION_NAMES = {
     "cabo_coaxial": "Cabo Coaxial"
 }
 
-def get_path_latency(G, src, dst, packet_size_bits=8000):
-    """Calcula a latência (RTT) simulada baseada na largura de banda e tipo de meio."""
+# Velocidade (bits/s) e atraso de propagação (s) de cada tipo de meio
+LINK_SPEED_MAP = {
+    "par_trancado": 1_000_000_000,      # 1 Gbps
+    "fibra_optica": 10_000_000_000,     # 10 Gbps
+    "cabo_coaxial": 500_000_000,        # 500 Mbps
+    "sem_fio": 300_000_000              # 300 Mbps
+}
 
-    link_speed_map = {
-        "par_trancado": 1_000_000_000,      # 1 Gbps
-        "fibra_optica": 10_000_000_000,     # 10 Gbps
-        "cabo_coaxial": 500_000_000,        # 500 Mbps
-        "sem_fio": 300_000_000              # 300 Mbps
-    }
+PROPAGATION_DELAY_MAP = {
+    "par_trancado": 0.000005,
+    "fibra_optica": 0.0000005,
+    "cabo_coaxial": 0.000006,
+    "sem_fio": 0.00000033
+}
 
-    propagation_delay_map = {
-        "par_trancado": 0.000005,
-        "fibra_optica": 0.0000005,
-        "cabo_coaxial": 0.000006,
-        "sem_fio": 0.00000033
-    }
+# Meio assumido para enlaces sem tipo de conexão e valores para meios desconhecidos
+DEFAULT_MEDIA = "fibra_optica"
+DEFAULT_LINK_SPEED = 1_000_000_000
+DEFAULT_PROPAGATION_DELAY = 0.000005
 
-    try:
-        path = nx.shortest_path(G, source=src, target=dst)
-        total_rtt = 0
+# Modelo por contagem de saltos (HopLatencyModel): atraso de ida por enlace (ms)
+HOP_LATENCY_MS = 0.05
 
-        for i in range(len(path) - 1):
-            u, v = path[i], path[i + 1]
-            dtype = G[u][v].get("connection_type", "fibra_optica")
+# Faixa multiplicativa da variação aplicada a cada amostra de RTT
+RTT_JITTER = (0.9, 1.1)
 
-            link_speed = link_speed_map.get(dtype, 1_000_000_000)
-            prop_delay = propagation_delay_map.get(dtype, 0.000005)
 
-            transmission_delay = packet_size_bits / link_speed
-            total_rtt += (transmission_delay + prop_delay) * 2
+# --- Topologia Compacta (arrays) ---
 
-        total_rtt *= random.uniform(0.95, 1.10)
+class CompactTopology:
+    """
+    Representação compacta da topologia em arrays NumPy.
 
-        return total_rtt * 1000
+    Os nós ganham IDs inteiros na pré-ordem da DFS sobre a árvore de caminhos
+    mínimos a partir da raiz (componentes sem a raiz recebem raiz própria),
+    com ponteiros para o pai (`parent`, `parent_edge`), profundidade e
+    componente. A adjacência completa fica em formato CSR (`indptr`,
+    `indices`, `adjacency_edges`) e os atributos dos enlaces viram códigos
+    pequenos: `edge_media` indexa `media_labels` e `edge_bandwidth` indexa
+    `bandwidth_labels`, cujo valor em bits/s está em `bandwidth_bps`
+    (-1 = atributo ausente).
+    """
 
-    except nx.NetworkXNoPath:
-        return float('inf')
+    def __init__(self, nodes, parent, edge_u, edge_v, edge_media, edge_bandwidth,
+                 media_labels, bandwidth_labels, ips=None, node_subnets=None):
+        n = len(nodes)
+        self.nodes = list(nodes)
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.edge_u = np.asarray(edge_u, dtype=np.int32)
+        self.edge_v = np.asarray(edge_v, dtype=np.int32)
+        self.edge_media = np.asarray(edge_media, dtype=np.int8)
+        self.edge_bandwidth = np.asarray(edge_bandwidth, dtype=np.int16)
+        self.media_labels = list(media_labels)
+        self.bandwidth_labels = list(bandwidth_labels)
+        self.bandwidth_bps = np.array([parse_bandwidth(label) for label in self.bandwidth_labels], dtype=float)
+        self.ips = np.zeros(n, dtype=np.uint32) if ips is None else np.asarray(ips, dtype=np.uint32)
+        self.node_subnets = dict(node_subnets or {})
 
+        # Adjacência CSR (cada enlace aparece nos dois sentidos)
+        num_edges = len(self.edge_u)
+        src = np.concatenate([self.edge_u, self.edge_v])
+        dst = np.concatenate([self.edge_v, self.edge_u])
+        edge_ids = np.concatenate([np.arange(num_edges), np.arange(num_edges)]).astype(np.int32)
+        order = np.argsort(src, kind='stable')
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self.indices = dst[order]
+        self.adjacency_edges = edge_ids[order]
 
-def plot_graph(G):
-    """Visualiza a topologia da rede com cores para cada tipo de conexão e IPs abaixo dos nós."""
-    # Define a camada de cada nó para o layout multipartite
-    layers = {}
-    layers["root"] = 0
-    layers["a1"] = 1
-    layers["a2"] = 1
-    layers["e1"] = 2
-    layers["e2"] = 2
-    layers["e3"] = 2
-    layers["e4"] = 2
-    for host in hosts:
-        layers[host] = 3
+        # Enlace de subida de cada nó e profundidade/componente (IDs em pré-ordem)
+        self.parent_edge = np.full(n, -1, dtype=np.int32)
+        is_uplink = self.parent[dst] == src
+        self.parent_edge[dst[is_uplink]] = edge_ids[is_uplink]
+        self.depth = np.zeros(n, dtype=np.int32)
+        self.component = np.arange(n, dtype=np.int32)
+        # Sobe um nível por passada (vetorizada) até a raiz de cada componente
+        ancestor = self.parent.copy()
+        alive = np.flatnonzero(ancestor >= 0)
+        while len(alive):
+            self.depth[alive] += 1
+            self.component[alive] = ancestor[alive]
+            ancestor[alive] = self.parent[ancestor[alive]]
+            alive = alive[ancestor[alive] >= 0]
 
-    for node, layer in layers.items():
-        G.nodes[node]["layer"] = layer
+    @classmethod
+    def from_graph(cls, G, ip_addresses=None, root="root"):
+        """Converte um `networkx.Graph` (e o mapa de IPs, se houver)."""
+        # Árvore de caminhos mínimos (BFS) a partir da raiz. Um nó multi-homed
+        # fica sob o primeiro uplink configurado (atributo "uplinks") que ainda
+        # está ligado a ele, e não sob o vizinho que a BFS alcança primeiro
+        preferred = {}
+        for node, uplinks in G.nodes(data="uplinks"):
+            if uplinks:
+                preferred[node] = next((uplink for uplink in uplinks if uplink in G[node]), None)
+        start_nodes = ([root] if root in G else []) + [node for node in G if node != root]
+        tree_parent = {}
+        children = {}
+        for start in start_nodes:
+            if start in tree_parent:
+                continue
+            tree_parent[start] = None
+            frontier = [start]
+            while frontier:
+                next_frontier = []
+                for node in frontier:
+                    kids = []
+                    for neighbor in G[node]:
+                        if neighbor not in tree_parent and preferred.get(neighbor, node) in (node, None):
+                            tree_parent[neighbor] = node
+                            kids.append(neighbor)
+                            next_frontier.append(neighbor)
+                    children[node] = kids
+                frontier = next_frontier
 
-    # Posição dos nós (hierárquico)
-    pos = nx.multipartite_layout(G, subset_key="layer", align="vertical")
+        # DFS iterativa para numerar os nós em pré-ordem
+        nodes = []
+        ids = {}
+        parent = []
+        for start, start_parent in tree_parent.items():
+            if start_parent is not None:
+                continue
+            ids[start] = len(nodes)
+            nodes.append(start)
+            parent.append(-1)
+            stack = [iter(children[start])]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    continue
+                ids[child] = len(nodes)
+                nodes.append(child)
+                parent.append(ids[tree_parent[child]])
+                stack.append(iter(children[child]))
 
-    plt.figure(figsize=(14, 10))
+        media_codes = {label: code for code, label in enumerate(CONNECTION_COLORS)}
+        bandwidth_codes = {}
+        edge_u, edge_v, edge_media, edge_bandwidth = [], [], [], []
+        for u, v, data in G.edges(data=True):
+            edge_u.append(ids[u])
+            edge_v.append(ids[v])
+            media = data.get('connection_type')
+            bandwidth = data.get('bandwidth')
+            edge_media.append(-1 if media is None else media_codes.setdefault(media, len(media_codes)))
+            edge_bandwidth.append(-1 if bandwidth is None else bandwidth_codes.setdefault(bandwidth, len(bandwidth_codes)))
 
-    # --- Desenhar nós ---
-    nx.draw_networkx_nodes(G, pos, node_color='lightblue', node_size=2000)
-    nx.draw_networkx_labels(G, pos, font_size=10, font_weight='bold')
+        ips = None
+        if ip_addresses is not None:
+            ips = [ip_to_int(ip_addresses[node]) if node in ip_addresses else 0 for node in nodes]
+        node_subnets = {ids[node]: data['subnet'] for node, data in G.nodes(data=True) if 'subnet' in data}
 
-    # --- Desenhar arestas por tipo de conexão ---
-    for conn_type, color in CONNECTION_COLORS.items():
-        edges_of_type = [(u, v) for u, v, data in G.edges(data=True)
-                         if data.get('connection_type') == conn_type]
-        if edges_of_type:
-            nx.draw_networkx_edges(G, pos, edgelist=edges_of_type,
-                                   edge_color=color, width=3, alpha=0.7)
+        return cls(nodes, parent, edge_u, edge_v, edge_media, edge_bandwidth,
+                   media_codes, bandwidth_codes, ips=ips, node_subnets=node_subnets)
 
-    # --- Adicionar labels de IPs abaixo do nó ---
-    ip_labels = {node: ip_addresses[node] for node in G.nodes if node in ip_addresses}
-    offset_pos = {node: (x, y-0.1) for node, (x, y) in pos.items()}  # move o label um pouco para baixo
-    nx.draw_networkx_labels(G, offset_pos, labels=ip_labels, font_size=9, font_color='black', font_weight='normal')
+    def __len__(self):
+        return len(self.nodes)
 
-    # --- Legenda com velocidades dos links ---
-    # Define velocidades realistas para cada tipo de conexão
-    bandwidth_text = {
-        "par_trancado": "1000 Mbps",
-        "fibra_optica": "100000 Mbps",
-        "sem_fio": "300 Mbps",
-        "cabo_coaxial": "500 Mbps"
-    }
+    @property
+    def num_edges(self):
+        return len(self.edge_u)
 
-    legend_elements = []
-    for conn_type, color in CONNECTION_COLORS.items():
-        if any(data.get("connection_type") == conn_type for _, _, data in G.edges(data=True)):
-            legend_elements.append(
-                mpatches.Patch(
-                    color=color,
-                    label=f"{CONNECTION_NAMES[conn_type]} - {bandwidth_text[conn_type]}"
-                )
-            )
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos arrays e pelas listas de nomes (sem os strings em si)."""
+        arrays = [self.parent, self.parent_edge, self.depth, self.component, self.edge_u, self.edge_v,
+                  self.edge_media, self.edge_bandwidth, self.bandwidth_bps, self.ips, self.indptr,
+                  self.indices, self.adjacency_edges]
+        return (sum(array.nbytes for array in arrays)
+                + sys.getsizeof(self.nodes) + sys.getsizeof(self.ids))
 
-    plt.legend(handles=legend_elements, loc='lower left', fontsize=10,
-               title='Tipos de Conexão', title_fontsize=11)
+    def neighbors(self, node_id):
+        """IDs dos vizinhos de um nó."""
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
 
-    plt.title("Topologia de Rede em Árvore", fontsize=14, fontweight='bold')
-    plt.axis('off')
-    plt.tight_layout()
-    plt.show()
+    def edge_bps(self):
+        """Capacidade de cada enlace em bits/s (nan se não especificada)."""
+        return np.where(self.edge_bandwidth >= 0, self.bandwidth_bps[self.edge_bandwidth], np.nan)
 
+    def to_graph(self):
+        """Reconstrói o `networkx.Graph` equivalente (com camada, sub-rede e uplinks nos nós)."""
+        graph = nx.Graph()
+        depth, parent = self.depth.tolist(), self.parent.tolist()
+        graph.add_nodes_from((node, {"layer": int(d)}) for node, d in zip(self.nodes, depth))
+        for node_id, subnet in self.node_subnets.items():
+            graph.nodes[self.nodes[node_id]]["subnet"] = subnet
+        edges = []
+        for u, v, media, bandwidth in zip(self.edge_u.tolist(), self.edge_v.tolist(),
+                                          self.edge_media.tolist(), self.edge_bandwidth.tolist()):
+            # Enlace fora da árvore entre camadas vizinhas: uplink redundante do nó de baixo
+            if parent[u] != v and parent[v] != u and abs(depth[u] - depth[v]) == 1:
+                child, uplink = (u, v) if depth[u] > depth[v] else (v, u)
+                node = graph.nodes[self.nodes[child]]
+                node.setdefault("uplinks", [self.nodes[parent[child]]]).append(self.nodes[uplink])
+            data = {}
+            if media >= 0:
+                data["connection_type"] = self.media_labels[media]
+            if bandwidth >= 0:
+                data["bandwidth"] = self.bandwidth_labels[bandwidth]
+            edges.append((self.nodes[u], self.nodes[v], data))
+        graph.add_edges_from(edges)
+        return graph
 
+    def ip_addresses(self):
+        """Reconstrói o dicionário nó → IP."""
+        present = np.flatnonzero(self.ips)
+        return dict(zip([self.nodes[i] for i in present.tolist()], format_ips(self.ips[present]).tolist()))
 
-def display_link_capacities(G):
-    """Exibe as capacidades de cada link na rede."""
-    print("\n" + "=" * 80)
-    print("CAPACIDADES DOS ENLACES DA REDE")
-    print("=" * 80)
-    print(f"{'Nó Origem':<12} {'Nó Destino':<12} {'Tipo de Conexão':<20} {'Capacidade':<15}")
-    print("-" * 80)
 
-    for u, v, data in G.edges(data=True):
-        conn_type = data.get('connection_type', 'desconhecido')
-        conn_name = CONNECTION_NAMES.get(conn_type, conn_type)
-        bandwidth = data.get('bandwidth', 'não especificado')
-        print(f"{u:<12} ↔ {v:<12} {conn_name:<20} {bandwidth:<15}")
+# --- Snapshot Binário da Topologia ---
 
-    print("=" * 80 + "\n")
+SNAPSHOT_MAGIC = b"XPROBESN"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_ALIGN = 64
 
 
-def display_routing_tables(tables):
-    """Exibe as tabelas de roteamento dos nós Core e Aggregation."""
-    print("\n--- Tabelas de Roteamento (Core e Aggregation) ---")
-    for router, table in tables.items():
-        if router in ["root", "a1", "a2"]:
-            print(f"\n### Tabela de Roteamento de {router} ({ip_addresses[router]})")
-            print("---------------------------------")
-            print("| Rede de Destino | Próximo Salto |")
-            print("|-----------------|---------------|")
-            for network, next_hop in table.items():
-                print(f"| {network:<15} | {next_hop:<13} |")
-            print("---------------------------------")
-    print("----------------------------------------------------\n")
+def config_fingerprint(config):
+    """Hash SHA-256 da configuração (JSON canônico), usado para detectar snapshots desatualizados."""
+    text = json.dumps(config, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
-def display_connection_types(G):
-    """Exibe os tipos de conexão de cada link na rede."""
-    print("\n" + "=" * 60)
-    print("TIPOS DE CONEXÃO DA REDE")
-    print("=" * 60)
+def _align(size):
+    return -(-size // _SNAPSHOT_ALIGN) * _SNAPSHOT_ALIGN
 
-    # Agrupar por tipo de conexão
-    connections_by_type = {}
-    for u, v, data in G.edges(data=True):
-        conn_type = data.get('connection_type', 'desconhecido')
-        if conn_type not in connections_by_type:
-            connections_by_type[conn_type] = []
-        connections_by_type[conn_type].append((u, v))
 
-    # Exibir agrupado
-    for conn_type in sorted(connections_by_type.keys()):
-        print(f"\n📡 {CONNECTION_NAMES.get(conn_type, conn_type.upper())}:")
-        print("-" * 40)
-        for u, v in sorted(connections_by_type[conn_type]):
-            print(f"  {u:6} ↔ {v:6}")
+def save_snapshot(filename, G, ip_addresses, hosts, routing_table, config=None):
+    """
+    Grava a rede montada em um arquivo binário versionado.
 
-    print("\n" + "=" * 60 + "\n")
+    Layout: MAGIC (8 bytes), versão e tamanho do cabeçalho (uint32), o
+    cabeçalho JSON (rótulos, hash da configuração e posição/tipo/forma de
+    cada array) e os arrays crus da `CompactTopology`, hosts e rotas,
+    alinhados em 64 bytes para serem mapeados direto por `numpy.memmap`. Os
+    nomes dos nós ficam em um único bloco UTF-8 separado por quebras de
+    linha. A gravação é atômica (arquivo temporário + `os.replace`).
+    """
+    topology = CompactTopology.from_graph(G, ip_addresses)
+    ids = topology.ids
+    subnet_labels = sorted(set(topology.node_subnets.values()) |
+                           {subnet for table in routing_table.values() for subnet in table})
+    subnet_codes = {subnet: code for code, subnet in enumerate(subnet_labels)}
+    subnet_nodes = sorted(topology.node_subnets)
+    routes = [(ids[router], subnet_codes[subnet], ids[next_hop])
+              for router, table in routing_table.items() for subnet, next_hop in table.items()]
 
+    arrays = {
+        "parent": topology.parent,
+        "edge_u": topology.edge_u,
+        "edge_v": topology.edge_v,
+        "edge_media": topology.edge_media,
+        "edge_bandwidth": topology.edge_bandwidth,
+        "ips": topology.ips,
+        "hosts": np.array([ids[host] for host in hosts], dtype=np.int32),
+        "subnet_nodes": np.array(subnet_nodes, dtype=np.int32),
+        "subnet_codes": np.array([subnet_codes[topology.node_subnets[node]] for node in subnet_nodes], dtype=np.int32),
+        "routes": np.array(routes, dtype=np.int32).reshape(-1, 3),
+        "names": np.frombuffer("\n".join(topology.nodes).encode('utf-8'), dtype=np.uint8),
+    }
+    header = {
+        "config": None if config is None else config_fingerprint(config),
+        "media_labels": topology.media_labels,
+        "bandwidth_labels": topology.bandwidth_labels,
+        "subnet_labels": subnet_labels,
+        "arrays": {},
+    }
+    size = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [size, array.dtype.str, list(array.shape)]
+        size += _align(array.nbytes)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(16 + len(header_bytes))
 
-def get_path_latency(G, src, dst):
-    """Calcula a latência (RTT) simulada do caminho."""
-    try:
-        path = nx.shortest_path(G, source=src, target=dst)
-        num_hops = len(path) - 1
-        base_rtt = 2 * num_hops * 0.05
-        rtt_sample = base_rtt * (1 + random.uniform(-0.1, 0.1))
-        return rtt_sample
-    except nx.NetworkXNoPath:
-        return float('inf')
+    temporary = f"{filename}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + np.array([SNAPSHOT_VERSION, len(header_bytes)], dtype='<u4').tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name][0])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + size)
+    os.replace(temporary, filename)
 
 
-def get_host_addresses(G, src_host, dst_host):
-    """Etapa 2: Obtém e exibe os endereços IP dos hosts de origem e destino."""
-    print("\n" + "=" * 60)
-    print("[Etapa 2] Obtenção de Endereços IP do Host Origem e Destino")
-    print("=" * 60)
+@instrumented("load_snapshot")
+def load_snapshot(filename, config=None):
+    """
+    Lê um snapshot gravado por `save_snapshot` sem remontar a rede.
 
-    if src_host not in G.nodes:
-        print(f"\n✗ ERRO: Host '{src_host}' não existe na rede!")
-        return None, None
+    Os arrays são mapeados direto do arquivo, então a carga leva
+    milissegundos. Retorna (CompactTopology, hosts, tabela de roteamento) ou
+    None se o arquivo não existe, é de outra versão, está corrompido ou, com
+    `config`, foi gerado a partir de outra configuração.
+    """
+    try:
+        data = np.memmap(filename, dtype=np.uint8, mode='r')
+        if bytes(data[:8]) != SNAPSHOT_MAGIC:
+            return None
+        version, header_size = data[8:16].view('<u4').tolist()
+        if version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(bytes(data[16:16 + header_size]).decode('utf-8'))
+        if config is not None and header["config"] != config_fingerprint(config):
+            return None
 
-    if dst_host not in G.nodes:
-        print(f"\n✗ ERRO: Host '{dst_host}' não existe na rede!")
-        return None, None
+        data_start = _align(16 + header_size)
+        arrays = {}
+        for name, (offset, dtype, shape) in header["arrays"].items():
+            dtype = np.dtype(dtype)
+            start = data_start + offset
+            arrays[name] = data[start:start + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
 
-    if src_host not in ip_addresses:
-        print(f"\n✗ ERRO: IP do host '{src_host}' não está mapeado!")
-        return None, None
+        nodes = bytes(arrays["names"]).decode('utf-8').split("\n") if len(arrays["names"]) else []
+        subnet_labels = header["subnet_labels"]
+        node_subnets = {node: subnet_labels[code]
+                        for node, code in zip(arrays["subnet_nodes"].tolist(), arrays["subnet_codes"].tolist())}
+        topology = CompactTopology(nodes, arrays["parent"], arrays["edge_u"], arrays["edge_v"],
+                                   arrays["edge_media"], arrays["edge_bandwidth"], header["media_labels"],
+                                   header["bandwidth_labels"], ips=arrays["ips"], node_subnets=node_subnets)
+    except (OSError, ValueError, KeyError, TypeError, IndexError, UnicodeDecodeError):
+        return None
 
-    if dst_host not in ip_addresses:
-        print(f"\n✗ ERRO: IP do host '{dst_host}' não está mapeado!")
-        return None, None
+    host_list = [nodes[i] for i in arrays["hosts"].tolist()]
+    routing_table = {}
+    for router, subnet, next_hop in arrays["routes"].tolist():
+        routing_table.setdefault(nodes[router], {})[subnet_labels[subnet]] = nodes[next_hop]
+    return topology, host_list, routing_table
 
-    src_ip = ip_addresses[src_host]
-    dst_ip = ip_addresses[dst_host]
 
-    print(f"\n✓ Host de Origem Localizado:")
-    print(f"  - Nome do Host: {src_host}")
-    print(f"  - Endereço IP: {src_ip}")
+def setup_network_cached(config, snapshot_file):
+    """
+    Como `setup_network_from_config`, mas reaproveita o snapshot binário se ele
+    corresponde à configuração. Se o arquivo falta ou está desatualizado, a
+    rede é montada pelo caminho normal e um snapshot novo é gravado.
+    """
+    loaded = load_snapshot(snapshot_file, config)
+    if loaded is None:
+        network = setup_network_from_config(config)
+        try:
+            save_snapshot(snapshot_file, *network, config=config)
+        except OSError as e:
+            print(f"⚠ Não foi possível gravar o snapshot '{snapshot_file}': {e}", file=sys.stderr)
+        return network
 
-    print(f"\n✓ Host de Destino Localizado:")
-    print(f"  - Nome do Host: {dst_host}")
-    print(f"  - Endereço IP: {dst_ip}")
+    topology, host_list, routing = loaded
+    graph = topology.to_graph()
+    # O índice de caminhos sai da topologia já carregada, sem converter o grafo de novo
+    graph.graph["path_index"] = (_topology_key(graph), PathIndex(topology, get_latency_model(graph)))
+    return graph, topology.ip_addresses(), host_list, routing
 
-    if not nx.has_path(G, src_host, dst_host):
-        print(f"\n✗ AVISO: Host de destino {dst_host} ({dst_ip}) é inalcançável a partir de {src_host} ({src_ip})!")
-        return None, None
 
-    print(f"\n✓ Conectividade: OK (Caminho existe entre os hosts)")
-    print("=" * 60 + "\n")
+# --- Modelo de Latência dos Enlaces ---
 
-    return src_ip, dst_ip
+class LatencyModel:
+    """
+    Modelo de latência dos enlaces: tempo de transmissão (tamanho do pacote /
+    taxa) mais atraso de propagação do meio.
 
+    A taxa de cada enlace é a largura de banda configurada, já convertida em
+    bits/s na `CompactTopology`, ou a velocidade do meio em `speed_map` quando
+    o enlace não tem largura de banda. O modelo é compilado uma vez por
+    topologia em dois custos por enlace (ms por bit e ms fixos), então o
+    atraso de um caminho para qualquer tamanho de pacote é uma soma de
+    arrays pré-calculados. Subclasses trocam `edge_costs` por outro modelo.
+    """
 
-def xprobe_rtt(G, src, dst, num_samples=3):
-    """Simula o XProbe (Medição de RTT) com N amostras."""
-    print("\n" + "=" * 60)
-    print("[Etapa 3] Simulação XProbe/RTT - Verificação de Disponibilidade")
-    print("=" * 60)
+    def __init__(self, speed_map=None, propagation_map=None):
+        self.speed_map = LINK_SPEED_MAP if speed_map is None else speed_map
+        self.propagation_map = PROPAGATION_DELAY_MAP if propagation_map is None else propagation_map
 
-    if src not in G.nodes or dst not in G.nodes:
-        print(f"\n✗ ERRO: Host {src} ou {dst} não existe na rede!")
-        return None
+    def _media_values(self, topology, values, default):
+        # Um valor por código de meio; o código -1 (sem tipo) cai no último, o de DEFAULT_MEDIA
+        table = [values.get(label, default) for label in topology.media_labels]
+        table.append(values.get(DEFAULT_MEDIA, default))
+        return np.asarray(table, dtype=float)[topology.edge_media]
 
-    if not nx.has_path(G, src, dst):
-        print(
-            f"\n✗ ERRO: Host destino {dst} ({ip_addresses[dst]}) é INALCANÇÁVEL a partir de {src} ({ip_addresses[src]})!")
-        print("❌ HOST DESTINO INATIVO ou SEM CAMINHO DE REDE")
-        print("=" * 60 + "\n")
-        return None
+    def link_rates(self, topology):
+        """Taxa de cada enlace em bits/s."""
+        bandwidth = topology.edge_bps()
+        return np.where(np.isnan(bandwidth),
+                        self._media_values(topology, self.speed_map, DEFAULT_LINK_SPEED), bandwidth)
 
-    print(f"\n✓ Host Destino ATIVO e ALCANÇÁVEL")
-    print(f"  - Origem: {src} ({ip_addresses[src]})")
-    print(f"  - Destino: {dst} ({ip_addresses[dst]})")
+    def propagation(self, topology):
+        """Atraso de propagação de cada enlace em segundos."""
+        return self._media_values(topology, self.propagation_map, DEFAULT_PROPAGATION_DELAY)
 
-    rtt_times = []
+    def edge_costs(self, topology):
+        """Custo de ida de cada enlace como (ms por bit do pacote, ms fixos)."""
+        return 1000 / self.link_rates(topology), 1000 * self.propagation(topology)
 
-    print(f"\n--- Coleta de Amostras de RTT ---")
 
-    path = nx.shortest_path(G, source=src, target=dst)
-    print(f"  - Rota (Saltos): {' → '.join(path)}")
-    print(f"  - Número de saltos: {len(path) - 1}")
+class HopLatencyModel(LatencyModel):
+    """Modelo por contagem de saltos: `hop_latency_ms` por enlace, independente do pacote."""
 
-    # Mostrar tipos de conexão no caminho
-    print(f"\n  - Tipos de conexão no caminho:")
-    for i in range(len(path) - 1):
-        u, v = path[i], path[i + 1]
-        conn_type = G[u][v].get('connection_type', 'desconhecido')
-        print(f"    {u} → {v}: {CONNECTION_NAMES.get(conn_type, conn_type)}")
+    def __init__(self, hop_latency_ms=HOP_LATENCY_MS):
+        super().__init__()
+        self.hop_latency_ms = hop_latency_ms
 
-    print()
+    def propagation(self, topology):
+        return np.full(topology.num_edges, self.hop_latency_ms / 1000)
 
-    for i in range(num_samples):
-        rtt = get_path_latency(G, src, dst)
-        rtt_times.append(rtt)
-        print(f"  Amostra {i + 1}: RTT = {rtt:.4f} ms")
-        time.sleep(0.5)
+    def edge_costs(self, topology):
+        return np.zeros(topology.num_edges), np.full(topology.num_edges, self.hop_latency_ms)
 
-    if rtt_times:
-        rtt_mean = sum(rtt_times) / len(rtt_times)
-        rtt_min = min(rtt_times)
-        rtt_max = max(rtt_times)
 
-        print("\n" + "=" * 60)
-        print("✅ RESULTADO DA SIMULAÇÃO XPROBE")
-        print("=" * 60)
-        print(f"  RTT Mínimo: {rtt_min:.4f} ms")
-        print(f"  RTT Máximo: {rtt_max:.4f} ms")
-        print(f"  📊 RTT MÉDIO: {rtt_mean:.4f} ms")
-        print("=" * 60 + "\n")
+def get_latency_model(G):
+    """Modelo de latência em uso no grafo (padrão: `LatencyModel` por meio e largura de banda)."""
+    return G.graph.get("latency_model") or LatencyModel()
 
-        return rtt_mean
 
-    return None
+def set_latency_model(G, model):
+    """Troca o modelo de latência do grafo; o índice de caminhos é recompilado no próximo uso."""
+    G.graph["latency_model"] = model
+    G.graph["version"] = G.graph.get("version", 0) + 1
 
 
-def menu():
+# --- Índice de Caminhos (LCA) ---
+
+# Até esta profundidade o LCA em lote sobe pelos pais em vez de usar a sparse table
+LCA_CLIMB_DEPTH = 8
+
+class PathIndex:
+    """
+    Índice de caminhos de uma topologia hierárquica, montado uma vez por rede.
+
+    Guarda ponteiros para o pai, profundidade e atraso acumulado desde a raiz
+    de cada nó, além de um Euler tour com sparse table para responder o
+    ancestral comum mais baixo (LCA) em O(1). Com isso, alcançabilidade,
+    número de saltos e atraso do caminho entre dois nós saem em O(1), e o
+    caminho completo em O(saltos), sem nenhuma busca no grafo.
+
+    O atraso vem do `latency_model` (padrão: `LatencyModel`), acumulado desde
+    a raiz em duas partes: ms por bit (`cum_per_bit`) e ms fixos
+    (`cum_fixed`). O atraso de ida até a raiz para um pacote de b bits é
+    cum_fixed + b × cum_per_bit.
+
+    Trabalha sobre uma `CompactTopology`, cujos IDs seguem a pré-ordem da
+    DFS: a subárvore de `v` ocupa o intervalo contíguo [v, v + size[v]).
+
+    Se a topologia tem enlaces fora da árvore (`redundant`, por exemplo
+    bordas dual-homed), `path`, `hop_count` e `path_delay` usam os caminhos
+    de mesmo custo de `ecmp()`, escolhidos pelo hash do fluxo (`flow`); os
+    métodos por ID e vetorizados continuam seguindo a árvore.
+    """
+
+    @instrumented("path_index_build")
+    def __init__(self, topology, latency_model=None):
+        self.topology = topology
+        self.nodes = topology.nodes
+        self.ids = topology.ids
+        self.parent = topology.parent.astype(np.int64)
+        self.depth = topology.depth.astype(np.int64)
+        self.max_depth = int(self.depth.max(initial=0))
+        self.component = topology.component.astype(np.int64)
+        n = len(self.nodes)
+
+        # Nós agrupados por profundidade, para passadas vetorizadas raiz → folhas
+        order = np.argsort(self.depth, kind='stable')
+        self.levels = np.split(order, np.cumsum(np.bincount(self.depth, minlength=1))[:-1])
+
+        # Custo de ida de cada enlace, acumulado da raiz até cada nó
+        self.latency_model = latency_model or LatencyModel()
+        edge_per_bit, edge_fixed = self.latency_model.edge_costs(topology)
+        self.cum_per_bit = np.zeros(n)
+        self.cum_fixed = np.zeros(n)
+        for level in self.levels[1:]:
+            uplink = topology.parent_edge[level]
+            self.cum_per_bit[level] = self.cum_per_bit[self.parent[level]] + edge_per_bit[uplink]
+            self.cum_fixed[level] = self.cum_fixed[self.parent[level]] + edge_fixed[uplink]
+
+        self.size = np.ones(n, dtype=np.int64)
+        for level in reversed(self.levels[1:]):
+            np.add.at(self.size, self.parent[level], self.size[level])
+
+        # Switches de borda (com sub-rede) em ordem de ID, para achar os de uma subárvore
+        self.subnet_ids = np.array(sorted(topology.node_subnets), dtype=np.int64)
+
+        # Enlaces além dos da floresta de caminhos: há caminhos alternativos
+        self.redundant = topology.num_edges > n - int(np.count_nonzero(self.parent < 0))
+        self._ecmp = None
+
+        # Euler tour a partir da pré-ordem: volta ao pai antes de descer no próximo nó
+        euler = []
+        stack = []
+        for node_id, parent_id in enumerate(self.parent.tolist()):
+            while stack and stack[-1] != parent_id:
+                stack.pop()
+                if stack:
+                    euler.append(stack[-1])
+            euler.append(node_id)
+            stack.append(node_id)
+        while stack:
+            stack.pop()
+            if stack:
+                euler.append(stack[-1])
+
+        self.euler = np.asarray(euler, dtype=np.int64)
+        self.first = np.unique(self.euler, return_index=True)[1]
+
+        # Sparse table: sparse[k][i] = nó de menor profundidade em euler[i:i + 2**k]
+        sparse = [self.euler]
+        span = 1
+        while 2 * span <= len(euler):
+            prev = sparse[-1]
+            left, right = prev[:-span], prev[span:]
+            sparse.append(np.where(self.depth[left] <= self.depth[right], left, right))
+            span *= 2
+        self.sparse = sparse
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def lca_ids(self, u, v):
+        """LCA vetorizado para arrays de IDs (válido apenas para pares conectados)."""
+        u, v = np.broadcast_arrays(np.asarray(u), np.asarray(v))
+        if self.max_depth <= LCA_CLIMB_DEPTH:
+            return self._climb_lca(u.ravel(), v.ravel()).reshape(u.shape)
+        left = np.minimum(self.first[u], self.first[v]).ravel()
+        right = np.maximum(self.first[u], self.first[v]).ravel() + 1
+        level = np.log2(right - left).astype(np.int64)
+        result = np.empty(len(left), dtype=np.int64)
+        for k in np.unique(level):
+            mask = level == k
+            table = self.sparse[k]
+            a = table[left[mask]]
+            b = table[right[mask] - (1 << int(k))]
+            result[mask] = np.where(self.depth[a] <= self.depth[b], a, b)
+        return result.reshape(u.shape)
+
+    def _climb_lca(self, u, v):
+        # Sobe de `u` até o ancestral cuja faixa de pré-ordem contém `v`; em
+        # árvores rasas são poucas passadas, mais baratas que a sparse table
+        top = u.astype(np.int64)
+        pending = np.flatnonzero((v < top) | (v >= top + self.size[top]))
+        for _ in range(self.max_depth):
+            if not len(pending):
+                break
+            up = self.parent[top[pending]]
+            top[pending] = up
+            target = v[pending]
+            pending = pending[(target < up) | (target >= up + self.size[up])]
+        return top
+
+    def _lca(self, u_id, v_id):
+        left, right = sorted((self.first[u_id], self.first[v_id]))
+        k = (int(right - left) + 1).bit_length() - 1
+        a = self.sparse[k][left]
+        b = self.sparse[k][right + 1 - (1 << k)]
+        return a if self.depth[a] <= self.depth[b] else b
+
+    def lca(self, u, v):
+        """Ancestral comum mais baixo de dois nós (None se desconectados)."""
+        if not self.has_path(u, v):
+            return None
+        return self.nodes[self._lca(self.ids[u], self.ids[v])]
+
+    def has_path(self, u, v):
+        return self.component[self.ids[u]] == self.component[self.ids[v]]
+
+    def ecmp(self):
+        """Caminhos de mesmo custo da topologia (`EcmpPaths`), montados na primeira consulta."""
+        if self._ecmp is None:
+            self._ecmp = EcmpPaths(self)
+        return self._ecmp
+
+    def hop_count(self, u, v):
+        """Número de saltos entre dois nós (None se desconectados)."""
+        if not self.has_path(u, v):
+            return None
+        u_id, v_id = self.ids[u], self.ids[v]
+        if self.redundant:
+            return len(self.ecmp().route(u_id, v_id)[0]) - 1
+        return int(self.depth[u_id] + self.depth[v_id] - 2 * self.depth[self._lca(u_id, v_id)])
+
+    def root_delay(self, packet_size_bits=8000):
+        """Atraso de ida (ms) de cada nó até a raiz para um pacote de `packet_size_bits`."""
+        return self.cum_fixed + packet_size_bits * self.cum_per_bit
+
+    def path_costs(self, u, v, flow=0):
+        """Custos de ida do caminho: (ms por bit, ms fixos), ambos inf se desconectados."""
+        if not self.has_path(u, v):
+            return float('inf'), float('inf')
+        u_id, v_id = self.ids[u], self.ids[v]
+        if self.redundant:
+            _, per_bit, fixed = self.ecmp().route(u_id, v_id, flow)
+            return per_bit, fixed
+        top = self._lca(u_id, v_id)
+        per_bit = self.cum_per_bit[u_id] + self.cum_per_bit[v_id] - 2 * self.cum_per_bit[top]
+        fixed = self.cum_fixed[u_id] + self.cum_fixed[v_id] - 2 * self.cum_fixed[top]
+        return float(per_bit), float(fixed)
+
+    def path_delay(self, u, v, packet_size_bits=8000, flow=0):
+        """Atraso de ida (ms) acumulado pelos enlaces do caminho (inf se desconectados)."""
+        if not self.has_path(u, v):
+            return float('inf')
+        per_bit, fixed = self.path_costs(u, v, flow)
+        return fixed + packet_size_bits * per_bit
+
+    def path_delay_ids(self, u, v, packet_sizes):
+        """
+        Atraso de ida (ms) para arrays de IDs conectados e vários tamanhos de
+        pacote de uma vez: o resultado tem a forma de `u`/`v` mais um eixo
+        final com um valor por tamanho em `packet_sizes`.
+        """
+        u, v = np.broadcast_arrays(np.asarray(u), np.asarray(v))
+        top = self.lca_ids(u, v)
+        per_bit = self.cum_per_bit[u] + self.cum_per_bit[v] - 2 * self.cum_per_bit[top]
+        fixed = self.cum_fixed[u] + self.cum_fixed[v] - 2 * self.cum_fixed[top]
+        return fixed[..., None] + per_bit[..., None] * np.asarray(packet_sizes, dtype=float)
+
+    def path_ids(self, u_id, v_id):
+        """Caminho entre dois IDs conectados, como lista de IDs."""
+        top = self._lca(u_id, v_id)
+        up = []
+        while u_id != top:
+            up.append(u_id)
+            u_id = int(self.parent[u_id])
+        down = []
+        while v_id != top:
+            down.append(v_id)
+            v_id = int(self.parent[v_id])
+        return up + [int(top)] + down[::-1]
+
+    @instrumented("path_lookup")
+    def path(self, u, v, flow=0):
+        """Caminho de `u` até `v` como lista de nós (None se desconectados)."""
+        if not self.has_path(u, v):
+            return None
+        u_id, v_id = self.ids[u], self.ids[v]
+        path_ids = self.ecmp().route(u_id, v_id, flow)[0] if self.redundant else self.path_ids(u_id, v_id)
+        return [self.nodes[i] for i in path_ids]
+
+
+def _topology_key(G):
+    # O(1): contar enlaces no networkx percorre todos os nós; quem muda enlaces
+    # sem adicionar ou remover nós incrementa G.graph["version"]
+    return G.graph.get("version", 0), G.number_of_nodes()
+
+
+def get_path_index(G):
+    """Retorna o índice de caminhos do grafo, montando-o só quando a topologia muda."""
+    key = _topology_key(G)
+    cached = G.graph.get("path_index")
+    if cached is None or cached[0] != key:
+        if metrics.enabled:
+            metrics.count("path_index_miss")
+        cached = (key, PathIndex(CompactTopology.from_graph(G), get_latency_model(G)))
+        G.graph["path_index"] = cached
+    return cached[1]
+
+
+# --- Caminhos de Mesmo Custo (ECMP) ---
+
+# Máximo de caminhos de mesmo custo guardados por par de switches
+MAX_ECMP_PATHS = 16
+# Buscas em largura guardadas (uma por switch de origem, as mais recentes)
+ECMP_SEARCH_CACHE = 256
+
+
+def flow_hash(src, dst, flow=0):
+    """Hash CRC32 do fluxo: escolhe, sempre do mesmo jeito, um dos caminhos de mesmo custo."""
+    return zlib.crc32(f"{src}>{dst}>{flow}".encode('utf-8'))
+
+
+def _link_ends(index, edge):
+    """Pontas (de baixo, de cima) de um enlace: o nó mais fundo primeiro (o filho, na árvore)."""
+    u, v = int(index.topology.edge_u[edge]), int(index.topology.edge_v[edge])
+    return (u, v) if (-index.depth[u], u) < (-index.depth[v], v) else (v, u)
+
+
+class EcmpPaths:
+    """
+    Motor de caminhos de mesmo custo para topologias com uplinks redundantes.
+
+    Hosts (folhas) entram e saem pelo único enlace até o seu switch, então as
+    buscas correm só entre switches. Os caminhos mínimos de cada par de
+    switches (até `max_paths`) são enumerados uma única vez, a partir de uma
+    busca em largura por switch de origem, e ficam em cache com seus custos
+    de ida (ms/bit e ms fixos) já somados pelo modelo de latência do índice.
+    Cada sonda só escolhe um deles pelo `flow_hash` de origem, destino e fluxo.
+    """
+
+    def __init__(self, index, max_paths=MAX_ECMP_PATHS):
+        topology = index.topology
+        self.index = index
+        self.max_paths = max_paths
+        per_bit, fixed = index.latency_model.edge_costs(topology)
+        self.per_bit = per_bit.tolist()
+        self.fixed = fixed.tolist()
+        self.parent = index.parent.tolist()
+        self.parent_edge = topology.parent_edge.tolist()
+
+        degree = np.diff(topology.indptr)
+        self.is_leaf = ((degree == 1) & (index.parent >= 0)).tolist()
+        # Adjacência só entre switches: (vizinho, enlace) de cada um
+        self.adjacency = {}
+        for switch in np.flatnonzero(~((degree == 1) & (index.parent >= 0))).tolist():
+            lo, hi = topology.indptr[switch], topology.indptr[switch + 1]
+            self.adjacency[switch] = [(neighbor, edge) for neighbor, edge in
+                                      zip(topology.indices[lo:hi].tolist(), topology.adjacency_edges[lo:hi].tolist())
+                                      if not self.is_leaf[neighbor]]
+        self.edge_between = {(switch, neighbor): edge for switch, links in self.adjacency.items()
+                             for neighbor, edge in links}
+        self._searches = {}
+        self._routes = {}
+
+    def _predecessors(self, source):
+        """Predecessores de cada switch nos caminhos mínimos a partir de `source` (em cache)."""
+        preds = self._searches.pop(source, None)
+        if preds is None:
+            preds = {source: []}
+            frontier = [source]
+            while frontier:
+                level = {}
+                for node in frontier:
+                    for neighbor, edge in self.adjacency[node]:
+                        if neighbor not in preds:
+                            level.setdefault(neighbor, []).append((node, edge))
+                preds.update(level)
+                frontier = list(level)
+            if len(self._searches) >= ECMP_SEARCH_CACHE:
+                del self._searches[next(iter(self._searches))]
+        self._searches[source] = preds
+        return preds
+
+    def switch_routes(self, a, b):
+        """Caminhos mínimos entre dois switches: lista de (IDs, ms/bit, ms fixos), em cache por par."""
+        routes = self._routes.get((a, b))
+        if routes is None:
+            routes = []
+            if a == b:
+                routes.append(([a], 0.0, 0.0))
+            else:
+                preds = self._predecessors(a)
+                # Volta do destino à origem pelos predecessores, na ordem da busca
+                stack = [(b, [b], 0.0, 0.0)] if b in preds else []
+                while stack and len(routes) < self.max_paths:
+                    node, nodes, per_bit, fixed = stack.pop()
+                    if node == a:
+                        routes.append((nodes[::-1], per_bit, fixed))
+                        continue
+                    for pred, edge in reversed(preds[node]):
+                        stack.append((pred, nodes + [pred], per_bit + self.per_bit[edge], fixed + self.fixed[edge]))
+            self._routes[(a, b)] = routes
+        return routes
+
+    def routes(self, u_id, v_id):
+        """Todos os caminhos de mesmo custo entre dois IDs conectados, com os custos de ida."""
+        return [self._extend(u_id, v_id, route) for route in self._core_routes(u_id, v_id)]
+
+    def route(self, u_id, v_id, flow=0):
+        """O caminho de mesmo custo do fluxo entre dois IDs conectados: (IDs, ms/bit, ms fixos)."""
+        core = self._core_routes(u_id, v_id)
+        if len(core) > 1:
+            index = self.index
+            return self._extend(u_id, v_id, core[flow_hash(index.nodes[u_id], index.nodes[v_id], flow) % len(core)])
+        return self._extend(u_id, v_id, core[0])
+
+    def link(self, u_id, v_id):
+        """Enlace direcionado entre dois vizinhos: 2·enlace subindo (do nó mais fundo), 2·enlace + 1 descendo."""
+        if self.parent[v_id] == u_id:
+            edge = self.parent_edge[v_id]
+        elif self.parent[u_id] == v_id:
+            edge = self.parent_edge[u_id]
+        else:
+            edge = self.edge_between[(u_id, v_id)]
+        return 2 * edge + (0 if _link_ends(self.index, edge)[0] == u_id else 1)
+
+    def _core_routes(self, u_id, v_id):
+        if u_id == v_id:
+            return [([u_id], 0.0, 0.0)]
+        a = self.parent[u_id] if self.is_leaf[u_id] else u_id
+        b = self.parent[v_id] if self.is_leaf[v_id] else v_id
+        return self.switch_routes(a, b)
+
+    def _extend(self, u_id, v_id, route):
+        # Acrescenta os enlaces de acesso dos hosts nas pontas
+        nodes, per_bit, fixed = route
+        if nodes[0] != u_id:
+            edge = self.parent_edge[u_id]
+            nodes = [u_id] + nodes
+            per_bit, fixed = per_bit + self.per_bit[edge], fixed + self.fixed[edge]
+        if nodes[-1] != v_id:
+            edge = self.parent_edge[v_id]
+            nodes = nodes + [v_id]
+            per_bit, fixed = per_bit + self.per_bit[edge], fixed + self.fixed[edge]
+        return nodes, per_bit, fixed
+
+
+# --- Cache de Resultados (LRU versionado) ---
+
+# Limite padrão de memória do cache de rotas
+RESULT_CACHE_BYTES = 64 * 2 ** 20
+# Custo estimado de uma entrada além da tupla do caminho (chave, dicionário, floats)
+_CACHE_ENTRY_BYTES = 240
+
+
+def topology_fingerprint(G):
+    """
+    Impressão digital (SHA-256 curto) da topologia e dos custos dos enlaces.
+
+    Calculada uma vez por versão da topologia (em G.graph["fingerprint"]); duas
+    redes com os mesmos nós, enlaces e modelo de latência têm a mesma impressão,
+    mesmo em sessões diferentes.
+    """
+    key = _topology_key(G)
+    cached = G.graph.get("fingerprint")
+    if cached is None or cached[0] != key:
+        index = get_path_index(G)
+        topology = index.topology
+        digest = hashlib.sha256("\0".join(map(str, topology.nodes)).encode('utf-8'))
+        # Os componentes entram porque falhas incrementais não mudam os arrays de enlaces
+        for array in (topology.edge_u, topology.edge_v, index.component,
+                      *index.latency_model.edge_costs(topology)):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        cached = (key, digest.hexdigest()[:16])
+        G.graph["fingerprint"] = cached
+    return cached[1]
+
+
+class ResultCache:
+    """
+    Cache LRU de rotas resolvidas: alcançabilidade, caminho e atraso base.
+
+    Cada entrada guarda, para (topologia, origem, destino, fluxo), o caminho
+    (None se inalcançável) e o atraso de ida em duas partes (ms/bit e ms
+    fixos), que servem a qualquer tamanho de pacote. A chave inclui a
+    `topology_fingerprint`, então reconfigurar a rede ou derrubar um enlace
+    invalida as entradas automaticamente (e voltar à mesma topologia as
+    reaproveita). Acima de `max_bytes` (estimados), as entradas usadas há
+    mais tempo saem primeiro. `save`/`load` persistem o cache em JSON entre
+    sessões e `stats()` informa acertos, faltas e ocupação.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(path):
+        return _CACHE_ENTRY_BYTES + (sys.getsizeof(path) if path is not None else 0)
+
+    def _store(self, key, entry):
+        replaced = self.entries.pop(key, None)
+        if replaced is not None:
+            self.nbytes -= self._size(replaced[0])
+        self.entries[key] = entry
+        self.nbytes += self._size(entry[0])
+        while self.nbytes > self.max_bytes and self.entries:
+            evicted = self.entries.pop(next(iter(self.entries)))
+            self.nbytes -= self._size(evicted[0])
+            self.evictions += 1
+
+    def route(self, G, src, dst, flow=0):
+        """(caminho ou None, ms/bit, ms fixos) de `src` até `dst`, do cache ou resolvido pelo índice."""
+        key = (topology_fingerprint(G), src, dst, flow)
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            # Reinsere no fim: a ordem do dicionário é a ordem de uso
+            self.entries[key] = entry
+            self.hits += 1
+            if metrics.enabled:
+                metrics.count("cache_hits")
+            return entry
+
+        self.misses += 1
+        if metrics.enabled:
+            metrics.count("cache_misses")
+        index = get_path_index(G)
+        if not index.has_path(src, dst):
+            entry = (None, float('inf'), float('inf'))
+        else:
+            entry = (tuple(index.path(src, dst, flow)), *index.path_costs(src, dst, flow))
+        self._store(key, entry)
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        """Acertos, faltas, remoções por LRU, entradas e memória estimada (bytes)."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "entries": len(self.entries), "bytes": self.nbytes,
+                "max_bytes": self.max_bytes}
+
+    def save(self, filename):
+        """Grava as entradas (da menos para a mais recente) em JSON, de forma atômica."""
+        entries = [[*key, list(path) if path is not None else None, per_bit, fixed]
+                   for key, (path, per_bit, fixed) in self.entries.items()]
+        tmp = filename + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "entries": entries}, f)
+        os.replace(tmp, filename)
+
+    def load(self, filename):
+        """Carrega entradas gravadas por `save`; retorna quantas (0 se o arquivo falta ou é inválido)."""
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data["entries"] if data.get("version") == 1 else []
+            for fingerprint, src, dst, flow, path, per_bit, fixed in entries:
+                self._store((fingerprint, src, dst, flow), (tuple(path) if path is not None else None,
+                                                            float(per_bit), float(fixed)))
+        except FileNotFoundError:
+            return 0
+        except (OSError, AttributeError, KeyError, TypeError, ValueError) as e:
+            print(f"⚠ Cache de rotas '{filename}' ignorado: {e}", file=sys.stderr)
+            return 0
+        return len(entries)
+
+
+route_cache = ResultCache()
+
+
+def _save_route_cache(filename):
+    try:
+        route_cache.save(filename)
+    except OSError as e:
+        print(f"⚠ Não foi possível gravar o cache de rotas '{filename}': {e}", file=sys.stderr)
+
+
+# --- Falhas e Recuperação de Enlaces (incrementais) ---
+
+def _commit_topology(G, index=None):
+    """Registra a mudança na topologia, mantendo no cache o índice já atualizado (se houver)."""
+    G.graph["version"] = G.graph.get("version", 0) + 1
+    if index is not None:
+        G.graph["path_index"] = (_topology_key(G), index)
+
+
+def _tree_link(index, u, v):
+    """IDs (pai, filho) se `u`–`v` é um enlace da árvore do índice, senão None."""
+    u_id, v_id = index.ids[u], index.ids[v]
+    if index.parent[v_id] == u_id:
+        return u_id, v_id
+    if index.parent[u_id] == v_id:
+        return v_id, u_id
+    return None
+
+
+def _relabel_subtree(index, child_id, old_component, new_component):
+    """Troca o componente dos nós da subárvore de `child_id` ainda ligados a ele."""
+    block = index.component[child_id:child_id + index.size[child_id]]
+    block[block == old_component] = new_component
+
+
+def _update_routes(index, routing_table, parent_id, child_id, withdraw):
+    """
+    Retira (ou devolve) as rotas para as sub-redes ligadas a `child_id` nos
+    roteadores de `parent_id` para cima que estão no mesmo componente que ele.
+    """
+    if routing_table is None:
+        return
+    lo, hi = np.searchsorted(index.subnet_ids, [child_id, child_id + index.size[child_id]])
+    edges = index.subnet_ids[lo:hi]
+    edges = edges[index.component[edges] == index.component[child_id]]
+    subnets = [index.topology.node_subnets[edge] for edge in edges.tolist()]
+    if not subnets:
+        return
+
+    component = index.component[parent_id]
+    next_hop, router = child_id, parent_id
+    while router >= 0 and index.component[router] == component:
+        name = index.nodes[router]
+        if withdraw:
+            table = routing_table.get(name, {})
+            for subnet in subnets:
+                table.pop(subnet, None)
+        else:
+            table = routing_table.setdefault(name, {})
+            for subnet in subnets:
+                table[subnet] = index.nodes[next_hop]
+        next_hop, router = router, int(index.parent[router])
+
+
+def _rebuild_routes(G, index, routing_table):
+    """
+    Refaz as tabelas de roteamento a partir do índice (redes com uplinks redundantes).
+
+    Os pais vêm da árvore do índice, que segue o uplink principal
+    configurado enquanto ele estiver de pé, e os enlaces fora dela entre
+    camadas vizinhas viram uplinks redundantes na ordem do atributo
+    "uplinks", como em `build_routing_tables`. Assim, derrubar e restaurar
+    um enlace devolve as tabelas de uma rede recém-montada.
+    """
+    if routing_table is None:
+        return
+    nodes, parent, depth = index.nodes, index.parent.tolist(), index.depth.tolist()
+    topology = index.topology
+    parents = {node: nodes[p] if p >= 0 else None for node, p in zip(nodes, parent)}
+    extra_parents = {}
+    for u, v in zip(topology.edge_u.tolist(), topology.edge_v.tolist()):
+        if parent[u] != v and parent[v] != u and abs(depth[u] - depth[v]) == 1:
+            child, uplink = (u, v) if depth[u] > depth[v] else (v, u)
+            extra_parents.setdefault(nodes[child], []).append(nodes[uplink])
+    for child, uplinks in extra_parents.items():
+        order = G.nodes[child].get("uplinks") or ()
+        uplinks.sort(key=lambda uplink: order.index(uplink) if uplink in order else len(order))
+    edge_subnets = {nodes[node_id]: subnet for node_id, subnet in topology.node_subnets.items()}
+    routing_table.clear()
+    routing_table.update(build_routing_tables(parents, edge_subnets, extra_parents))
+
+
+def fail_link(G, u, v, routing_table=None):
+    """
+    Derruba o enlace `u`–`v` sem reconstruir a rede.
+
+    O enlace sai do grafo (seus atributos ficam em G.graph["failed_links"]),
+    os nós abaixo dele passam a um componente próprio no índice de caminhos e,
+    se `routing_table` for informada, os roteadores acima dele deixam de
+    anunciar as sub-redes que ficaram isoladas. O custo é proporcional ao
+    tamanho da subárvore afetada; caminhos e atrasos dos pares que continuam
+    conectados não mudam. Em redes com uplinks redundantes o tráfego pode
+    desviar por outro caminho, então o índice é montado de novo e as rotas
+    são refeitas a partir dele.
+    """
+    if not G.has_edge(u, v):
+        raise ValueError(f"Enlace {u} ↔ {v} não existe ou já está em falha")
+    index = get_path_index(G)
+    link = _tree_link(index, u, v)
+    G.graph.setdefault("failed_links", {})[(u, v)] = dict(G[u][v])
+    G.remove_edge(u, v)
+
+    if index.redundant:
+        _commit_topology(G)
+        _rebuild_routes(G, get_path_index(G), routing_table)
+        return
+    if link is None:
+        _commit_topology(G)
+        return
+    parent_id, child_id = link
+    _update_routes(index, routing_table, parent_id, child_id, withdraw=True)
+    _relabel_subtree(index, child_id, index.component[child_id], child_id)
+    _commit_topology(G, index)
+
+
+def restore_link(G, u, v, routing_table=None):
+    """Restaura um enlace derrubado por `fail_link`, devolvendo alcançabilidade e rotas."""
+    failed = G.graph.get("failed_links", {})
+    key = (u, v) if (u, v) in failed else (v, u)
+    if key not in failed:
+        raise ValueError(f"Enlace {u} ↔ {v} não está em falha")
+    index = get_path_index(G)
+    G.add_edge(u, v, **failed.pop(key))
+
+    link = _tree_link(index, u, v)
+    if link is not None and index.component[link[1]] == link[1] != index.component[link[0]]:
+        _relabel_subtree(index, link[1], link[1], index.component[link[0]])
+        _commit_topology(G, index)
+    else:
+        # O índice foi montado com o enlace já em falha: monta de novo
+        _commit_topology(G)
+        index = get_path_index(G)
+        if index.redundant:
+            _rebuild_routes(G, index, routing_table)
+            return
+        link = _tree_link(index, u, v)
+        if link is None:
+            return
+    _update_routes(index, routing_table, *link, withdraw=False)
+
+
+def fail_links(G, links, routing_table=None):
+    """Derruba vários enlaces (pares de nós), um após o outro."""
+    for u, v in links:
+        fail_link(G, u, v, routing_table)
+
+
+def restore_links(G, links, routing_table=None):
+    """Restaura vários enlaces em falha."""
+    for u, v in links:
+        restore_link(G, u, v, routing_table)
+
+
+def fail_node(G, node, routing_table=None):
+    """Derruba todos os enlaces de um switch (ou host). Retorna os enlaces derrubados."""
+    links = [(node, neighbor) for neighbor in G[node]]
+    fail_links(G, links, routing_table)
+    return links
+
+
+def restore_node(G, node, routing_table=None):
+    """Restaura todos os enlaces em falha de um nó. Retorna os enlaces restaurados."""
+    links = [link for link in G.graph.get("failed_links", {}) if node in link]
+    restore_links(G, links, routing_table)
+    return links
+
+
+# Acima deste número de nós visíveis, o modo "auto" agrupa os hosts e omite os rótulos
+PLOT_DETAIL_LIMIT = 300
+
+
+def _render_scene(G, summary):
+    """
+    Posições, segmentos e rótulos da topologia, guardados em cache por topologia.
+
+    O layout é o da árvore: x é a camada e as folhas ficam em sequência na
+    pré-ordem, com cada switch centralizado sobre as suas. Todos os enlaces
+    do grafo são desenhados, inclusive os uplinks redundantes fora da
+    árvore. Com `summary`, os hosts de cada switch de borda viram um único
+    nó de resumo ("N hosts").
+    """
+    key = _topology_key(G)
+    cached = G.graph.get("render_cache")
+    if cached is None or cached[0] != key:
+        cached = (key, {})
+        G.graph["render_cache"] = cached
+    if summary in cached[1]:
+        return cached[1][summary]
+
+    index = get_path_index(G)
+    topology = index.topology
+    n = len(index)
+    leaf = index.size == 1
+    is_edge_switch = np.zeros(n, dtype=bool)
+    is_edge_switch[index.subnet_ids] = True
+    collapsed = leaf & (index.parent >= 0) & is_edge_switch[np.maximum(index.parent, 0)] if summary \
+        else np.zeros(n, dtype=bool)
+
+    # O primeiro host de cada switch de borda representa o grupo; os demais somem
+    first_host = np.zeros(n, dtype=bool)
+    if collapsed.any():
+        hosts_ids = np.flatnonzero(collapsed)
+        first_host[hosts_ids[np.unique(index.parent[hosts_ids], return_index=True)[1]]] = True
+    visible = ~collapsed | first_host
+    weight = (leaf & visible).astype(np.int64)
+
+    # Posição vertical: intervalo das folhas visíveis da subárvore, pela pré-ordem
+    prefix = np.concatenate([[0], np.cumsum(weight)])
+    first = prefix[:-1]
+    last = prefix[np.arange(n) + index.size] - 1
+    x = index.depth.astype(float)
+    y = -(first + last) / 2
+
+    ids = np.flatnonzero(visible)
+    drawn = visible[topology.edge_u] & visible[topology.edge_v]
+    ends_u, ends_v = topology.edge_u[drawn], topology.edge_v[drawn]
+    segments = np.stack([np.column_stack([x[ends_u], y[ends_u]]),
+                         np.column_stack([x[ends_v], y[ends_v]])], axis=1)
+    media = topology.edge_media[drawn]
+    labels = topology.media_labels
+    colors = [CONNECTION_COLORS.get(labels[code], "#999999") if code >= 0 else "#999999" for code in media.tolist()]
+
+    names = [index.nodes[i] for i in ids.tolist()]
+    if first_host.any():
+        group_size = np.bincount(index.parent[collapsed], minlength=n)
+        for position in np.flatnonzero(first_host[ids]).tolist():
+            names[position] = f"{group_size[index.parent[ids[position]]]} hosts"
+
+    scene = {
+        "ids": ids, "x": x[ids], "y": y[ids], "names": names, "summary": first_host[ids],
+        "segments": segments, "colors": colors, "media": sorted({labels[code] for code in media.tolist() if code >= 0}),
+        "leaves": int(weight.sum()), "depth": int(index.depth.max(initial=0)),
+    }
+    cached[1][summary] = scene
+    return scene
+
+
+@instrumented("plot_graph")
+def plot_graph(G, output=None, detail="auto", addresses=None):
+    """
+    Visualiza a topologia da rede com cores para cada tipo de conexão e IPs abaixo dos nós.
+
+    Sem `output`, abre a janela do matplotlib; com `output`, grava a imagem no
+    arquivo (PNG, SVG ou outro formato pelo sufixo) sem precisar de display.
+    `detail` é "full" (todos os nós), "summary" (hosts agrupados por switch
+    de borda) ou "auto" (agrupa acima de PLOT_DETAIL_LIMIT nós). O layout
+    fica em cache até a topologia mudar e os enlaces são desenhados em uma
+    única coleção de linhas. `addresses` é o mapa nó → IP (padrão: a rede atual).
+    """
+    from matplotlib.collections import LineCollection
+    import matplotlib.patches as mpatches
+
+    addresses = ip_addresses if addresses is None else addresses
+    if detail == "auto":
+        detail = "summary" if G.number_of_nodes() > PLOT_DETAIL_LIMIT else "full"
+    scene = _render_scene(G, detail == "summary")
+    count = len(scene["ids"])
+    show_labels = count <= PLOT_DETAIL_LIMIT
+
+    figsize = (max(14, 3 * scene["depth"]), min(max(10, 0.25 * scene["leaves"]), 100))
+    if output is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize)
+    else:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+
+    # --- Desenhar arestas (uma coleção, cor pelo tipo de conexão) ---
+    ax.add_collection(LineCollection(scene["segments"], colors=scene["colors"], linewidths=3 if show_labels else 1,
+                                     alpha=0.7, zorder=1))
+
+    # --- Desenhar nós (tamanho limitado pelo espaço vertical de cada folha) ---
+    spacing = 72 * figsize[1] / max(scene["leaves"], 1)
+    node_size = max(4, min(2000, (0.8 * spacing) ** 2))
+    colors = np.where(scene["summary"], "khaki", "lightblue")
+    ax.scatter(scene["x"], scene["y"], s=node_size, c=colors, zorder=2)
+
+    # --- Nomes e IPs abaixo do nó (só em redes pequenas) ---
+    if show_labels:
+        font_size = min(10, 0.45 * spacing)
+        for name, x, y, summary in zip(scene["names"], scene["x"], scene["y"], scene["summary"]):
+            ax.text(x, y, name, fontsize=font_size, fontweight='bold', ha='center', va='center', zorder=3)
+            if spacing >= 40 and not summary and name in addresses:
+                ax.text(x, y - 0.35, addresses[name], fontsize=9, ha='center', va='top', zorder=3)
+
+    # --- Legenda com velocidades dos links ---
+    legend_elements = [
+        mpatches.Patch(color=CONNECTION_COLORS[conn_type],
+                       label=f"{CONNECTION_NAMES[conn_type]} - {LINK_SPEED_MAP[conn_type] / 1e6:g} Mbps")
+        for conn_type in CONNECTION_COLORS if conn_type in scene["media"]
+    ]
+    ax.legend(handles=legend_elements, loc='lower left', fontsize=10,
+              title='Tipos de Conexão', title_fontsize=11)
+
+    ax.set_title("Topologia de Rede em Árvore", fontsize=14, fontweight='bold')
+    ax.autoscale()
+    ax.margins(0.08)
+    ax.axis('off')
+    fig.tight_layout()
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output)
+
+
+@instrumented("display_link_capacities")
+def display_link_capacities(G):
+    """Exibe as capacidades de cada link na rede."""
+    print("\n" + "=" * 80)
+    print("CAPACIDADES DOS ENLACES DA REDE")
+    print("=" * 80)
+    print(f"{'Nó Origem':<12} {'Nó Destino':<12} {'Tipo de Conexão':<20} {'Capacidade':<15}")
+    print("-" * 80)
+
+    for u, v, data in G.edges(data=True):
+        conn_type = data.get('connection_type', 'desconhecido')
+        conn_name = CONNECTION_NAMES.get(conn_type, conn_type)
+        bandwidth = data.get('bandwidth', 'não especificado')
+        print(f"{u:<12} ↔ {v:<12} {conn_name:<20} {bandwidth:<15}")
+
+    print("=" * 80 + "\n")
+
+
+@instrumented("display_routing_tables")
+def display_routing_tables(tables):
+    """Exibe as tabelas de roteamento dos nós Core e Aggregation."""
+    print("\n--- Tabelas de Roteamento (Core e Aggregation) ---")
+    for router, table in tables.items():
+        print(f"\n### Tabela de Roteamento de {router} ({ip_addresses[router]})")
+        print("---------------------------------")
+        print("| Rede de Destino | Próximo Salto |")
+        print("|-----------------|---------------|")
+        for network, next_hop in table.items():
+            print(f"| {network:<15} | {next_hop:<13} |")
+        print("---------------------------------")
+    print("----------------------------------------------------\n")
+
+
+@instrumented("display_connection_types")
+def display_connection_types(G):
+    """Exibe os tipos de conexão de cada link na rede."""
+    print("\n" + "=" * 60)
+    print("TIPOS DE CONEXÃO DA REDE")
+    print("=" * 60)
+
+    # Agrupar por tipo de conexão
+    connections_by_type = {}
+    for u, v, data in G.edges(data=True):
+        conn_type = data.get('connection_type', 'desconhecido')
+        if conn_type not in connections_by_type:
+            connections_by_type[conn_type] = []
+        connections_by_type[conn_type].append((u, v))
+
+    # Exibir agrupado
+    for conn_type in sorted(connections_by_type.keys()):
+        print(f"\n📡 {CONNECTION_NAMES.get(conn_type, conn_type.upper())}:")
+        print("-" * 40)
+        for u, v in sorted(connections_by_type[conn_type]):
+            print(f"  {u:6} ↔ {v:6}")
+
+    print("\n" + "=" * 60 + "\n")
+
+
+# --- Exportação de Relatórios (streaming) ---
+
+REPORT_COLUMNS = {
+    "links": ("source", "target", "layer", "connection_type", "bandwidth"),
+    "connections": ("connection_type", "connection_name", "source", "target", "layer"),
+    "routes": ("router", "router_ip", "network", "next_hop", "layer", "connection_type"),
+}
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_BATCH_SIZE = 65536
+
+
+def _report_columns(report):
+    if report not in REPORT_COLUMNS:
+        raise ValueError(f"Relatório desconhecido: '{report}' (use {', '.join(REPORT_COLUMNS)})")
+    return REPORT_COLUMNS[report]
+
+
+def report_rows(G, report, tables=None, layers=None, media=None, addresses=None):
+    """
+    Gera, uma a uma, as linhas (tuplas na ordem de REPORT_COLUMNS) de um relatório.
+
+    "links" e "connections" percorrem os enlaces do grafo; "routes" percorre as
+    tabelas de roteamento (`tables` e `addresses`, padrão: a rede atual). A camada de um enlace
+    é a do nó mais profundo (1 = core → agregação, ..., a dos hosts = borda →
+    host) e a de uma rota é a do roteador. `layers` e `media` restringem as
+    linhas às camadas e aos tipos de conexão informados.
+    """
+    _report_columns(report)
+    layers = set(layers) if layers else None
+    media = set(media) if media else None
+    nodes = G.nodes
+
+    if report == "routes":
+        tables = routing_table if tables is None else tables
+        addresses = ip_addresses if addresses is None else addresses
+        for router, table in tables.items():
+            layer = nodes[router].get('layer') if router in nodes else None
+            if layers is not None and layer not in layers:
+                continue
+            router_ip = addresses.get(router)
+            for network, next_hop in table.items():
+                conn_type = G.edges[router, next_hop].get('connection_type') if G.has_edge(router, next_hop) else None
+                if media is not None and conn_type not in media:
+                    continue
+                yield router, router_ip, network, next_hop, layer, conn_type
+        return
+
+    for u, v, data in G.edges(data=True):
+        conn_type = data.get('connection_type', 'desconhecido')
+        if media is not None and conn_type not in media:
+            continue
+        layer_u, layer_v = nodes[u].get('layer'), nodes[v].get('layer')
+        layer = max(layer_u, layer_v) if layer_u is not None and layer_v is not None else None
+        if layers is not None and layer not in layers:
+            continue
+        if report == "links":
+            yield u, v, layer, conn_type, data.get('bandwidth')
+        else:
+            yield conn_type, CONNECTION_NAMES.get(conn_type, conn_type), u, v, layer
+
+
+def _export_format(output, fmt):
+    if fmt is None:
+        fmt = "jsonl" if output == "-" else os.path.splitext(output)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: '{fmt}' (use {', '.join(EXPORT_FORMATS)})")
+    return fmt
+
+
+def _write_parquet(rows, columns, output, batch_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("A exportação Parquet requer o pacote 'pyarrow' (pip install pyarrow)") from None
+
+    schema = pa.schema([(name, pa.int64() if name == "layer" else pa.string()) for name in columns])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            arrays = [pa.array(list(values), type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(batch)
+    return count
+
+
+@instrumented("export_report")
+def export_report(G, report, output, fmt=None, tables=None, layers=None, media=None,
+                  batch_size=EXPORT_BATCH_SIZE, addresses=None):
+    """
+    Grava um relatório ("links", "connections" ou "routes") em CSV, JSONL ou Parquet.
+
+    As linhas vêm direto de `report_rows` e são escritas à medida que são
+    geradas (em lotes de `batch_size` no Parquet), então a memória não cresce
+    com o tamanho da rede. O formato vem de `fmt` ou do sufixo de `output`
+    ('-' grava no stdout, em JSONL por padrão). O Parquet usa o `pyarrow`,
+    importado só quando necessário. Retorna o número de linhas gravadas.
+    """
+    fmt = _export_format(output, fmt)
+    columns = _report_columns(report)
+    rows = report_rows(G, report, tables, layers, media, addresses)
+
+    if fmt == "parquet":
+        if output == "-":
+            raise ValueError("A exportação Parquet precisa de um arquivo de saída")
+        return _write_parquet(rows, columns, output, batch_size)
+
+    count = 0
+    with contextlib.ExitStack() as files:
+        out = sys.stdout if output == "-" else files.enter_context(open(output, 'w', encoding='utf-8', newline=''))
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            for row in rows:
+                out.write(encode(dict(zip(columns, row))) + "\n")
+                count += 1
+    return count
+
+
+@instrumented("get_path_latency")
+def get_path_latency(G, src, dst, packet_size_bits=8000, rng=random, flow=0):
+    """Calcula a latência (RTT) simulada baseada na largura de banda e tipo de meio."""
+    # Atraso de ida pré-compilado pelo modelo de latência do grafo (inf sem caminho);
+    # com uplinks redundantes, pelo caminho de mesmo custo do fluxo
+    base_rtt = 2 * get_path_index(G).path_delay(src, dst, packet_size_bits, flow)
+    rtt_sample = base_rtt * rng.uniform(*RTT_JITTER)
+    return rtt_sample
+
+
+def get_path_latency_sweep(G, src, dst, packet_sizes, num_samples=1, seed=None, flow=0):
+    """
+    RTTs (ms) de um par para vários tamanhos de pacote em uma só chamada.
+
+    Retorna um array (tamanhos × amostras): o RTT base de cada tamanho sai
+    dos custos pré-compilados do caminho (o de mesmo custo do fluxo, com
+    uplinks redundantes) e só a variação é sorteada, com um
+    `numpy.random.Generator` semeado com `seed`. Pares sem caminho dão inf.
+    """
+    index = get_path_index(G)
+    packet_sizes = np.atleast_1d(np.asarray(packet_sizes, dtype=float))
+    if not index.has_path(src, dst):
+        return np.full((len(packet_sizes), num_samples), np.inf)
+    per_bit, fixed = index.path_costs(src, dst, flow)
+    base_rtt = 2 * (fixed + per_bit * packet_sizes)
+    rng = np.random.default_rng(seed)
+    return base_rtt[:, None] * rng.uniform(*RTT_JITTER, size=(len(packet_sizes), num_samples))
+
+
+@instrumented("get_host_addresses")
+def get_host_addresses(G, src_host, dst_host):
+    """Etapa 2: Obtém e exibe os endereços IP dos hosts de origem e destino."""
+    print("\n" + "=" * 60)
+    print("[Etapa 2] Obtenção de Endereços IP do Host Origem e Destino")
+    print("=" * 60)
+
+    if src_host not in G.nodes:
+        print(f"\n✗ ERRO: Host '{src_host}' não existe na rede!")
+        return None, None
+
+    if dst_host not in G.nodes:
+        print(f"\n✗ ERRO: Host '{dst_host}' não existe na rede!")
+        return None, None
+
+    if src_host not in ip_addresses:
+        print(f"\n✗ ERRO: IP do host '{src_host}' não está mapeado!")
+        return None, None
+
+    if dst_host not in ip_addresses:
+        print(f"\n✗ ERRO: IP do host '{dst_host}' não está mapeado!")
+        return None, None
+
+    src_ip = ip_addresses[src_host]
+    dst_ip = ip_addresses[dst_host]
+
+    print(f"\n✓ Host de Origem Localizado:")
+    print(f"  - Nome do Host: {src_host}")
+    print(f"  - Endereço IP: {src_ip}")
+
+    print(f"\n✓ Host de Destino Localizado:")
+    print(f"  - Nome do Host: {dst_host}")
+    print(f"  - Endereço IP: {dst_ip}")
+
+    if route_cache.route(G, src_host, dst_host)[0] is None:
+        print(f"\n✗ AVISO: Host de destino {dst_host} ({dst_ip}) é inalcançável a partir de {src_host} ({src_ip})!")
+        return None, None
+
+    print(f"\n✓ Conectividade: OK (Caminho existe entre os hosts)")
+    print("=" * 60 + "\n")
+
+    return src_ip, dst_ip
+
+
+def summarize_rtt(rtt_times):
+    """Estatísticas (mínimo, máximo e média) de uma lista de amostras de RTT."""
+    if not rtt_times:
+        return {"rtt_min": None, "rtt_max": None, "rtt_mean": None}
+    return {
+        "rtt_min": min(rtt_times),
+        "rtt_max": max(rtt_times),
+        "rtt_mean": sum(rtt_times) / len(rtt_times)
+    }
+
+
+@instrumented("probe_pair")
+def probe_pair(G, src, dst, num_samples=3, packet_size_bits=8000, rng=random, addresses=None, flow=0):
+    """
+    Executa uma medição XProbe entre dois hosts, sem interação nem saída no console.
+
+    Retorna um dicionário com o status ("ok", "unreachable" ou "error"), os
+    IPs, a rota, as amostras de RTT (ms) e as estatísticas de `summarize_rtt`.
+    `rng` fornece a variação de cada amostra (padrão: módulo `random`) e
+    `addresses` o mapa nó → IP (padrão: a rede atual). Com uplinks
+    redundantes, `flow` escolhe pelo hash qual caminho de mesmo custo a sonda segue.
+    """
+    addresses = ip_addresses if addresses is None else addresses
+    result = {"src": src, "dst": dst, "samples": num_samples, "packet_size": packet_size_bits}
+
+    for host in (src, dst):
+        if host not in G.nodes:
+            result.update(status="error", error=f"Host '{host}' não existe na rede")
+            return result
+
+    result["src_ip"] = addresses.get(src)
+    result["dst_ip"] = addresses.get(dst)
+
+    # Rota e atraso base resolvidos uma vez por topologia (cache LRU versionado)
+    path, per_bit, fixed = route_cache.route(G, src, dst, flow)
+    if path is None:
+        if metrics.enabled:
+            metrics.count("probes_unreachable")
+        result["status"] = "unreachable"
+        return result
+
+    path = list(path)
+    base_rtt = 2 * (fixed + packet_size_bits * per_bit)
+    rtt_times = [base_rtt * rng.uniform(*RTT_JITTER) for _ in range(num_samples)]
+    if metrics.enabled:
+        metrics.count("rtt_samples", num_samples)
+    result.update(status="ok", path=path, hops=len(path) - 1, rtt_ms=rtt_times)
+    result.update(summarize_rtt(rtt_times))
+    return result
+
+
+@instrumented("xprobe_rtt")
+def xprobe_rtt(G, src, dst, num_samples=3, packet_size_bits=8000, sample_interval=0.5, rng=random):
+    """Simula o XProbe (Medição de RTT) com N amostras."""
+    print("\n" + "=" * 60)
+    print("[Etapa 3] Simulação XProbe/RTT - Verificação de Disponibilidade")
+    print("=" * 60)
+
+    result = probe_pair(G, src, dst, num_samples, packet_size_bits, rng)
+
+    if result["status"] == "error":
+        print(f"\n✗ ERRO: Host {src} ou {dst} não existe na rede!")
+        return None
+
+    if result["status"] == "unreachable":
+        print(
+            f"\n✗ ERRO: Host destino {dst} ({ip_addresses[dst]}) é INALCANÇÁVEL a partir de {src} ({ip_addresses[src]})!")
+        print("❌ HOST DESTINO INATIVO ou SEM CAMINHO DE REDE")
+        print("=" * 60 + "\n")
+        return None
+
+    print(f"\n✓ Host Destino ATIVO e ALCANÇÁVEL")
+    print(f"  - Origem: {src} ({ip_addresses[src]})")
+    print(f"  - Destino: {dst} ({ip_addresses[dst]})")
+
+    print(f"\n--- Coleta de Amostras de RTT ---")
+
+    path = result["path"]
+    print(f"  - Rota (Saltos): {' → '.join(path)}")
+    print(f"  - Número de saltos: {result['hops']}")
+
+    # Mostrar tipos de conexão no caminho
+    print(f"\n  - Tipos de conexão no caminho:")
+    for i in range(len(path) - 1):
+        u, v = path[i], path[i + 1]
+        conn_type = G[u][v].get('connection_type', 'desconhecido')
+        print(f"    {u} → {v}: {CONNECTION_NAMES.get(conn_type, conn_type)}")
+
+    print()
+
+    for i, rtt in enumerate(result["rtt_ms"]):
+        print(f"  Amostra {i + 1}: RTT = {rtt:.4f} ms")
+        if sample_interval:
+            time.sleep(sample_interval)
+
+    if result["rtt_ms"]:
+        print("\n" + "=" * 60)
+        print("✅ RESULTADO DA SIMULAÇÃO XPROBE")
+        print("=" * 60)
+        print(f"  RTT Mínimo: {result['rtt_min']:.4f} ms")
+        print(f"  RTT Máximo: {result['rtt_max']:.4f} ms")
+        print(f"  📊 RTT MÉDIO: {result['rtt_mean']:.4f} ms")
+        print("=" * 60 + "\n")
+
+        return result["rtt_mean"]
+
+    return None
+
+
+def profile_xprobe(G, src, dst, output=None, **kwargs):
+    """
+    Executa uma única medição `xprobe_rtt` sob o cProfile.
+
+    Com `output`, grava as estatísticas brutas nesse arquivo (legível por
+    `pstats`/snakeviz); sem ele, mostra as 20 funções de maior tempo acumulado.
+    Retorna o mesmo que `xprobe_rtt`.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(xprobe_rtt, G, src, dst, **kwargs)
+    if output:
+        profiler.dump_stats(output)
+        print(f"✓ Perfil da medição salvo em '{output}'")
+    else:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    return result
+
+
+# --- Agendador Assíncrono de Sondas ---
+
+def session_rng(seed, session):
+    """Gerador próprio de cada sessão, derivado de uma semente global."""
+    return random.Random(f"{seed}-{session}") if seed is not None else random.Random()
+
+
+class RateLimiter:
+    """
+    Token bucket assíncrono: no máximo `rate` amostras por segundo.
+
+    `burst` é quantas amostras podem sair de uma vez depois de um período
+    ocioso; o padrão é 1, então as amostras saem espaçadas de 1/`rate` desde
+    o início, em vez de um segundo inteiro de amostras de uma vez.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ProbeScheduler:
+    """
+    Agendador asyncio que executa muitas sessões XProbe ao mesmo tempo.
+
+    Cada sessão coleta `num_samples` amostras espaçadas de `sample_interval`
+    segundos (o mesmo ritmo de `xprobe_rtt`), mas as sessões correm em
+    paralelo, então uma varredura completa leva o tempo da sessão mais longa.
+    `rate_limit` limita as amostras por segundo somadas de todas as sessões e
+    `max_concurrency` o número de sessões simultâneas. `cancel()` interrompe
+    a varredura; sessões interrompidas voltam com status "cancelled" e as
+    amostras já coletadas.
+
+    Cada resultado tem o mesmo formato de `probe_pair`. Com `seed`, a sessão
+    `i` usa `session_rng(seed, i)`, e `probe_pair(..., rng=session_rng(seed, i))`
+    reproduz exatamente as mesmas amostras.
+    """
+
+    def __init__(self, G, num_samples=3, sample_interval=0.5, packet_size_bits=8000,
+                 rate_limit=None, max_concurrency=None, seed=None):
+        self.G = G
+        self.num_samples = num_samples
+        self.sample_interval = sample_interval
+        self.packet_size_bits = packet_size_bits
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.seed = seed
+        self._tasks = []
+        self._cancelled = False
+
+    async def _session(self, session, src, dst, limiter):
+        result = probe_pair(self.G, src, dst, 0, self.packet_size_bits)
+        if result["status"] != "ok":
+            return result
+
+        rng = session_rng(self.seed, session)
+        result["samples"] = self.num_samples
+        try:
+            for sample in range(self.num_samples):
+                if sample and self.sample_interval:
+                    await asyncio.sleep(self.sample_interval)
+                if limiter is not None:
+                    await limiter.acquire()
+                result["rtt_ms"].append(get_path_latency(self.G, src, dst, self.packet_size_bits, rng))
+        except asyncio.CancelledError:
+            result["status"] = "cancelled"
+        result.update(summarize_rtt(result["rtt_ms"]))
+        return result
+
+    async def run(self, pairs, on_result=None):
+        """Executa uma sessão por par (origem, destino); retorna os resultados na ordem dos pares."""
+        pairs = list(pairs)
+        results = [None] * len(pairs)
+        limiter = RateLimiter(self.rate_limit) if self.rate_limit else None
+        pending = iter(enumerate(pairs))
+        self._cancelled = False
+
+        async def worker():
+            for session, (src, dst) in pending:
+                if self._cancelled:
+                    results[session] = {"src": src, "dst": dst, "status": "cancelled", "rtt_ms": [],
+                                        **summarize_rtt([])}
+                else:
+                    results[session] = await self._session(session, src, dst, limiter)
+                if on_result is not None:
+                    on_result(results[session])
+
+        num_workers = min(len(pairs), self.max_concurrency or len(pairs))
+        self._tasks = [asyncio.create_task(worker()) for _ in range(num_workers)]
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+        return results
+
+    def cancel(self):
+        """Cancela a varredura em andamento."""
+        self._cancelled = True
+        for task in self._tasks:
+            task.cancel()
+
+
+def all_host_pairs(host_list):
+    """Todos os pares ordenados (origem, destino) de hosts distintos."""
+    return [(src, dst) for src in host_list for dst in host_list if src != dst]
+
+
+def probe_sweep(G, pairs, **scheduler_options):
+    """Versão síncrona: executa a varredura com `ProbeScheduler` e retorna os resultados."""
+    return asyncio.run(ProbeScheduler(G, **scheduler_options).run(pairs))
+
+
+# --- Amostragem Monte Carlo do RTT ---
+
+RTT_PERCENTILES = (50, 95, 99, 99.9)
+
+
+def sample_rtt_distribution(G, src, dst, num_samples=100_000, seed=None, packet_size_bits=8000,
+                            percentiles=RTT_PERCENTILES, bins=None):
+    """
+    Perfil estatístico do RTT entre dois hosts a partir de muitas amostras.
+
+    O atraso do caminho é calculado uma única vez e toda a variação é
+    sorteada em uma só chamada de um `numpy.random.Generator` semeado com
+    `seed`, então a mesma semente sempre produz o mesmo perfil. Retorna
+    mínimo, máximo, média, desvio padrão e os percentis pedidos (chaves
+    "p50", "p99.9", ...); com `bins`, inclui também o histograma.
+    """
+    result = {"src": src, "dst": dst, "samples": num_samples, "packet_size": packet_size_bits}
+    for host in (src, dst):
+        if host not in G.nodes:
+            result.update(status="error", error=f"Host '{host}' não existe na rede")
+            return result
+
+    base_rtt = 2 * get_path_index(G).path_delay(src, dst, packet_size_bits)
+    if base_rtt == float('inf'):
+        result["status"] = "unreachable"
+        return result
+
+    rng = np.random.default_rng(seed)
+    rtt = base_rtt * rng.uniform(*RTT_JITTER, size=num_samples)
+
+    result.update(status="ok", base_rtt=base_rtt, rtt_min=float(rtt.min()), rtt_max=float(rtt.max()),
+                  rtt_mean=float(rtt.mean()), rtt_std=float(rtt.std()))
+    result["percentiles"] = {f"p{q:g}": float(value)
+                             for q, value in zip(percentiles, np.percentile(rtt, percentiles))}
+    if bins:
+        counts, edges = np.histogram(rtt, bins=bins)
+        result["histogram"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    return result
+
+
+# --- Varredura de Cenários (multiprocessamento) ---
+
+# Faixas fixas de RTT (ms) compartilhadas por todos os workers, para que os
+# histogramas possam ser somados sem reenviar amostras ou grafos
+SCENARIO_RTT_EDGES = np.linspace(0.0, 1.0, 201)
+
+
+def path_media_mix(G, path):
+    """Identifica a mistura de meios de um caminho, ex.: "fibra_optica:4,par_trancado:2"."""
+    counts = {}
+    for u, v in zip(path, path[1:]):
+        media = G[u][v].get('connection_type', 'desconhecido')
+        counts[media] = counts.get(media, 0) + 1
+    return ",".join(f"{media}:{count}" for media, count in sorted(counts.items()))
+
+
+def run_scenario(seed_sequence, samples_per_pair=100, rtt_edges=SCENARIO_RTT_EDGES):
+    """
+    Gera uma topologia aleatória com a semente dada e sonda todos os pares de hosts.
+
+    Retorna só os histogramas de RTT agregados por mistura de meios do
+    caminho ({mistura: contagens}), nunca o grafo. RTTs acima da última faixa
+    entram na última faixa.
+    """
+    rng = random.Random(int(seed_sequence.generate_state(1)[0]))
+    graph, _, host_list, _ = setup_network_random(rng)
+    assign_connection_types(graph, host_list, rng)
+    index = get_path_index(graph)
+    np_rng = np.random.default_rng(seed_sequence)
+
+    histograms = {}
+    for i, src in enumerate(host_list):
+        for dst in host_list[i + 1:]:
+            mix = path_media_mix(graph, index.path(src, dst))
+            rtt = 2 * index.path_delay(src, dst) * np_rng.uniform(*RTT_JITTER, size=samples_per_pair)
+            counts, _ = np.histogram(np.minimum(rtt, rtt_edges[-1]), bins=rtt_edges)
+            if mix in histograms:
+                histograms[mix] += counts
+            else:
+                histograms[mix] = counts
+    return histograms
+
+
+def histogram_percentile(counts, edges, q):
+    """Percentil aproximado (ms) de um histograma, pelo ponto médio da faixa."""
+    cumulative = np.cumsum(counts)
+    if not cumulative[-1]:
+        return None
+    position = np.searchsorted(cumulative, q / 100 * cumulative[-1])
+    return float((edges[position] + edges[position + 1]) / 2)
+
+
+def scenario_sweep(num_topologies, seed=0, workers=None, samples_per_pair=100, rtt_edges=SCENARIO_RTT_EDGES):
+    """
+    Varre `num_topologies` topologias aleatórias em um pool de processos.
+
+    Cada topologia recebe uma semente independente derivada de `seed`
+    (`numpy.random.SeedSequence.spawn`), então o resultado final não depende
+    da ordem de execução nem do número de workers. A cada topologia concluída
+    é emitido um dicionário com o progresso e as distribuições agregadas até
+    ali ({mistura de meios: contagens por faixa de `rtt_edges`}). No máximo
+    2 × workers topologias ficam em andamento ao mesmo tempo.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(num_topologies)
+    workers = workers or os.cpu_count() or 1
+    distributions = {}
+    completed = 0
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        next_scenario = 0
+        while next_scenario < num_topologies or pending:
+            while next_scenario < num_topologies and len(pending) < 2 * workers:
+                future = executor.submit(run_scenario, seeds[next_scenario], samples_per_pair, rtt_edges)
+                pending[future] = next_scenario
+                next_scenario += 1
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                scenario = pending.pop(future)
+                for mix, counts in future.result().items():
+                    if mix in distributions:
+                        distributions[mix] += counts
+                    else:
+                        distributions[mix] = counts
+                completed += 1
+                yield {"completed": completed, "total": num_topologies, "scenario": scenario,
+                       "distributions": distributions}
+
+
+# --- Matriz de RTT (todos os pares) ---
+
+def rtt_matrix(G, host_list=None, num_samples=3, seed=None, block_size=1024, packet_size_bits=8000):
+    """
+    Calcula o RTT de todos os pares de hosts em uma única passada vetorizada.
+
+    Usa o índice de caminhos da rede: o RTT base de cada par sai do atraso
+    acumulado até o ancestral comum mais baixo (LCA), sem nenhuma busca de
+    caminho por par. Cada uma das `num_samples` amostras aplica a mesma
+    variação de `get_path_latency`. Com uplinks redundantes, cada par segue o
+    seu caminho de mesmo custo (`path_delay`, um hash por par), bem mais
+    devagar que a passada vetorizada.
+
+    Retorna (stats, host_index): stats é um dicionário com as matrizes N×N
+    "mean", "min" e "max" (ms, inf para pares inalcançáveis) e host_index
+    mapeia o nome de cada host para sua linha/coluna.
+    """
+    if host_list is None:
+        host_list = hosts
+    host_list = list(host_list)
+    host_index = {host: i for i, host in enumerate(host_list)}
+    n = len(host_list)
+
+    index = get_path_index(G)
+    host_ids = np.array([index.ids[host] for host in host_list], dtype=np.int64)
+    host_comp = index.component[host_ids]
+    root_delay = index.root_delay(packet_size_bits)
+    host_delay = root_delay[host_ids]
+
+    base = np.empty((n, n))
+    if index.redundant:
+        for row, src in enumerate(host_list):
+            base[row] = [2 * index.path_delay(src, dst, packet_size_bits) for dst in host_list]
+    else:
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            lca = index.lca_ids(host_ids[start:stop, None], host_ids[None, :])
+            one_way = host_delay[start:stop, None] + host_delay[None, :] - 2 * root_delay[lca]
+            connected = host_comp[start:stop, None] == host_comp[None, :]
+            base[start:stop] = np.where(connected, 2 * one_way, np.inf)
+
+    rng = np.random.default_rng(seed)
+    rtt_sum = np.zeros((n, n))
+    rtt_min = np.full((n, n), np.inf)
+    rtt_max = np.full((n, n), -np.inf)
+    for _ in range(num_samples):
+        sample = base * rng.uniform(*RTT_JITTER, size=(n, n))
+        rtt_sum += sample
+        np.minimum(rtt_min, sample, out=rtt_min)
+        np.maximum(rtt_max, sample, out=rtt_max)
+
+    stats = {"mean": rtt_sum / max(num_samples, 1), "min": rtt_min, "max": rtt_max}
+    return stats, host_index
+
+
+# --- Carga dos Enlaces (Matriz de Tráfego) ---
+
+def _traffic_chunks(traffic, block_size):
+    """Lotes (origens, destinos, demandas) a partir de uma matriz densa ou de um iterável esparso."""
+    if isinstance(traffic, np.ndarray) and traffic.ndim == 2:
+        for start in range(0, traffic.shape[0], block_size):
+            block = traffic[start:start + block_size]
+            src, dst = np.nonzero(block)
+            yield src + start, dst, block[src, dst]
+    else:
+        yield from traffic
+
+
+def _ecmp_link_loads(index, src, dst, demand, loads):
+    """
+    Soma as demandas entre IDs conectados em `loads` (por enlace direcionado,
+    2·enlace subindo e 2·enlace + 1 descendo), seguindo o caminho de mesmo
+    custo que `flow_hash` escolhe para cada par, o mesmo das sondas. A
+    demanda entre dois switches com um só caminho é somada antes de
+    percorrê-lo; só os pares com vários caminhos pagam um hash por entrada.
+    """
+    ecmp = index.ecmp()
+    n = len(index)
+    leaf = np.asarray(ecmp.is_leaf)
+    parent_edge = index.topology.parent_edge
+    moving = src != dst
+    src, dst, demand = src[moving], dst[moving], demand[moving]
+
+    # Enlaces de acesso dos hosts nas pontas
+    at_src, at_dst = leaf[src], leaf[dst]
+    loads += np.bincount(2 * parent_edge[src[at_src]], demand[at_src], len(loads))
+    loads += np.bincount(2 * parent_edge[dst[at_dst]] + 1, demand[at_dst], len(loads))
+
+    # Demanda por par de switches e por caminho escolhido
+    a = np.where(at_src, index.parent[src], src)
+    b = np.where(at_dst, index.parent[dst], dst)
+    pairs, inverse = np.unique(a * n + b, return_inverse=True)
+    routes = [ecmp.switch_routes(*divmod(pair, n)) for pair in pairs.tolist()]
+    counts = [len(pair_routes) for pair_routes in routes]
+    weights = np.zeros((len(pairs), ecmp.max_paths))
+    hashed = (np.asarray(counts) > 1)[inverse]
+    weights[:, 0] = np.bincount(inverse[~hashed], demand[~hashed], len(pairs))
+    names = index.nodes
+    for s, d, amount, pair in zip(src[hashed].tolist(), dst[hashed].tolist(),
+                                  demand[hashed].tolist(), inverse[hashed].tolist()):
+        weights[pair, flow_hash(names[s], names[d]) % counts[pair]] += amount
+
+    for pair, choice in zip(*np.nonzero(weights)):
+        nodes = routes[pair][choice][0]
+        for u_id, v_id in zip(nodes, nodes[1:]):
+            loads[ecmp.link(u_id, v_id)] += weights[pair, choice]
+
+
+def link_loads(G, traffic, host_list=None, block_size=1024):
+    """
+    Carga (bits/s) de cada enlace da árvore para uma matriz de tráfego host → host.
+
+    `traffic` é uma matriz N×N (linha = origem, coluna = destino, na ordem de
+    `host_list`) ou um iterável de lotes esparsos (origens, destinos,
+    demandas), com os índices dos hosts em `host_list`; assim 10^7 entradas
+    passam em lotes sem montar a matriz densa.
+
+    Cada demanda soma +x na origem e −x no ancestral comum (LCA) do par; a
+    carga de subida do enlace de um nó é a soma disso na sua subárvore, que
+    é um intervalo contíguo da pré-ordem (saída por soma de prefixos). A
+    descida é análoga a partir do destino. Tempo linear no número de nós e
+    de demandas.
+
+    Retorna um dicionário com os arrays "up" (filho → pai) e "down" (pai →
+    filho), indexados pelo ID do nó filho no índice de caminhos, e
+    "unroutable" (demanda entre hosts sem caminho).
+
+    Com uplinks redundantes, cada demanda segue o caminho de mesmo custo do
+    seu par (`EcmpPaths`, o mesmo das sondas) e os enlaces fora da árvore
+    vêm em "extra_edges" (IDs dos enlaces), "extra_up" (do nó mais fundo para
+    o mais raso) e "extra_down". Esse caminho custa um hash por demanda entre
+    switches com vários caminhos.
+    """
+    if host_list is None:
+        host_list = hosts
+    index = get_path_index(G)
+    host_ids = np.array([index.ids[host] for host in host_list], dtype=np.int64)
+    n = len(index)
+
+    up = np.zeros(n)
+    down = np.zeros(n)
+    directed = np.zeros(2 * index.topology.num_edges) if index.redundant else None
+    unroutable = 0.0
+    for src, dst, demand in _traffic_chunks(traffic, block_size):
+        src = host_ids[np.asarray(src, dtype=np.int64)]
+        dst = host_ids[np.asarray(dst, dtype=np.int64)]
+        demand = np.asarray(demand, dtype=float)
+        connected = index.component[src] == index.component[dst]
+        unroutable += float(demand[~connected].sum())
+        src, dst, demand = src[connected], dst[connected], demand[connected]
+        if directed is not None:
+            _ecmp_link_loads(index, src, dst, demand, directed)
+            continue
+        top = index.lca_ids(src, dst)
+        lca_demand = np.bincount(top, demand, n)
+        up += np.bincount(src, demand, n) - lca_demand
+        down += np.bincount(dst, demand, n) - lca_demand
+
+    if directed is not None:
+        # Enlaces da árvore voltam aos arrays por nó filho; os demais ficam à parte
+        children = np.flatnonzero(index.parent >= 0)
+        tree = np.zeros(index.topology.num_edges, dtype=bool)
+        tree[index.topology.parent_edge[children]] = True
+        up[children] = directed[2 * index.topology.parent_edge[children]]
+        down[children] = directed[2 * index.topology.parent_edge[children] + 1]
+        extra = np.flatnonzero(~tree)
+        return {"up": up, "down": down, "unroutable": unroutable,
+                "extra_edges": extra, "extra_up": directed[2 * extra], "extra_down": directed[2 * extra + 1]}
+
+    # Soma de cada subárvore: intervalo [v, v + size[v]) da pré-ordem
+    ends = np.arange(n) + index.size
+    for contributions in (up, down):
+        prefix = np.concatenate([[0.0], np.cumsum(contributions)])
+        contributions[:] = prefix[ends] - prefix[:-1]
+        contributions[index.parent < 0] = 0.0
+    return {"up": up, "down": down, "unroutable": unroutable}
+
+
+def link_utilization(G, loads, top=10):
+    """
+    Utilização dos enlaces (carga / capacidade) a partir do resultado de `link_loads`.
+
+    A capacidade de cada enlace é a taxa do modelo de latência (largura de
+    banda configurada ou velocidade do meio). Retorna um dicionário com os
+    `top` sentidos de enlace mais utilizados ("bottlenecks"), o número de
+    sentidos acima de 100% ("overloaded", incluindo os enlaces fora da árvore
+    de uma rede com uplinks redundantes) e, para a raiz e cada switch de
+    agregação, a taxa de sobreinscrição ("oversubscription"): capacidade de
+    acesso dos hosts abaixo do switch / capacidade do seu enlace de subida
+    (para a raiz, a soma dos seus enlaces para a agregação). Hosts são os
+    nós pendurados nos switches de borda (os que têm sub-rede), não qualquer
+    folha da árvore.
+    """
+    index = get_path_index(G)
+    topology = index.topology
+    rates = index.latency_model.link_rates(topology)
+    n = len(index)
+
+    children = np.flatnonzero(index.parent >= 0)
+    capacity = np.full(n, np.nan)
+    capacity[children] = rates[topology.parent_edge[children]]
+
+    # Sentidos de enlace: subidas e descidas da árvore e, com uplinks redundantes, os demais enlaces
+    lower, upper = children, index.parent[children]
+    link_load = [loads["up"][children], loads["down"][children]]
+    link_capacity = capacity[children]
+    extra = loads.get("extra_edges")
+    if extra is not None and len(extra):
+        ends = np.array([_link_ends(index, edge) for edge in extra.tolist()], dtype=np.int64)
+        lower, upper = np.concatenate([lower, ends[:, 0]]), np.concatenate([upper, ends[:, 1]])
+        link_load = [np.concatenate([link_load[0], loads["extra_up"]]),
+                     np.concatenate([link_load[1], loads["extra_down"]])]
+        link_capacity = np.concatenate([link_capacity, rates[extra]])
+    utilization = np.concatenate(link_load) / np.tile(link_capacity, 2)
+
+    count = min(top, len(utilization))
+    ranked = np.argpartition(-utilization, count - 1)[:count] if count else np.array([], dtype=np.int64)
+    ranked = ranked[np.argsort(-utilization[ranked], kind='stable')]
+    bottlenecks = []
+    for position in ranked.tolist():
+        link = position % len(lower)
+        upward = position < len(lower)
+        ends = (index.nodes[int(lower[link])], index.nodes[int(upper[link])])
+        bottlenecks.append({
+            "from": ends[0] if upward else ends[1],
+            "to": ends[1] if upward else ends[0],
+            "load_bps": float(link_load[0 if upward else 1][link]),
+            "capacity_bps": float(link_capacity[link]),
+            "utilization": float(utilization[position]),
+        })
+
+    # Capacidade de acesso (enlaces dos hosts) somada por subárvore
+    is_edge_switch = np.zeros(n, dtype=bool)
+    is_edge_switch[index.subnet_ids] = True
+    is_host = (index.parent >= 0) & is_edge_switch[np.maximum(index.parent, 0)] & ~is_edge_switch
+    access_below = _subtree_sums(index, np.where(is_host, np.nan_to_num(capacity), 0.0))
+
+    oversubscription = {}
+    listed = ((index.depth == 1) & ~is_host) | ((index.depth == 0) & (index.size > 1))
+    for switch in np.flatnonzero(listed).tolist():
+        if index.parent[switch] >= 0:
+            uplink = capacity[switch]
+        else:
+            uplink = capacity[index.parent == switch].sum()
+        oversubscription[index.nodes[switch]] = {
+            "access_bps": float(access_below[switch]),
+            "uplink_bps": float(uplink),
+            "ratio": float(access_below[switch] / uplink) if uplink else float('inf'),
+        }
+
+    return {"bottlenecks": bottlenecks, "overloaded": int((utilization > 1).sum()),
+            "oversubscription": oversubscription, "unroutable_bps": loads["unroutable"]}
+
+
+def display_link_utilization(report):
+    """Exibe os gargalos e a sobreinscrição calculados por `link_utilization`."""
+    print("\n" + "=" * 80)
+    print("UTILIZAÇÃO DOS ENLACES (MATRIZ DE TRÁFEGO)")
+    print("=" * 80)
+    print(f"{'Origem':<12} {'Destino':<12} {'Carga':>14} {'Capacidade':>14} {'Utilização':>12}")
+    print("-" * 80)
+    for link in report["bottlenecks"]:
+        print(f"{link['from']:<12} → {link['to']:<10} {link['load_bps'] / 1e6:>10.1f} Mbps "
+              f"{link['capacity_bps'] / 1e6:>9.1f} Mbps {link['utilization'] * 100:>11.1f}%")
+    print("-" * 80)
+    print(f"Sentidos de enlace acima da capacidade: {report['overloaded']}")
+    if report["unroutable_bps"]:
+        print(f"Demanda sem caminho: {report['unroutable_bps'] / 1e6:.1f} Mbps")
+    print("\nSobreinscrição (acesso dos hosts / enlace de subida):")
+    for switch, ratio in report["oversubscription"].items():
+        print(f"  {switch:<8} {ratio['access_bps'] / 1e9:>10.1f} Gbps / {ratio['uplink_bps'] / 1e9:>8.1f} Gbps"
+              f" = {ratio['ratio']:.2f}:1")
+    print("=" * 80 + "\n")
+
+
+# --- Análise de Falha Única (what-if) ---
+
+def _subtree_sums(index, values):
+    """Soma de `values` em cada subárvore (intervalo [v, v + size[v]) da pré-ordem)."""
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    return prefix[np.arange(len(index)) + index.size] - prefix[:-1]
+
+
+def _ranked(order_keys, top):
+    """Posições em ordem decrescente de criticidade (limitadas a `top`)."""
+    order = np.lexsort(order_keys)[::-1]
+    return order if top is None else order[:top]
+
+
+@instrumented("failure_impact")
+def failure_impact(G, host_list=None, packet_size_bits=8000, top=20):
+    """
+    Impacto da falha de cada enlace e de cada switch, uma falha por vez, sem
+    remover nada do grafo.
+
+    Na árvore, derrubar o enlace de subida de um nó com s hosts abaixo (de N
+    no componente) separa s·(N − s) pares de hosts; derrubar um switch separa
+    também as subárvores dos seus filhos entre si. O RTT médio entre os pares
+    que continuam conectados sai da soma das distâncias de todos os pares,
+    Σ atraso(e)·s(e)·(N − s(e)), corrigida para cada falha a partir de somas
+    por subárvore (intervalos da pré-ordem) e por caminho até a raiz. Tudo
+    em uma passada linear no número de nós, sem nenhum `nx.has_path`.
+
+    Retorna um dicionário com o total de hosts e de pares conectados, o RTT
+    médio atual e as listas "links" e "switches" ordenadas por pares perdidos
+    e aumento do RTT médio (as `top` primeiras; None para todas). Redes com
+    uplinks redundantes não são árvores e são recusadas (`ValueError`).
+    """
+    if host_list is None:
+        host_list = hosts
+    index = get_path_index(G)
+    if G.graph.get("failed_links"):
+        # Falhas incrementais não renumeram a pré-ordem: parte de uma árvore limpa
+        index = PathIndex(CompactTopology.from_graph(G), get_latency_model(G))
+    if index.redundant:
+        raise ValueError("A análise de falha única exige uma árvore (a rede tem uplinks redundantes)")
+    n = len(index)
+    parent = index.parent
+    has_uplink = parent >= 0
+    root = index.component
+
+    is_host = np.zeros(n, dtype=bool)
+    is_host[[index.ids[host] for host in host_list]] = True
+    below = _subtree_sums(index, is_host.astype(float))
+
+    # Atraso de ida (pacote de `packet_size_bits`) do enlace de subida de cada nó
+    per_bit, fixed = index.latency_model.edge_costs(index.topology)
+    uplink = index.topology.parent_edge[has_uplink]
+    weight = np.zeros(n)
+    weight[has_uplink] = fixed[uplink] + packet_size_bits * per_bit[uplink]
+    ws, ws2 = weight * below, weight * below ** 2
+    sub_ws, sub_ws2 = _subtree_sums(index, ws), _subtree_sums(index, ws2)
+    # Mesmas somas ao longo do caminho da raiz até cada nó
+    path_w, path_ws = weight.copy(), ws.copy()
+    for level in index.levels[1:]:
+        path_w[level] += path_w[parent[level]]
+        path_ws[level] += path_ws[parent[level]]
+
+    def pairs(count):
+        return count * (count - 1) / 2
+
+    # Totais por componente e da rede: soma das distâncias e número de pares
+    total = below[root]
+    roots = np.flatnonzero(~has_uplink)
+    component_sum = total * sub_ws[root] - sub_ws2[root]
+    network_sum = float((below[roots] * sub_ws[roots] - sub_ws2[roots]).sum())
+    network_pairs = float(pairs(below[roots]).sum())
+    mean_rtt = 2 * network_sum / network_pairs if network_pairs else float('nan')
+
+    # Pares e distâncias que sobram dentro da subárvore de cada nó e no resto do componente
+    inside = below * (sub_ws - ws) - (sub_ws2 - ws2)
+    safe_parent = np.where(has_uplink, parent, 0)
+    ancestors = np.where(has_uplink, 2 * path_ws[safe_parent] - total * path_w[safe_parent], 0.0)
+    outside = ((total - below) * (sub_ws[root] - sub_ws) - (sub_ws2[root] - sub_ws2)
+               + below * ancestors)
+
+    def impact(lost, survived_sum, survived_pairs):
+        after_pairs = network_pairs - pairs(total) + survived_pairs
+        after_sum = network_sum - component_sum + survived_sum
+        with np.errstate(invalid='ignore', divide='ignore'):
+            after = np.where(after_pairs > 0, 2 * after_sum / after_pairs, np.nan)
+        return lost, after
+
+    # Enlaces: o de subida de cada nó
+    link_lost, link_rtt = impact(below * (total - below), inside + outside,
+                                 pairs(below) + pairs(total - below))
+    # Switches: as subárvores dos filhos ficam isoladas entre si e do resto
+    children_sum = np.zeros(n)
+    children_pairs = np.zeros(n)
+    np.add.at(children_sum, parent[has_uplink], inside[has_uplink])
+    np.add.at(children_pairs, parent[has_uplink], pairs(below[has_uplink]))
+    switch_lost = pairs(total) - children_pairs - pairs(total - below)
+    switch_lost, switch_rtt = impact(switch_lost, children_sum + outside, children_pairs + pairs(total - below))
+
+    def entry(node_id, lost, rtt):
+        return {"hosts_cut": int(below[node_id]), "pairs_lost": int(round(lost)),
+                "pairs_lost_fraction": float(lost / network_pairs) if network_pairs else 0.0,
+                "mean_rtt_ms": float(rtt), "rtt_change_ms": float(rtt - mean_rtt)}
+
+    links = np.flatnonzero(has_uplink)
+    switches = np.flatnonzero(~is_host)
+    link_order = _ranked((np.nan_to_num(link_rtt[links]), link_lost[links]), top)
+    switch_order = _ranked((np.nan_to_num(switch_rtt[switches]), switch_lost[switches]), top)
+    return {
+        "hosts": int(is_host.sum()),
+        "pairs": int(network_pairs),
+        "mean_rtt_ms": mean_rtt,
+        "links": [{"link": (index.nodes[int(parent[node])], index.nodes[node]),
+                   **entry(node, link_lost[node], link_rtt[node])}
+                  for node in links[link_order].tolist()],
+        "switches": [{"switch": index.nodes[node], **entry(node, switch_lost[node], switch_rtt[node])}
+                     for node in switches[switch_order].tolist()],
+    }
+
+
+def display_failure_impact(report):
+    """Exibe o relatório de criticidade calculado por `failure_impact`."""
+    print("\n" + "=" * 80)
+    print("CRITICIDADE (FALHA ÚNICA DE ENLACE OU SWITCH)")
+    print("=" * 80)
+    print(f"Hosts: {report['hosts']}  |  Pares conectados: {report['pairs']}  |  "
+          f"RTT médio: {report['mean_rtt_ms']:.4f} ms")
+    for kind, label in (("switches", "Switch"), ("links", "Enlace")):
+        print(f"\n{label:<24} {'Hosts':>8} {'Pares perdidos':>16} {'% pares':>9} {'Δ RTT médio':>14}")
+        print("-" * 80)
+        for item in report[kind]:
+            name = item["switch"] if kind == "switches" else " ↔ ".join(item["link"])
+            print(f"{name:<24} {item['hosts_cut']:>8} {item['pairs_lost']:>16} "
+                  f"{item['pairs_lost_fraction'] * 100:>8.2f}% {item['rtt_change_ms']:>+11.4f} ms")
+    print("=" * 80 + "\n")
+
+
+# --- Reprodução de Traces de Tráfego (streaming) ---
+
+TRACE_COLUMNS = ("timestamp", "src", "dst", "bytes")
+TRACE_FORMATS = ("csv", "jsonl")
+TRACE_CHUNK_BYTES = 16 << 20  # lido e interpretado por vez (~350 mil registros)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_HASH_FOLD = np.uint64(0xC2B2AE3D27D4EB4F)
+
+
+def _text_words(texts):
+    """
+    Os 16 primeiros bytes de cada IP em texto como duas palavras uint64
+    (lidas direto do buffer, sem cópia por caractere). Um IP tem no máximo
+    15 caracteres, então textos mais longos nunca coincidem com um endereço.
+    """
+    raw = np.ascontiguousarray(texts, dtype='S17')
+    lo = np.ndarray((len(raw),), dtype='<u8', buffer=raw, offset=0, strides=(17,)).copy()
+    hi = np.ndarray((len(raw),), dtype='<u8', buffer=raw, offset=8, strides=(17,)).copy()
+    return lo, hi
+
+
+class AddressIndex:
+    """
+    Índice reverso IP → ID do nó no índice de caminhos, montado a partir de
+    `ip_addresses`. Os textos "a.b.c.d" de um lote viram pares de palavras
+    uint64 (veja `_text_words`) procurados em uma tabela hash, sem converter
+    cada IP em Python; só os que não batem (zeros à esquerda, espaços, IPs de
+    fora da rede) passam pela conversão, uma vez por texto distinto.
+    """
+
+    def __init__(self, addresses, index):
+        self.addresses = addresses
+        self.index = index
+        nodes = [node for node in addresses if node in index.ids]
+        lo, hi = _text_words([addresses[node] for node in nodes])
+        ids = np.array([index.ids[node] for node in nodes], dtype=np.int64)
+        self._by_value = None
+
+        # Tabela hash com sondagem linear (ocupação <= 1/4), preenchida em lotes
+        self.bits = max(int(len(ids)).bit_length() + 2, 4)
+        self.lo = np.zeros(1 << self.bits, dtype=np.uint64)
+        self.hi = np.zeros(1 << self.bits, dtype=np.uint64)
+        self.ids = np.full(1 << self.bits, -1, dtype=np.int64)
+        pending = np.flatnonzero(lo != 0)
+        slots = self._slots(lo[pending], hi[pending])
+        while len(pending):
+            free = self.lo[slots] == 0
+            taken, first = np.unique(slots[free], return_index=True)
+            placed = np.flatnonzero(free)[first]
+            self.lo[taken] = lo[pending[placed]]
+            self.hi[taken] = hi[pending[placed]]
+            self.ids[taken] = ids[pending[placed]]
+            waiting = np.ones(len(pending), dtype=bool)
+            waiting[placed] = False
+            pending, slots = pending[waiting], (slots[waiting] + 1) & (len(self.lo) - 1)
+        self.size = int((self.lo != 0).sum())
+
+    def _slots(self, lo, hi):
+        return (((lo ^ (hi * _HASH_FOLD)) * _HASH_MIX) >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def __len__(self):
+        return self.size
+
+    def by_value(self, value):
+        """ID do nó com o IP inteiro `value` (-1 se nenhum)."""
+        if self._by_value is None:
+            self._by_value = {ip_to_int(ip): self.index.ids[node]
+                              for node, ip in self.addresses.items() if node in self.index.ids}
+        return self._by_value.get(value, -1)
+
+    def lookup_many(self, texts):
+        """ID do nó dono de cada IP em texto (-1 se nenhum nó tem esse endereço)."""
+        lo, hi = _text_words(texts)
+        slots = self._slots(lo, hi)
+        result = self.ids[slots]
+        stored = self.lo[slots]
+        # A primeira sondagem resolve quase todos; só as colisões seguem na tabela
+        probing = np.flatnonzero((stored != lo) | (self.hi[slots] != hi))
+        result[probing] = -1
+        probing = probing[stored[probing] != 0]
+        slots, lo, hi = slots[probing], lo[probing], hi[probing]
+        while len(probing):
+            slots = (slots + 1) & (len(self.lo) - 1)
+            stored = self.lo[slots]
+            found = (stored == lo) & (self.hi[slots] == hi)
+            result[probing[found]] = self.ids[slots[found]]
+            going = ~found & (stored != 0)
+            probing, slots, lo, hi = probing[going], slots[going], lo[going], hi[going]
+
+        misses = np.flatnonzero(result < 0)
+        if len(misses):
+            unique, inverse = np.unique(np.asarray(texts, dtype='S17')[misses], return_inverse=True)
+            resolved = np.full(len(unique), -1, dtype=np.int64)
+            for position, text in enumerate(unique.tolist()):
+                try:
+                    resolved[position] = self.by_value(ip_to_int(text.decode().strip(' "')))
+                except (UnicodeDecodeError, ValueError):
+                    pass
+            result[misses] = resolved[inverse.ravel()]
+        return result
+
+
+def _trace_format(source, fmt):
+    if fmt is None:
+        fmt = "csv" if source == "-" else os.path.splitext(str(source))[1].lstrip(".").lower()
+    if fmt not in TRACE_FORMATS:
+        raise ValueError(f"Formato de trace desconhecido: '{fmt}' (use {', '.join(TRACE_FORMATS)})")
+    return fmt
+
+
+def _trace_layout(first_line, fmt):
+    """Ordem das colunas do trace e se a primeira linha é um cabeçalho CSV."""
+    if fmt == "jsonl":
+        columns = tuple(json.loads(first_line))
+        header = False
+    else:
+        header = not any(char.isdigit() for char in first_line)
+        columns = tuple(name.strip(' "\r\n') for name in first_line.split(',')) if header else TRACE_COLUMNS
+    if sorted(columns) != sorted(TRACE_COLUMNS):
+        raise ValueError(f"O trace deve ter exatamente as colunas {', '.join(TRACE_COLUMNS)} (tem {', '.join(columns)})")
+    return columns, header
+
+
+def _parse_trace_line(line, fmt, columns):
+    """Caminho lento, linha a linha: (timestamp, src, dst, bytes) ou None se malformada."""
+    try:
+        if fmt == "jsonl":
+            record = json.loads(line)
+        else:
+            record = dict(zip(columns, (field.strip(' "\r\n') for field in line.decode().split(','))))
+        return (float(record["timestamp"]), str(record["src"]).strip(), str(record["dst"]).strip(),
+                float(record["bytes"]))
+    except (UnicodeDecodeError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _parse_trace_block(block, fmt, columns):
+    """
+    Interpreta um bloco de linhas completas de uma vez com o parser em C do
+    NumPy (o JSONL vira CSV apagando chaves, chaves e aspas). Se o bloco tem
+    alguma linha fora do padrão, ele é refeito linha a linha e as linhas
+    inválidas são contadas. Retorna (timestamps, src, dst, bytes, malformadas).
+    """
+    if fmt == "jsonl":
+        text = block.translate(None, b' \t\r{}')
+        for name in columns:
+            text = text.replace(b'"' + name.encode() + b'":', b'')
+        text = text.translate(None, b'"')
+    else:
+        text = block.translate(None, b' \r') if b' ' in block or b'\r' in block else block
+    dtype = np.dtype([(name, 'S17' if name in ("src", "dst") else 'f8') for name in columns])
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            records = np.loadtxt(io.BytesIO(text), dtype=dtype, delimiter=',', ndmin=1, comments=None)
+        return records["timestamp"], records["src"], records["dst"], records["bytes"], 0
+    except ValueError:
+        pass
+
+    parsed = [_parse_trace_line(line, fmt, columns) for line in block.splitlines() if line.strip()]
+    valid = [record for record in parsed if record is not None]
+    timestamps, src, dst, sizes = zip(*valid) if valid else ((), (), (), ())
+    return (np.array(timestamps, dtype=float), np.array(src, dtype='S17'), np.array(dst, dtype='S17'),
+            np.array(sizes, dtype=float), len(parsed) - len(valid))
+
+
+def read_trace(source, fmt=None, chunk_bytes=TRACE_CHUNK_BYTES):
+    """
+    Lê um trace de tráfego (timestamp em segundos, IP de origem, IP de
+    destino, bytes) em CSV ou JSONL, de um arquivo ou da entrada padrão
+    ('-'), em blocos de `chunk_bytes`. Gera, por bloco, os arrays
+    (timestamps, src, dst, bytes) e o número de linhas malformadas; a memória
+    usada não depende do tamanho do trace.
+    """
+    fmt = _trace_format(source, fmt)
+    with contextlib.ExitStack() as stack:
+        stream = sys.stdin.buffer if source == "-" else stack.enter_context(open(source, 'rb'))
+        first = stream.readline()
+        while first and not first.strip():
+            first = stream.readline()
+        if not first:
+            return
+        columns, header = _trace_layout(first.decode(), fmt)
+        pending = b'' if header else first
+        while True:
+            data = stream.read(chunk_bytes)
+            block = pending + data
+            cut = block.rfind(b'\n') + 1 if data else len(block)
+            block, pending = block[:cut], block[cut:]
+            if block.strip():
+                yield _parse_trace_block(block, fmt, columns)
+            if not data:
+                return
+
+
+def _sort_keys(keys):
+    """
+    Chaves inteiras não negativas em ordem e a permutação que as ordena (a
+    ordem original desempata). Quando cabem, chave e posição vão juntas em um
+    int64 e basta um `np.sort`, bem mais rápido que `np.argsort`.
+    """
+    shift = int(len(keys)).bit_length()
+    if int(keys.max(initial=0)).bit_length() + shift > 63:
+        order = np.argsort(keys, kind='stable')
+        return keys[order], order
+    packed = np.sort((keys << shift) | np.arange(len(keys)))
+    return packed >> shift, packed & ((1 << shift) - 1)
+
+
+class TraceReplay:
+    """
+    Acumula a passagem de um trace de tráfego pela árvore, lote a lote: bytes
+    por enlace e sentido, latência de cada fluxo (par origem → destino) e a
+    utilização dos enlaces em cada intervalo de `interval` segundos.
+
+    Como em `link_loads`, cada registro soma seus bytes na origem e no
+    destino e os desconta no ancestral comum; as somas por subárvore só são
+    feitas ao fechar um intervalo. A latência de um registro é o atraso de
+    ida do modelo para os seus bytes. Um intervalo é fechado quando chega um
+    registro de um intervalo posterior; registros que chegam depois disso
+    ("late") entram nos totais, mas não na utilização por intervalo. Só um
+    intervalo fica aberto por vez e os resultados não dependem de como o
+    trace é dividido em lotes. A memória cresce com o número de nós e de
+    fluxos distintos, não com o número de registros.
+
+    As somas por subárvore exigem uma árvore: redes com uplinks redundantes
+    são recusadas (`ValueError`); use `link_loads`, que segue os caminhos de
+    mesmo custo.
+    """
+
+    def __init__(self, G, addresses=None, interval=1.0):
+        if interval <= 0:
+            raise ValueError("O intervalo de utilização deve ser positivo")
+        self.index = get_path_index(G)
+        if self.index.redundant:
+            raise ValueError("A reprodução de traces exige uma árvore (a rede tem uplinks redundantes)")
+        self.addresses = AddressIndex(ip_addresses if addresses is None else addresses, self.index)
+        self.interval = float(interval)
+        n = len(self.index)
+        topology = self.index.topology
+        children = self.index.parent >= 0
+        rates = self.index.latency_model.link_rates(topology)
+        self.capacity = np.full(n, np.nan)
+        self.capacity[children] = rates[topology.parent_edge[children]]
+
+        self.records = 0
+        self.bytes = 0.0
+        self.unmapped = [0, 0.0]
+        self.unroutable = [0, 0.0]
+        self.late_records = 0
+        self.first_timestamp = float('inf')
+        self.last_timestamp = -float('inf')
+        self.up = np.zeros(n)
+        self.down = np.zeros(n)
+        self.peak_up = np.zeros(n)
+        self.peak_down = np.zeros(n)
+        # Fluxos: chave origem·n + destino, ordenada, com registros, bytes e o maior
+        # registro de cada um (a latência de um fluxo sai deles: veja `report`); os
+        # lotes novos esperam em `_pending` até somarem o dobro de linhas da tabela
+        self.flow_keys = np.zeros(0, dtype=np.int64)
+        self.flow_records = np.zeros(0, dtype=np.int64)
+        self.flow_bytes = np.zeros(0)
+        self.flow_largest = np.zeros(0)
+        self.latency_sum = 0.0
+        self.latency_max = -float('inf')
+        self._pending = []
+        self._pending_rows = 0
+        self.intervals = []
+        # Intervalo aberto: [intervalo, subidas, descidas, bytes] ou None; e o
+        # intervalo mais recente já visto no trace
+        self._open = None
+        self._latest = None
+
+    def _contributions(self, src, dst, top, sizes):
+        n = len(self.index)
+        at_top = np.bincount(top, sizes, n)
+        return np.bincount(src, sizes, n) - at_top, np.bincount(dst, sizes, n) - at_top
+
+    def _add_flows(self, src, dst, sizes):
+        self._pending.append((src * len(self.index) + dst, sizes))
+        self._pending_rows += len(src)
+        # Pendentes ocupam 16 bytes por registro e a tabela 32 por fluxo: fundir
+        # quando eles passam do dobro dela mantém a memória proporcional aos fluxos
+        # e o custo total a O(log) cópias de cada um, não a uma por lote
+        if self._pending_rows >= 2 * len(self.flow_keys):
+            self._merge_flows()
+
+    def _merge_flows(self):
+        if not self._pending:
+            return
+        keys, sizes = (np.concatenate(parts) for parts in zip(*self._pending))
+        self._pending = []
+        self._pending_rows = 0
+        keys, order = _sort_keys(keys)
+        sizes = sizes[order]
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        new = (np.diff(np.append(starts, len(keys))),
+               np.add.reduceat(sizes, starts),
+               np.maximum.reduceat(sizes, starts))
+
+        # Tabela e lote agregado não repetem chaves: cada uma aparece no máximo duas vezes
+        keys, order = _sort_keys(np.concatenate([self.flow_keys, keys[starts]]))
+        repeated = np.flatnonzero(keys[1:] == keys[:-1])
+        keep = np.ones(len(keys), dtype=bool)
+        keep[repeated + 1] = False
+        self.flow_keys = keys[keep]
+        columns = (self.flow_records, self.flow_bytes, self.flow_largest)
+        merged = []
+        for column, added, combine in zip(columns, new, (np.add, np.add, np.maximum)):
+            values = np.concatenate([column, added])[order]
+            values[repeated] = combine(values[repeated], values[repeated + 1])
+            merged.append(values[keep])
+        self.flow_records, self.flow_bytes, self.flow_largest = merged
+
+    def _close(self):
+        bucket, up, down, size = self._open
+        self._open = None
+        for contributions in (up, down):
+            contributions[:] = _subtree_sums(self.index, contributions)
+            contributions[self.index.parent < 0] = 0.0
+        rate = 8 / self.interval / self.capacity
+        up_utilization, down_utilization = up * rate, down * rate
+        np.fmax(self.peak_up, up_utilization, out=self.peak_up)
+        np.fmax(self.peak_down, down_utilization, out=self.peak_down)
+        both = np.nan_to_num(np.concatenate([up_utilization, down_utilization]))
+        peak = int(np.argmax(both))
+        self.intervals.append((bucket * self.interval, size, float(both[peak]), peak, int((both > 1).sum())))
+
+    def add(self, timestamps, src, dst, sizes):
+        """Passa um lote de registros (timestamps em s, IPs em texto, bytes) pela rede."""
+        timestamps = np.asarray(timestamps, dtype=float)
+        sizes = np.asarray(sizes, dtype=float)
+        if not len(timestamps):
+            return
+        src = self.addresses.lookup_many(src)
+        dst = self.addresses.lookup_many(dst)
+        self.records += len(timestamps)
+        self.bytes += float(sizes.sum())
+        self.first_timestamp = min(self.first_timestamp, float(timestamps.min()))
+        self.last_timestamp = max(self.last_timestamp, float(timestamps.max()))
+
+        mapped = (src >= 0) & (dst >= 0)
+        self.unmapped[0] += int((~mapped).sum())
+        self.unmapped[1] += float(sizes[~mapped].sum())
+        routable = mapped.copy()
+        routable[mapped] = self.index.component[src[mapped]] == self.index.component[dst[mapped]]
+        lost = mapped & ~routable
+        self.unroutable[0] += int(lost.sum())
+        self.unroutable[1] += float(sizes[lost].sum())
+        if not routable.all():
+            timestamps, src, dst, sizes = timestamps[routable], src[routable], dst[routable], sizes[routable]
+        if not len(src):
+            return
+
+        index = self.index
+        top = index.lca_ids(src, dst)
+        per_bit = index.cum_per_bit[src] + index.cum_per_bit[dst] - 2 * index.cum_per_bit[top]
+        fixed = index.cum_fixed[src] + index.cum_fixed[dst] - 2 * index.cum_fixed[top]
+        latency = fixed + 8 * sizes * per_bit
+        self.latency_sum += float(latency.sum())
+        self.latency_max = max(self.latency_max, float(latency.max()))
+        self._add_flows(src, dst, sizes)
+
+        # Um registro é "late" se algum registro anterior do trace (deste lote ou
+        # de outro) já passou do seu intervalo; os demais chegam em ordem de
+        # intervalo, então formam um grupo contíguo por intervalo
+        buckets = np.floor(timestamps / self.interval).astype(np.int64)
+        first = buckets[0] if self._latest is None else self._latest
+        passed = np.maximum.accumulate(np.concatenate([[first], buckets[:-1]]))
+        self._latest = int(max(passed[-1], buckets[-1]))
+        on_time = buckets >= passed
+        if not on_time.all():
+            late = ~on_time
+            self.late_records += int(late.sum())
+            up, down = self._contributions(src[late], dst[late], top[late], sizes[late])
+            self.up += up
+            self.down += down
+            buckets, src, dst, top, sizes = buckets[on_time], src[on_time], dst[on_time], top[on_time], sizes[on_time]
+        bounds = np.flatnonzero(buckets[1:] != buckets[:-1]) + 1
+        for lo, hi in zip([0, *bounds.tolist()], [*bounds.tolist(), len(buckets)]):
+            bucket = int(buckets[lo])
+            if self._open is not None and self._open[0] != bucket:
+                self._close()
+            up, down = self._contributions(src[lo:hi], dst[lo:hi], top[lo:hi], sizes[lo:hi])
+            self.up += up
+            self.down += down
+            size = float(sizes[lo:hi].sum())
+            if self._open is None:
+                self._open = [bucket, up, down, size]
+            else:
+                self._open[1] += up
+                self._open[2] += down
+                self._open[3] += size
+
+    def report(self, top=10):
+        """
+        Fecha os intervalos ainda abertos e resume a reprodução: totais,
+        bytes por enlace ("link_bytes", arrays "up"/"down" indexados pelo ID
+        do nó filho, como em `link_loads`), os `top` enlaces e fluxos com mais
+        bytes e a utilização de pico de cada intervalo.
+        """
+        if self._open is not None:
+            self._close()
+        self._merge_flows()
+        index = self.index
+        names = index.nodes
+
+        up = _subtree_sums(index, self.up)
+        down = _subtree_sums(index, self.down)
+        up[index.parent < 0] = down[index.parent < 0] = 0.0
+        children = np.flatnonzero(index.parent >= 0)
+        total = up[children] + down[children]
+        links = []
+        for child in children[np.argsort(-total, kind='stable')[:top]].tolist():
+            links.append({"from": names[child], "to": names[int(index.parent[child])],
+                          "bytes_up": float(up[child]), "bytes_down": float(down[child]),
+                          "peak_utilization_up": float(self.peak_up[child]),
+                          "peak_utilization_down": float(self.peak_down[child])})
+
+        # A latência de ida é fixa + 8·bytes·por bit em cada registro de um fluxo,
+        # então a média e a máxima dele saem dos bytes e do maior registro
+        n = len(index)
+        flows = []
+        count = min(top, len(self.flow_keys))
+        if count:
+            # Só os fluxos com ao menos os bytes do `top`-ésimo maior entram na ordenação
+            heaviest = np.flatnonzero(self.flow_bytes >= np.partition(self.flow_bytes, -count)[-count])
+            chosen = heaviest[np.argsort(-self.flow_bytes[heaviest], kind='stable')][:top]
+            src, dst = np.divmod(self.flow_keys[chosen], n)
+            common = index.lca_ids(src, dst)
+            per_bit = index.cum_per_bit[src] + index.cum_per_bit[dst] - 2 * index.cum_per_bit[common]
+            fixed = index.cum_fixed[src] + index.cum_fixed[dst] - 2 * index.cum_fixed[common]
+            records, size, largest = (self.flow_records[chosen], self.flow_bytes[chosen],
+                                      self.flow_largest[chosen])
+            mean = fixed + 8 * per_bit * size / records
+            worst = fixed + 8 * per_bit * largest
+            for position, (source, target) in enumerate(zip(src.tolist(), dst.tolist())):
+                flows.append({"src": names[source], "dst": names[target], "records": int(records[position]),
+                              "bytes": float(size[position]), "mean_latency_ms": float(mean[position]),
+                              "max_latency_ms": float(worst[position])})
+
+        intervals = []
+        for start, size, peak, position, overloaded in self.intervals:
+            child = position % n
+            upward = position < n
+            ends = (names[child], names[int(index.parent[child])])
+            intervals.append({"start": start, "bytes": size, "peak_utilization": peak,
+                              "peak_link": ends if upward else ends[::-1], "overloaded": overloaded})
+
+        routed = int(self.flow_records.sum())
+        return {
+            "records": self.records,
+            "bytes": self.bytes,
+            "duration_s": max(self.last_timestamp - self.first_timestamp, 0.0),
+            "unmapped": {"records": self.unmapped[0], "bytes": self.unmapped[1]},
+            "unroutable": {"records": self.unroutable[0], "bytes": self.unroutable[1]},
+            "late_records": self.late_records,
+            "link_bytes": {"up": up, "down": down},
+            "links": links,
+            "flows": {"count": len(self.flow_keys),
+                      "mean_latency_ms": self.latency_sum / routed if routed else float('nan'),
+                      "max_latency_ms": self.latency_max if routed else float('nan'),
+                      "top": flows},
+            "intervals": intervals,
+        }
+
+
+@instrumented("trace_replay")
+def replay_trace(G, source, fmt=None, interval=1.0, addresses=None, top=10, chunk_bytes=TRACE_CHUNK_BYTES):
+    """
+    Reproduz um trace de tráfego (CSV ou JSONL, veja `read_trace`) na rede
+    montada, em blocos, e retorna o relatório de `TraceReplay.report` com o
+    número de linhas malformadas ("malformed").
+    """
+    replay = TraceReplay(G, addresses, interval)
+    malformed = 0
+    for timestamps, src, dst, sizes, bad in read_trace(source, fmt, chunk_bytes):
+        replay.add(timestamps, src, dst, sizes)
+        malformed += bad
+    if metrics.enabled:
+        metrics.count("trace_records", replay.records)
+    report = replay.report(top)
+    report["malformed"] = malformed
+    return report
+
+
+def display_trace_replay(report):
+    """Exibe o relatório de `replay_trace`."""
+    print("\n" + "=" * 80)
+    print("REPRODUÇÃO DE TRACE DE TRÁFEGO")
+    print("=" * 80)
+    print(f"Registros: {report['records']}  |  Bytes: {report['bytes']:.0f}  |  "
+          f"Duração: {report['duration_s']:.3f} s")
+    for key, label in (("unmapped", "IP fora da rede"), ("unroutable", "Sem caminho")):
+        if report[key]["records"]:
+            print(f"⚠ {label}: {report[key]['records']} registro(s), {report[key]['bytes']:.0f} bytes")
+    if report.get("malformed"):
+        print(f"⚠ Linhas malformadas ignoradas: {report['malformed']}")
+    if report["late_records"]:
+        print(f"⚠ Registros fora de ordem (fora da utilização por intervalo): {report['late_records']}")
+
+    print(f"\n{'Enlace':<26} {'Bytes ↑':>14} {'Bytes ↓':>14} {'Pico ↑':>9} {'Pico ↓':>9}")
+    print("-" * 80)
+    for link in report["links"]:
+        print(f"{link['from'] + ' → ' + link['to']:<26} {link['bytes_up']:>14.0f} {link['bytes_down']:>14.0f} "
+              f"{link['peak_utilization_up'] * 100:>8.1f}% {link['peak_utilization_down'] * 100:>8.1f}%")
+
+    flows = report["flows"]
+    print(f"\nFluxos: {flows['count']}  |  Latência média: {flows['mean_latency_ms']:.4f} ms  |  "
+          f"Máxima: {flows['max_latency_ms']:.4f} ms")
+    print(f"{'Origem':<12} {'Destino':<12} {'Registros':>10} {'Bytes':>14} {'Lat. média':>14}")
+    print("-" * 80)
+    for flow in flows["top"]:
+        print(f"{flow['src']:<12} {flow['dst']:<12} {flow['records']:>10} {flow['bytes']:>14.0f} "
+              f"{flow['mean_latency_ms']:>11.4f} ms")
+
+    intervals = report["intervals"]
+    if intervals:
+        busiest = max(intervals, key=lambda item: item["peak_utilization"])
+        overloaded = sum(1 for item in intervals if item["overloaded"])
+        print(f"\nIntervalos: {len(intervals)}  |  Com enlace acima da capacidade: {overloaded}")
+        print(f"Pico: {busiest['peak_utilization'] * 100:.1f}% em {' → '.join(busiest['peak_link'])} "
+              f"(intervalo iniciado em {busiest['start']:.3f} s)")
+    print("=" * 80 + "\n")
+
+
+# --- Plano de Dados (Encaminhamento por Longest Prefix Match) ---
+
+MAX_TTL = 64
+
+
+class ForwardingTable:
+    """
+    Tabela de encaminhamento compilada de um roteador.
+
+    As rotas CIDR são achatadas em um índice ordenado de intervalos inteiros
+    disjuntos, cada um já resolvido para o prefixo mais específico que o
+    cobre. Uma consulta (ou um lote delas, via `lookup_many`) é uma busca
+    binária com `np.searchsorted`.
+
+    Prefixos repetidos com próximos saltos diferentes ficam em `conflicts`
+    (vale a primeira rota).
+    """
+
+    def __init__(self, routes, default=None):
+        self.next_hops = []
+        codes = {}
+        seen = {}
+        self.conflicts = []
+        prefixes = []
+        for prefix, next_hop in routes:
+            start, end, length = parse_prefix(prefix)
+            if (start, length) in seen:
+                if seen[(start, length)] != next_hop:
+                    self.conflicts.append((prefix, seen[(start, length)], next_hop))
+                continue
+            seen[(start, length)] = next_hop
+            if next_hop not in codes:
+                codes[next_hop] = len(self.next_hops)
+                self.next_hops.append(next_hop)
+            prefixes.append((start, end, codes[next_hop]))
+
+        default_code = -1
+        if default is not None:
+            if default not in codes:
+                codes[default] = len(self.next_hops)
+                self.next_hops.append(default)
+            default_code = codes[default]
+
+        # Varredura com pilha: prefixos CIDR são aninhados ou disjuntos
+        starts = [0]
+        values = [default_code]
+
+        def emit(position, code):
+            if position > 0xFFFFFFFF:
+                return
+            if starts[-1] == position:
+                values[-1] = code
+            elif values[-1] != code:
+                starts.append(position)
+                values.append(code)
+
+        stack = []
+        for start, end, code in sorted(prefixes, key=lambda p: (p[0], -p[1])):
+            while stack and stack[-1][0] < start:
+                closed_end, _ = stack.pop()
+                emit(closed_end + 1, stack[-1][1] if stack else default_code)
+            emit(start, code)
+            stack.append((end, code))
+        while stack:
+            closed_end, _ = stack.pop()
+            emit(closed_end + 1, stack[-1][1] if stack else default_code)
+
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.codes = np.asarray(values, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, ip):
+        """Próximo salto para um IP (str ou int), ou None sem rota."""
+        if isinstance(ip, str):
+            ip = ip_to_int(ip)
+        code = self.codes[np.searchsorted(self.starts, ip, side='right') - 1]
+        return self.next_hops[code] if code >= 0 else None
+
+    def lookup_many(self, ips):
+        """Resolve um array de IPs inteiros; retorna os códigos de `next_hops` (-1 sem rota)."""
+        positions = np.searchsorted(self.starts, np.asarray(ips, dtype=np.int64), side='right') - 1
+        return self.codes[positions]
+
+
+def compile_forwarding_tables(G, ip_addresses, routing_table):
+    """
+    Compila a tabela de encaminhamento de cada nó da rede.
+
+    Cada roteador recebe as rotas de `routing_table`, rotas /32 para os
+    vizinhos diretamente conectados e uma rota padrão para o seu pai na
+    hierarquia. A sub-rede de uma borda é conectada a ela: um endereço sem
+    host nessa sub-rede é descartado ali, sem voltar ao pai. Hosts só têm a
+    rota padrão para o switch de borda.
+    """
+    index = get_path_index(G)
+    tables = {}
+    leaf_tables = {}
+    for node in G.nodes:
+        parent_id = index.parent[index.ids[node]]
+        default = index.nodes[parent_id] if parent_id >= 0 else None
+        if node not in routing_table and G.degree(node) == 1 and default is not None:
+            # Folhas (hosts) só encaminham para o pai: uma tabela compartilhada por pai
+            if default not in leaf_tables:
+                leaf_tables[default] = ForwardingTable([], default=default)
+            tables[node] = leaf_tables[default]
+            continue
+        routes = [(G.nodes[node]['subnet'], None)] if 'subnet' in G.nodes[node] else []
+        routes += routing_table.get(node, {}).items()
+        routes += [(f"{ip_addresses[neighbor]}/32", neighbor)
+                   for neighbor in G[node] if neighbor in ip_addresses]
+        tables[node] = ForwardingTable(routes, default=default)
+    return tables
+
+
+def forward_probe(tables, ip_addresses, src, dst_ip):
+    """
+    Encaminha uma sonda salto a salto pelo plano de dados até `dst_ip`.
+
+    Retorna a lista de nós percorridos, ou None se a sonda for descartada
+    (sem rota, enlace inexistente ou TTL esgotado).
+    """
+    node = src
+    path = [src]
+    for _ in range(MAX_TTL):
+        if ip_addresses.get(node) == dst_ip:
+            return path
+        next_hop = tables[node].lookup(dst_ip)
+        if next_hop is None or next_hop not in tables:
+            return None
+        node = next_hop
+        path.append(node)
+    return None
+
+
+def _is_equal_cost(index, src, dst, path):
+    """Se `path` (seguido pelo plano de dados) tem o mesmo número de saltos do caminho mínimo, em redes redundantes."""
+    return index.redundant and path is not None and len(path) - 1 == index.hop_count(src, dst)
+
+
+def verify_forwarding(G, ip_addresses, routing_table, pairs=None):
+    """
+    Confere o plano de dados contra a rota de caminho mínimo do índice.
+
+    Retorna a lista de divergências (origem, destino, rota LPM, rota mínima);
+    por padrão verifica todos os pares de hosts. Com uplinks redundantes,
+    qualquer um dos caminhos de mesmo custo é aceito.
+    """
+    tables = compile_forwarding_tables(G, ip_addresses, routing_table)
+    index = get_path_index(G)
+    if pairs is None:
+        pairs = [(src, dst) for src in hosts for dst in hosts if src != dst]
+    mismatches = []
+    for src, dst in pairs:
+        forwarded = forward_probe(tables, ip_addresses, src, ip_addresses[dst])
+        expected = index.path(src, dst)
+        if forwarded != expected and not _is_equal_cost(index, src, dst, forwarded):
+            mismatches.append((src, dst, forwarded, expected))
+    return mismatches
+
+
+# --- Simulação de Eventos Discretos ---
+
+_GENERATE, _DATA, _PROBE, _REPLY = range(4)
+
+
+class EventSimulator:
+    """
+    Simulador de eventos discretos com filas nos enlaces, em relógio virtual.
+
+    Cada sentido de cada enlace é uma fila FIFO servida na taxa do enlace
+    (largura de banda configurada ou, na falta dela, a velocidade do meio),
+    seguida do atraso de propagação do meio. Com uplinks redundantes, cada
+    fluxo segue o caminho de mesmo custo do seu número (`flow_hash`) e as
+    sondas o do fluxo 0, como `probe_pair`. Pacotes são eventos em um heap
+    ordenado pelo tempo virtual; nada espera pelo relógio de parede. O custo
+    é de um evento por pacote por salto (algumas centenas de milhares por
+    segundo, menos quando as filas crescem e o heap fica grande), então a
+    simulação só é mais rápida que o tempo real em cargas leves: da ordem de
+    10^5 pacotes·salto por segundo virtual. Um único enlace de 1 Gbps
+    saturado com pacotes de 1500 bytes já gera ~83 mil pacotes por segundo.
+
+    Fluxos de fundo (`add_flow`) competem pelas mesmas filas que as sondas
+    XProbe (`add_probe`), cujo RTT passa a incluir o atraso de enfileiramento.
+    Com `buffer_bits`, pacotes que não cabem na fila são descartados.
+
+    Cada fluxo sorteia suas chegadas com o gerador `session_rng(seed, id do
+    fluxo)` e eventos no mesmo instante são desempatados pela identidade do
+    pacote (fluxo ou sonda, número do pacote), nunca pela ordem de inserção;
+    assim o resultado só depende da semente e dos fluxos, e a simulação pode
+    ser repartida entre processos (`ShardedSimulator`) sem mudar nada. Com
+    `links`, só os enlaces direcionados listados são servidos aqui e os
+    pacotes cujo próximo salto é outro enlace vão para `outbox`.
+    """
+
+    def __init__(self, G, seed=None, buffer_bits=None, links=None):
+        self.index = get_path_index(G)
+        topology = self.index.topology
+
+        rate = self.index.latency_model.link_rates(topology).tolist()
+        propagation = self.index.latency_model.propagation(topology).tolist()
+
+        # Enlace direcionado 2*e (filho → pai) e 2*e + 1 (pai → filho)
+        self.link_rate = [r for r in rate for _ in range(2)]
+        self.link_propagation = [p for p in propagation for _ in range(2)]
+        num_links = len(self.link_rate)
+        self.link_free_at = [0.0] * num_links
+        self.link_bits = [0] * num_links
+        self.link_packets = [0] * num_links
+        self.link_drops = [0] * num_links
+        self.link_max_wait = [0.0] * num_links
+        self.buffer_bits = buffer_bits
+
+        self.served = None
+        if links is not None:
+            self.served = bytearray(num_links)
+            for link in links:
+                self.served[link] = 1
+        self.outbox = []
+
+        self.seed = seed
+        self.now = 0.0
+        self.events = 0
+        self._heap = []
+        self._routes = {}
+        self.flows = []
+        self.probes = []
+
+    def _schedule(self, time_s, uid, packet):
+        heapq.heappush(self._heap, (time_s, uid, packet))
+
+    def _route(self, src, dst, flow=0):
+        """Lista de enlaces direcionados de `src` até `dst` (cacheada por par e fluxo)."""
+        key = (src, dst, flow) if self.index.redundant else (src, dst)
+        if key not in self._routes:
+            index = self.index
+            if not index.has_path(src, dst):
+                raise ValueError(f"Host destino {dst} é inalcançável a partir de {src}")
+            if index.redundant:
+                # Caminho de mesmo custo do fluxo, com os enlaces fora da árvore
+                ecmp = index.ecmp()
+                path = ecmp.route(index.ids[src], index.ids[dst], flow)[0]
+                self._routes[key] = [ecmp.link(u_id, v_id) for u_id, v_id in zip(path, path[1:])]
+                return self._routes[key]
+            path = index.path_ids(index.ids[src], index.ids[dst])
+            parent_edge = index.topology.parent_edge
+            links = []
+            for u_id, v_id in zip(path, path[1:]):
+                if index.parent[v_id] == u_id:
+                    links.append(2 * int(parent_edge[v_id]) + 1)
+                else:
+                    links.append(2 * int(parent_edge[u_id]))
+            self._routes[key] = links
+        return self._routes[key]
+
+    def add_flow(self, src, dst, rate_bps, packet_size_bits=12000, start=0.0, stop=float('inf'), poisson=True):
+        """Tráfego de fundo de `src` para `dst` a `rate_bps` (chegadas de Poisson ou periódicas)."""
+        flow_id = len(self.flows)
+        self.flows.append({
+            "src": src, "dst": dst, "route": self._route(src, dst, flow_id),
+            "interval": packet_size_bits / rate_bps, "size": packet_size_bits, "rng": session_rng(self.seed, flow_id),
+            "stop": stop, "poisson": poisson, "sent": 0, "delivered": 0, "dropped": 0, "delay_sum": 0.0
+        })
+        self._schedule(start, (_GENERATE, flow_id, 0), [_GENERATE, flow_id])
+        return flow_id
+
+    def add_probe(self, src, dst, num_samples=3, interval=0.5, packet_size_bits=8000, start=0.0):
+        """Sonda XProbe: `num_samples` pacotes de eco, um a cada `interval` segundos virtuais."""
+        probe_id = len(self.probes)
+        self.probes.append({"src": src, "dst": dst, "rtt_ms": [], "lost": 0,
+                            "route": self._route(src, dst), "reverse": self._route(dst, src)})
+        for sample in range(num_samples):
+            sent = start + sample * interval
+            self._schedule(sent, (_PROBE, probe_id, sample),
+                           [_PROBE, self.probes[probe_id]["route"], 0, packet_size_bits, probe_id, sent])
+        return probe_id
+
+    def run(self, until=float('inf'), max_events=None):
+        """Processa eventos até esvaziar o heap, passar de `until` ou atingir `max_events`."""
+        self._process(until, max_events)
+        return self.results()
+
+    def _process(self, until, max_events=None):
+        heap = self._heap
+        link_rate = self.link_rate
+        link_propagation = self.link_propagation
+        link_free_at = self.link_free_at
+        link_bits = self.link_bits
+        link_packets = self.link_packets
+        link_max_wait = self.link_max_wait
+        buffer_bits = self.buffer_bits
+        served = self.served
+        processed = 0
+
+        while heap:
+            if heap[0][0] > until or (max_events is not None and processed >= max_events):
+                break
+            now, uid, packet = heapq.heappop(heap)
+            kind = packet[0]
+
+            if kind == _GENERATE:
+                self.now = now
+                processed += 1
+                flow = self.flows[packet[1]]
+                flow["sent"] += 1
+                self._schedule(now, (_DATA, packet[1], flow["sent"]), [_DATA, flow["route"], 0, flow["size"], packet[1], now])
+                gap = flow["rng"].expovariate(1 / flow["interval"]) if flow["poisson"] else flow["interval"]
+                if now + gap < flow["stop"]:
+                    self._schedule(now + gap, (_GENERATE, packet[1], flow["sent"]), packet)
+                continue
+
+            route, hop, size = packet[1], packet[2], packet[3]
+            if hop < len(route) and served is not None and not served[route[hop]]:
+                self.outbox.append((now, uid, packet))
+                continue
+            self.now = now
+            processed += 1
+            if hop == len(route):
+                self._deliver(uid, packet)
+                continue
+
+            # Fila FIFO do enlace: o pacote espera o fim da transmissão anterior
+            link = route[hop]
+            wait = link_free_at[link] - now
+            if wait < 0:
+                wait = 0.0
+            elif buffer_bits is not None and wait * link_rate[link] + size > buffer_bits:
+                self.link_drops[link] += 1
+                self._drop(packet)
+                continue
+            departure = now + wait + size / link_rate[link]
+            link_free_at[link] = departure
+            link_bits[link] += size
+            link_packets[link] += 1
+            if wait > link_max_wait[link]:
+                link_max_wait[link] = wait
+            packet[2] = hop + 1
+            heapq.heappush(heap, (departure + link_propagation[link], uid, packet))
+
+        self.events += processed
+
+    def _deliver(self, uid, packet):
+        kind, tag, sent = packet[0], packet[4], packet[5]
+        if kind == _DATA:
+            flow = self.flows[tag]
+            flow["delivered"] += 1
+            flow["delay_sum"] += self.now - sent
+        elif kind == _PROBE:
+            # O destino responde com o eco pelo caminho inverso
+            self._schedule(self.now, (_REPLY, tag, uid[2]), [_REPLY, self.probes[tag]["reverse"], 0, packet[3], tag, sent])
+        else:
+            self.probes[tag]["rtt_ms"].append((self.now - sent) * 1000)
+
+    def _drop(self, packet):
+        kind, tag = packet[0], packet[4]
+        if kind == _DATA:
+            self.flows[tag]["dropped"] += 1
+        else:
+            self.probes[tag]["lost"] += 1
+
+    def results(self):
+        """Resumo das sondas, fluxos e enlaces com tráfego até o instante atual."""
+        elapsed = self.now or 1.0
+        topology = self.index.topology
+        links = []
+        for link, bits in enumerate(self.link_bits):
+            if not bits and not self.link_drops[link]:
+                continue
+            lower, upper = _link_ends(self.index, link // 2)
+            u, v = (lower, upper) if link % 2 == 0 else (upper, lower)
+            links.append({
+                "from": topology.nodes[u], "to": topology.nodes[v],
+                "utilization": bits / (self.link_rate[link] * elapsed),
+                "packets": self.link_packets[link], "drops": self.link_drops[link],
+                "max_queue_delay_ms": self.link_max_wait[link] * 1000
+            })
+
+        probes = []
+        for probe in self.probes:
+            samples = probe["rtt_ms"]
+            probes.append({
+                "src": probe["src"], "dst": probe["dst"], "rtt_ms": samples, "lost": probe["lost"],
+                "rtt_min": min(samples) if samples else None,
+                "rtt_max": max(samples) if samples else None,
+                "rtt_mean": sum(samples) / len(samples) if samples else None
+            })
+
+        flows = [{"src": flow["src"], "dst": flow["dst"], "sent": flow["sent"],
+                  "delivered": flow["delivered"], "dropped": flow["dropped"],
+                  "mean_delay_ms": flow["delay_sum"] / flow["delivered"] * 1000 if flow["delivered"] else None}
+                 for flow in self.flows]
+
+        return {"time_s": self.now, "events": self.events, "probes": probes, "flows": flows, "links": links}
+
+
+# --- Simulação Paralela por Subárvore de Agregação (multiprocessamento) ---
+
+SHARD_MAX_ROUNDS = 8
+SHARD_INBOX_BATCH = 256  # pacotes de outros grupos colocados no heap por vez
+_shard_graph = None  # grafo de cada worker, recebido uma única vez pelo inicializador do pool
+
+
+def _init_shard_worker(G):
+    global _shard_graph
+    _shard_graph = G
+
+
+def _packet_route(simulator, kind, tag):
+    if kind == _DATA:
+        return simulator.flows[tag]["route"]
+    return simulator.probes[tag]["route" if kind == _PROBE else "reverse"]
+
+
+def _replay_specs(simulator, specs):
+    """Recria no simulador os fluxos e sondas, na ordem original (os IDs ficam iguais)."""
+    for method, args in specs:
+        getattr(simulator, method)(*args)
+
+
+def _add_numbered(simulator, method, number, args):
+    """Recria um fluxo ou sonda com o ID `number` da execução completa (os IDs anteriores ficam vazios)."""
+    items = simulator.flows if method == "add_flow" else simulator.probes
+    items.extend([None] * (number - len(items)))
+    getattr(simulator, method)(*args)
+
+
+def _run_shard(task):
+    """
+    Um grupo de subárvores numa rodada: o simulador serve os enlaces das
+    subárvores do grupo, nos dois sentidos, e recebe só os fluxos e sondas
+    com origem ou destino nelas (com os IDs da execução completa). O tráfego
+    interno ao grupo vai até o fim aqui; de fora chegam só os pacotes que
+    descem da raiz, e saem os que descem para outro grupo, como tuplas
+    (instante, identidade, salto, tamanho, envio).
+    """
+    started = time.process_time()
+    simulator = EventSimulator(_shard_graph, task["seed"], task["buffer_bits"], links=task["links"])
+    for method, number, args in task["specs"]:
+        _add_numbered(simulator, method, number, args)
+    origins = task["origins"]
+    simulator._heap = [event for event in simulator._heap
+                       if (simulator.flows[event[1][1]] if event[1][0] == _GENERATE
+                           else simulator.probes[event[1][1]])["src"] in origins]
+    heapq.heapify(simulator._heap)
+
+    # Os pacotes de fora entram no heap em lotes, na ordem do tempo: cada lote é
+    # processado até logo antes do primeiro pacote do seguinte, sem inchar o heap
+    inbox = task["inbox"]
+    for start in range(0, len(inbox), SHARD_INBOX_BATCH):
+        for time_s, uid, hop, size, sent in inbox[start:start + SHARD_INBOX_BATCH]:
+            packet = [uid[0], _packet_route(simulator, uid[0], uid[1]), hop, size, uid[1], sent]
+            heapq.heappush(simulator._heap, (time_s, uid, packet))
+        if start + SHARD_INBOX_BATCH < len(inbox):
+            following = inbox[start + SHARD_INBOX_BATCH][0]
+            simulator._process(min(task["until"], math.nextafter(following, -math.inf)))
+    simulator._process(task["until"])
+
+    return {
+        "now": simulator.now, "events": simulator.events, "cpu_s": time.process_time() - started,
+        "links": (simulator.link_bits, simulator.link_packets, simulator.link_drops, simulator.link_max_wait),
+        "flows": {number: (flow["sent"], flow["delivered"], flow["dropped"], flow["delay_sum"])
+                  for number, flow in enumerate(simulator.flows) if flow is not None},
+        "probes": {number: (probe["rtt_ms"], probe["lost"])
+                   for number, probe in enumerate(simulator.probes) if probe is not None},
+        "outbox": [(time_s, uid, packet[2], packet[3], packet[5]) for time_s, uid, packet in simulator.outbox],
+    }
+
+
+class ShardedSimulator:
+    """
+    `EventSimulator` repartido entre processos pelas subárvores dos filhos
+    da raiz (os switches de agregação), com o mesmo resultado de uma execução
+    em um único processo com a mesma semente e os mesmos fluxos e sondas.
+
+    Cada worker fica com um grupo de subárvores inteiras: os enlaces delas
+    nos dois sentidos (inclusive os que as ligam à raiz) e os fluxos e sondas
+    que começam ou terminam nelas. O tráfego interno a um grupo é simulado
+    até o fim no próprio worker; só os pacotes cujo ancestral comum é a raiz
+    passam pelo coordenador, que os entrega ao grupo dono do enlace de
+    descida. Esses pacotes disputam as filas com o tráfego local, então as
+    rodadas se repetem com os pacotes recebidos na rodada anterior até que
+    nenhum mude (ponto fixo, igual à execução sequencial porque todo salto
+    leva tempo positivo). A primeira entrada é estimada simulando só as
+    subidas de cada grupo, o que já é exato com só tráfego de fundo (uma
+    rodada basta); os ecos de sondas entre grupos costumam pedir três. Se o
+    ponto fixo não vier em `SHARD_MAX_ROUNDS` rodadas, a simulação é refeita
+    em um só processo. Cada rodada de um grupo é determinística, então um
+    grupo cuja entrada não mudou desde a rodada anterior não é refeito.
+    `critical_path_s` soma, por rodada, o tempo de CPU do worker mais lento:
+    é o tempo de simulação com um núcleo por grupo.
+
+    Cada rodada refaz o grupo do zero, então a aceleração só aparece com só
+    tráfego de fundo (uma rodada: ~1,8× estimada com 4 grupos no benchmark
+    `paralelo`). Com ecos de sondas entre grupos, as três rodadas custam mais
+    que a divisão economiza (~0,7× estimada com 4 grupos), e no tempo de
+    parede ainda entram o pool de processos e a troca dos pacotes. Guardar o
+    estado dos workers entre rodadas não ajuda: a entrada muda já nos
+    primeiros microssegundos, e a sincronização por janelas de tempo teria
+    janelas do atraso mínimo de um salto pela raiz (~1 µs).
+
+    Com uplinks redundantes há caminhos entre subárvores que não passam pela
+    raiz, então essas redes são recusadas (`ValueError`). Com `workers=1` (ou
+    uma só subárvore) a simulação roda direto no processo atual. `run` sempre
+    simula do zero até `until` (sem `max_events`).
+    """
+
+    def __init__(self, G, seed=None, buffer_bits=None, workers=None):
+        self.G = G
+        self.seed = seed
+        self.buffer_bits = buffer_bits
+        self.workers = workers or os.cpu_count() or 1
+        self.simulator = EventSimulator(G, seed, buffer_bits)
+        if self.simulator.index.redundant:
+            raise ValueError("A simulação por subárvore exige uma árvore (a rede tem uplinks redundantes)")
+        self.rounds = 0
+        self.critical_path_s = 0.0
+        self._specs = []
+
+        # Subárvore de agregação de cada nó (-1 nas raízes)
+        index = self.simulator.index
+        self.shard_of = np.full(len(index), -1, dtype=np.int64)
+        self.shard_of[index.depth == 1] = np.flatnonzero(index.depth == 1)
+        for level in index.levels[2:]:
+            self.shard_of[level] = self.shard_of[index.parent[level]]
+        self.shards = np.flatnonzero(index.depth == 1)
+
+    def add_flow(self, src, dst, rate_bps, packet_size_bits=12000, start=0.0, stop=float('inf'), poisson=True):
+        """Como `EventSimulator.add_flow`."""
+        args = (src, dst, rate_bps, packet_size_bits, start, stop, poisson)
+        self._specs.append(("add_flow", args))
+        return self.simulator.add_flow(*args)
+
+    def add_probe(self, src, dst, num_samples=3, interval=0.5, packet_size_bits=8000, start=0.0):
+        """Como `EventSimulator.add_probe`."""
+        args = (src, dst, num_samples, interval, packet_size_bits, start)
+        self._specs.append(("add_probe", args))
+        return self.simulator.add_probe(*args)
+
+    def _groups(self):
+        """Reparte as subárvores em até `workers` grupos, equilibrando fluxos e sondas."""
+        index = self.simulator.index
+        load = dict.fromkeys(self.shards.tolist(), 1)
+        for item in self.simulator.flows + self.simulator.probes:
+            for node in (item["src"], item["dst"]):
+                shard = int(self.shard_of[index.ids[node]])
+                if shard >= 0:
+                    load[shard] += 1
+        groups = [[] for _ in range(max(1, min(self.workers, len(load))))]
+        totals = [0] * len(groups)
+        for shard in sorted(load, key=lambda shard: (-load[shard], shard)):
+            target = totals.index(min(totals))
+            groups[target].append(shard)
+            totals[target] += load[shard]
+        return groups
+
+    def _sequential(self, until):
+        simulator = EventSimulator(self.G, self.seed, self.buffer_bits)
+        _replay_specs(simulator, self._specs)
+        started = time.process_time()
+        results = simulator.run(until)
+        self.critical_path_s = time.process_time() - started
+        return results
+
+    def run(self, until=float('inf')):
+        """Simula até `until` e retorna o mesmo dicionário de `EventSimulator.results`."""
+        self.critical_path_s = 0.0
+        groups = self._groups()
+        if len(groups) == 1:
+            self.rounds = 1
+            return self._sequential(until)
+
+        index = self.simulator.index
+        parent_edge = index.topology.parent_edge
+        group_of = {shard: number for number, shard_list in enumerate(groups) for shard in shard_list}
+
+        # Os dois sentidos de cada enlace ficam com o grupo da subárvore do nó filho
+        owner = np.zeros(len(self.simulator.link_rate), dtype=np.int64)
+        links = [[] for _ in groups]
+        up_links = [[] for _ in groups]
+        for child in np.flatnonzero(index.parent >= 0).tolist():
+            number = group_of[int(self.shard_of[child])]
+            edge = int(parent_edge[child])
+            links[number] += [2 * edge, 2 * edge + 1]
+            up_links[number].append(2 * edge)
+            owner[2 * edge] = owner[2 * edge + 1] = number
+        node_group = {}
+        origins = [set() for _ in groups]
+        for node, node_id in index.ids.items():
+            shard = int(self.shard_of[node_id])
+            node_group[node] = group_of[shard] if shard >= 0 else 0
+            origins[node_group[node]].add(node)
+
+        # Cada grupo recebe só os fluxos e sondas que começam ou terminam nele
+        specs = [[] for _ in groups]
+        numbers = {"add_flow": 0, "add_probe": 0}
+        for method, args in self._specs:
+            for number in {node_group[args[0]], node_group[args[1]]}:
+                specs[number].append((method, numbers[method], args))
+            numbers[method] += 1
+
+        def route(results):
+            # Só seguem os pacotes que descem para outro grupo (na estimativa, os
+            # que descem no próprio grupo também param na saída e são ignorados)
+            inboxes = [[] for _ in groups]
+            for number, result in enumerate(results):
+                for entry in result["outbox"]:
+                    uid, hop = entry[1], entry[2]
+                    link = _packet_route(self.simulator, uid[0], uid[1])[hop]
+                    if owner[link] != number:
+                        inboxes[owner[link]].append(entry)
+            return [sorted(inbox) for inbox in inboxes]
+
+        def run_groups(pending, group_links, inboxes):
+            tasks = [{"seed": self.seed, "buffer_bits": self.buffer_bits, "links": group_links[number],
+                      "specs": specs[number], "origins": origins[number], "inbox": inboxes[number],
+                      "until": until} for number in pending]
+            results = list(executor.map(_run_shard, tasks))
+            self.critical_path_s += max(result["cpu_s"] for result in results)
+            return results
+
+        cache = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(groups), initializer=_init_shard_worker,
+                                                    initargs=(self.G,)) as executor:
+            # Estimativa inicial: só as subidas, que já dão os pacotes que cruzam a raiz
+            # (exatos quando não há ecos de sondas voltando a subir)
+            everyone = range(len(groups))
+            inboxes = route(run_groups(everyone, up_links, [[] for _ in groups]))
+            for self.rounds in range(1, SHARD_MAX_ROUNDS + 1):
+                # Um grupo cuja entrada não mudou reaproveita o resultado da rodada anterior
+                pending = [number for number in everyone
+                           if number not in cache or cache[number][0] != inboxes[number]]
+                for number, result in zip(pending, run_groups(pending, links, inboxes)):
+                    cache[number] = (inboxes[number], result)
+                results = [cache[number][1] for number in everyone]
+                forwarded = route(results)
+                if forwarded == inboxes:
+                    break
+                inboxes = forwarded
+            else:
+                self.rounds = 0
+                return self._sequential(until)
+
+        # Cada enlace e cada entrega acontecem em um único grupo: somar preserva os valores exatos
+        merged = EventSimulator(self.G, self.seed, self.buffer_bits)
+        _replay_specs(merged, self._specs)
+        for result in results:
+            merged.now = max(merged.now, result["now"])
+            merged.events += result["events"]
+            bits, packets, drops, max_wait = result["links"]
+            for link in np.flatnonzero(np.asarray(packets) + np.asarray(drops)).tolist():
+                merged.link_bits[link] += bits[link]
+                merged.link_packets[link] += packets[link]
+                merged.link_drops[link] += drops[link]
+                merged.link_max_wait[link] = max(merged.link_max_wait[link], max_wait[link])
+            for number, (sent, delivered, dropped, delay_sum) in result["flows"].items():
+                flow = merged.flows[number]
+                flow["sent"] += sent
+                flow["delivered"] += delivered
+                flow["dropped"] += dropped
+                flow["delay_sum"] += delay_sum
+            for number, (rtt_ms, lost) in result["probes"].items():
+                merged.probes[number]["rtt_ms"].extend(rtt_ms)
+                merged.probes[number]["lost"] += lost
+        return merged.results()
+
+
+def menu():
     print("\n=== Simulador de Rede ===")
     print("1. Visualizar Topologia")
     print("2. Exibir Tabelas de Roteamento")
@@ -588,7 +4223,347 @@ def config_menu():
     return choice
 
 
-if __name__ == "__main__":
+# --- Serviço Local de Sondas (asyncio) ---
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error"}
+
+
+class ProbeService:
+    """
+    Serviço HTTP local que mantém uma rede carregada em memória e responde a
+    consultas concorrentes sem pagar a inicialização a cada execução.
+
+    A rede fica em `network`, uma única tupla (grafo, IPs, hosts, rotas) com o
+    índice de caminhos já montado. Cada requisição lê a tupla uma vez, e
+    `reload` monta a rede nova em uma thread e só então troca a tupla, então
+    as consultas nunca misturam duas topologias. Nenhuma variável global é
+    usada. Rotas (GET, parâmetros na query string, respostas JSON):
+
+      /health                        hosts e geração da rede carregada
+      /probe?src=&dst=[&samples=&packet_size=&flow=]   mesmo resultado de `probe_pair`
+      /path?src=&dst=[&packet_size=&flow=]   rota e atraso de ida (ms)
+                                     (as duas respondem 404 se um host não existe)
+      /report/<links|connections|routes>[?layer=&media=]   JSONL em streaming
+      /plot[?detail=]                PNG da topologia (matplotlib só importado aqui)
+      POST /reload                   recarrega do arquivo ou do JSON do corpo
+    """
+
+    def __init__(self, config_file="network_config.json", snapshot_file=None):
+        self.config_file = config_file
+        self.snapshot_file = snapshot_file
+        self.network = None
+        self.generation = 0
+        self._reload_lock = None
+
+    def build(self, config=None):
+        """Monta a rede (da `config` ou do arquivo de configuração) com o índice de caminhos pronto."""
+        if config is None:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        if self.snapshot_file:
+            network = setup_network_cached(config, self.snapshot_file)
+        else:
+            network = setup_network_from_config(config)
+        get_path_index(network[0])
+        return network
+
+    async def reload(self, config=None):
+        """Monta a rede nova fora do loop e a troca atomicamente; retorna a nova geração."""
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            network = await asyncio.to_thread(self.build, config)
+            self.network = network
+            self.generation += 1
+            return self.generation
+
+    # --- Rotas ---
+
+    def _health(self, network, params):
+        return 200, {"status": "ok", "generation": self.generation, "hosts": len(network[2]),
+                     "nodes": network[0].number_of_nodes()}
+
+    def _probe(self, network, params):
+        G, addresses, _, _ = network
+        result = probe_pair(G, params["src"], params["dst"], int(params.get("samples", 3)),
+                            int(params.get("packet_size", 8000)), addresses=addresses,
+                            flow=int(params.get("flow", 0)))
+        # O único erro de `probe_pair` é host inexistente: 404, como em /path
+        return (404 if result["status"] == "error" else 200), result
+
+    def _path(self, network, params):
+        G = network[0]
+        src, dst = params["src"], params["dst"]
+        for host in (src, dst):
+            if host not in G.nodes:
+                return 404, {"status": "error", "error": f"Host '{host}' não existe na rede"}
+        index = get_path_index(G)
+        if not index.has_path(src, dst):
+            return 200, {"src": src, "dst": dst, "status": "unreachable"}
+        flow = int(params.get("flow", 0))
+        path = index.path(src, dst, flow)
+        return 200, {"src": src, "dst": dst, "status": "ok", "path": path, "hops": len(path) - 1,
+                     "delay_ms": index.path_delay(src, dst, int(params.get("packet_size", 8000)), flow)}
+
+    ROUTES = {"/health": _health, "/probe": _probe, "/path": _path}
+
+    async def _respond(self, writer, status, payload, content_type="application/json"):
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                     f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n\r\n".encode('latin-1')
+                     + payload)
+        await writer.drain()
+
+    async def _stream_report(self, writer, network, report, query):
+        G, addresses, _, tables = network
+        layers = [int(layer) for layer in query.get("layer", [])]
+        rows = report_rows(G, report, tables, layers, query.get("media"), addresses)
+        columns = _report_columns(report)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        while True:
+            lines = [encode(dict(zip(columns, row))) + "\n" for _, row in zip(range(1024), rows)]
+            if not lines:
+                break
+            chunk = "".join(lines).encode('utf-8')
+            writer.write(f"{len(chunk):x}\r\n".encode('latin-1') + chunk + b"\r\n")
+            # Cede o loop entre os blocos para não atrasar as outras consultas
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _dispatch(self, writer, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        params = {key: values[-1] for key, values in query.items()}
+        network = self.network
+
+        if url.path == "/reload":
+            if method != "POST":
+                return await self._respond(writer, 405, {"status": "error", "error": "Use POST"})
+            config = json.loads(body) if body.strip() else None
+            generation = await self.reload(config)
+            return await self._respond(writer, 200, {"status": "ok", "generation": generation,
+                                                     "hosts": len(self.network[2])})
+        if method != "GET":
+            return await self._respond(writer, 405, {"status": "error", "error": "Use GET"})
+        if url.path in self.ROUTES:
+            status, payload = self.ROUTES[url.path](self, network, params)
+            return await self._respond(writer, status, payload)
+        if url.path.startswith("/report/"):
+            return await self._stream_report(writer, network, url.path[len("/report/"):], query)
+        if url.path == "/plot":
+            image = io.BytesIO()
+            await asyncio.to_thread(plot_graph, network[0], image, params.get("detail", "auto"), network[1])
+            return await self._respond(writer, 200, image.getvalue(), "image/png")
+        return await self._respond(writer, 404, {"status": "error", "error": f"Rota desconhecida: {url.path}"})
+
+    async def handle(self, reader, writer):
+        """Atende uma conexão HTTP/1.1 (com keep-alive) até o cliente fechá-la."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3 or not headers.get("content-length", "0").isdigit():
+                    await self._respond(writer, 400, {"status": "error", "error": "Requisição HTTP malformada"})
+                    break
+                method, target, version = parts
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                try:
+                    await self._dispatch(writer, method, target, body)
+                except (KeyError, ValueError) as e:
+                    # Parâmetro ausente, número inválido, JSON ou relatório desconhecido
+                    await self._respond(writer, 400, {"status": "error", "error": f"Requisição inválida: {e}"})
+                except (OSError, TypeError) as e:
+                    await self._respond(writer, 500, {"status": "error", "error": str(e)})
+                if version != "HTTP/1.1" or headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address="127.0.0.1:8765", ready=None):
+        """
+        Carrega a rede e atende em `address` ("host:porta" ou caminho de um
+        socket Unix) até ser cancelado. `ready` é chamado com o servidor aberto.
+        """
+        await self.reload()
+        if ":" in address:
+            host, _, port = address.rpartition(":")
+            server = await asyncio.start_server(self.handle, host or None, int(port))
+        else:
+            server = await asyncio.start_unix_server(self.handle, address)
+        async with server:
+            if ready is not None:
+                ready(server)
+            await server.serve_forever()
+
+
+# --- Modo Batch (sem menu) ---
+
+def run_batch(G, jobs, output):
+    """
+    Executa jobs de sonda lidos de `jobs` (um JSON por linha) e grava um
+    resultado JSON por linha em `output` assim que cada job termina.
+
+    Cada job tem "src", "dst" e, opcionalmente, "samples", "packet_size"
+    (bits), "flow" (hash ECMP) e "id". Retorna o número de jobs que falharam.
+    """
+    failures = 0
+    for line_number, line in enumerate(jobs, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        job_id = line_number
+        try:
+            job = json.loads(line)
+            job_id = job.get("id", line_number)
+            result = probe_pair(G, job["src"], job["dst"],
+                                num_samples=int(job.get("samples", 3)),
+                                packet_size_bits=int(job.get("packet_size", 8000)),
+                                flow=int(job.get("flow", 0)))
+        except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as e:
+            result = {"status": "error", "error": f"Job inválido: {e}"}
+
+        if result["status"] == "error":
+            failures += 1
+        output.write(json.dumps({"job": job_id, **result}, ensure_ascii=False) + "\n")
+        output.flush()
+    return failures
+
+
+def _setup_from_file(config_file, snapshot_file=None):
+    """
+    Monta a rede (variáveis globais) a partir do arquivo, usando o snapshot
+    binário se informado; em caso de erro avisa no stderr e retorna False.
+    """
+    global graph, ip_addresses, hosts, routing_table
+
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if snapshot_file:
+            graph, ip_addresses, hosts, routing_table = setup_network_cached(config, snapshot_file)
+        else:
+            graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        print(f"✗ Erro ao carregar a configuração '{config_file}': {e}", file=sys.stderr)
+        return False
+    return True
+
+
+def batch_main(config_file, jobs_file, output_file, snapshot_file=None):
+    """Modo batch: monta a rede do arquivo de configuração e processa os jobs. Retorna o código de saída."""
+    if not _setup_from_file(config_file, snapshot_file):
+        return 2
+
+    with contextlib.ExitStack() as files:
+        try:
+            jobs = sys.stdin if jobs_file == "-" else files.enter_context(open(jobs_file, 'r', encoding='utf-8'))
+            output = sys.stdout if output_file == "-" else files.enter_context(open(output_file, 'w', encoding='utf-8'))
+        except OSError as e:
+            print(f"✗ Erro ao abrir arquivo: {e}", file=sys.stderr)
+            return 2
+        failures = run_batch(graph, jobs, output)
+
+    if failures:
+        print(f"✗ {failures} job(s) com erro.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def render_main(config_file, output_file, detail="auto", snapshot_file=None):
+    """Modo headless: monta a rede do arquivo de configuração e grava a imagem da topologia."""
+    if not _setup_from_file(config_file, snapshot_file):
+        return 2
+    try:
+        plot_graph(graph, output_file, detail)
+    except (OSError, ValueError) as e:
+        print(f"✗ Erro ao gravar '{output_file}': {e}", file=sys.stderr)
+        return 2
+    print(f"✓ Topologia gravada em '{output_file}'.")
+    return 0
+
+
+def export_main(config_file, report, output_file, fmt=None, layers=None, media=None, snapshot_file=None):
+    """Modo headless: monta a rede do arquivo de configuração e exporta um relatório."""
+    if not _setup_from_file(config_file, snapshot_file):
+        return 2
+    try:
+        count = export_report(graph, report, output_file, fmt, layers=layers, media=media)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"✗ Erro ao exportar '{report}': {e}", file=sys.stderr)
+        return 2
+    print(f"✓ {count} linha(s) de '{report}' exportada(s).", file=sys.stderr)
+    return 0
+
+
+def criticality_main(config_file, top=20, snapshot_file=None):
+    """Modo headless: monta a rede do arquivo de configuração e exibe o ranking de falha única."""
+    if not _setup_from_file(config_file, snapshot_file):
+        return 2
+    try:
+        report = failure_impact(graph, top=top or None)
+    except ValueError as e:
+        print(f"✗ Erro na análise de criticidade: {e}", file=sys.stderr)
+        return 2
+    display_failure_impact(report)
+    return 0
+
+
+def replay_main(config_file, trace_file, fmt=None, interval=1.0, snapshot_file=None):
+    """Modo headless: monta a rede do arquivo de configuração e reproduz um trace de tráfego."""
+    if not _setup_from_file(config_file, snapshot_file):
+        return 2
+    try:
+        report = replay_trace(graph, trace_file, fmt, interval)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError, ValueError) as e:
+        print(f"✗ Erro ao reproduzir '{trace_file}': {e}", file=sys.stderr)
+        return 2
+    display_trace_replay(report)
+    return 0
+
+
+def serve_main(config_file, address, snapshot_file=None):
+    """Modo serviço: mantém a rede em memória e atende consultas HTTP em `address`."""
+    service = ProbeService(config_file, snapshot_file)
+
+    def ready(server):
+        print(f"✓ Serviço de sondas atendendo em {address} ({len(service.network[2])} hosts). Ctrl+C encerra.",
+              file=sys.stderr)
+
+    try:
+        asyncio.run(service.serve(address, ready))
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        print(f"✗ Erro ao iniciar o serviço: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def interactive(profile_output=None):
+    """
+    Sessão interativa (menus no terminal).
+
+    Com `profile_output`, a primeira medição XProbe é executada sob o cProfile
+    e suas estatísticas são gravadas nesse arquivo.
+    """
+    global graph, ip_addresses, hosts, routing_table
+
     print("\n" + "=" * 50)
     print("  SIMULADOR DE REDE HIERÁRQUICA - XPROBE")
     print("=" * 50)
@@ -596,25 +4571,29 @@ if __name__ == "__main__":
     print("\n[Etapa 1] Iniciando o programa...")
     print("\n[Etapa 2] Importar/Definir Configuração da Rede")
 
-    config_choice = config_menu()
-
-    if config_choice == "1":
-        config = load_network_config()
-        graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
-        print(f"\n✓ Rede configurada a partir do arquivo.")
-    elif config_choice == "2":
-        graph, ip_addresses, hosts, routing_table = setup_network_random()
-        assign_connection_types(graph, hosts)
-        print(f"\n✓ Rede gerada aleatoriamente.")
-    elif config_choice == "3":
-        config = create_default_config()
-        graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
-        assign_connection_types(graph, hosts)
-        print(f"\n✓ Rede configurada com valores padrão e pronta para uso.")
-    else:
-        print("Opção inválida. Usando configuração aleatória.")
-        graph, ip_addresses, hosts, routing_table = setup_network_random()
-        assign_connection_types(graph, hosts)
+    while True:
+        config_choice = config_menu()
+        try:
+            if config_choice == "1":
+                config = load_network_config()
+                graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
+                print(f"\n✓ Rede configurada a partir do arquivo.")
+            elif config_choice == "2":
+                graph, ip_addresses, hosts, routing_table = setup_network_random()
+                assign_connection_types(graph, hosts)
+                print(f"\n✓ Rede gerada aleatoriamente.")
+            elif config_choice == "3":
+                config = create_default_config()
+                graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
+                assign_connection_types(graph, hosts)
+                print(f"\n✓ Rede configurada com valores padrão e pronta para uso.")
+            else:
+                print("Opção inválida. Usando configuração aleatória.")
+                graph, ip_addresses, hosts, routing_table = setup_network_random()
+                assign_connection_types(graph, hosts)
+            break
+        except ValueError as error:
+            print(f"✗ Configuração inválida: {error}")
 
     print(f"\nHosts Gerados: {hosts}")
     print(f"Total de hosts: {len(hosts)}")
@@ -638,30 +4617,109 @@ if __name__ == "__main__":
 
             if src_ip is not None and dst_ip is not None:
                 print("\n[Etapa 3] Executando Simulação XProbe/RTT...")
-                xprobe_rtt(graph, src, dst)
+                if profile_output:
+                    profile_xprobe(graph, src, dst, profile_output)
+                    profile_output = None
+                else:
+                    xprobe_rtt(graph, src, dst)
         elif choice == "6":
             print("\n[Etapa 2] Reconfigurar Rede")
             config_choice = config_menu()
 
-            if config_choice == "1":
-                config = load_network_config()
-                graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
-                print(f"\n✓ Rede reconfigurada a partir do arquivo.")
-            elif config_choice == "2":
-                graph, ip_addresses, hosts, routing_table = setup_network_random()
-                assign_connection_types(graph, hosts)
-                print(f"\n✓ Rede regenerada aleatoriamente.")
-            elif config_choice == "3":
-                config = create_default_config()
-                graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
-                print(f"\n✓ Rede reconfigurada com valores padrão e pronta para uso.")
-            else:
-                print("Opção inválida.")
+            try:
+                if config_choice == "1":
+                    config = load_network_config()
+                    graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
+                    print(f"\n✓ Rede reconfigurada a partir do arquivo.")
+                elif config_choice == "2":
+                    graph, ip_addresses, hosts, routing_table = setup_network_random()
+                    assign_connection_types(graph, hosts)
+                    print(f"\n✓ Rede regenerada aleatoriamente.")
+                elif config_choice == "3":
+                    config = create_default_config()
+                    graph, ip_addresses, hosts, routing_table = setup_network_from_config(config)
+                    print(f"\n✓ Rede reconfigurada com valores padrão e pronta para uso.")
+                else:
+                    print("Opção inválida.")
+            except ValueError as error:
+                print(f"✗ Configuração inválida: {error}. A rede atual foi mantida.")
 
             print(f"\nHosts Gerados: {hosts}")
             print(f"Total de hosts: {len(hosts)}")
         elif choice == "7":
+            stats = route_cache.stats()
+            print(f"Cache de rotas: {stats['hits']} acerto(s), {stats['misses']} falta(s), "
+                  f"{stats['entries']} entrada(s)")
             print("Saindo...")
             break
         else:
-            print("Opção inválida. Tente novamente.")
\ No newline at end of file
+            print("Opção inválida. Tente novamente.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de Rede Hierárquica - XProbe")
+    parser.add_argument("--batch", metavar="JOBS",
+                        help="executa sem menu os jobs de sonda do arquivo JSONL ('-' para stdin)")
+    parser.add_argument("--config", default="network_config.json",
+                        help="arquivo de configuração da rede usado no modo batch")
+    parser.add_argument("--output", default="-",
+                        help="arquivo JSONL de resultados do modo batch ('-' para stdout)")
+    parser.add_argument("--render", metavar="ARQUIVO",
+                        help="grava a topologia da --config em ARQUIVO (.png, .svg) sem abrir janela")
+    parser.add_argument("--detail", choices=["auto", "full", "summary"], default="auto",
+                        help="nível de detalhe do --render (summary agrupa os hosts de cada switch de borda)")
+    parser.add_argument("--snapshot", metavar="ARQUIVO",
+                        help="snapshot binário da rede: usado se corresponder à --config, senão regravado")
+    parser.add_argument("--export", choices=list(REPORT_COLUMNS),
+                        help="exporta o relatório da --config para --output (.csv, .jsonl, .parquet ou '-')")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="formato do --export ou do --replay (padrão: pelo sufixo do arquivo)")
+    parser.add_argument("--layer", type=int, action="append",
+                        help="exporta só enlaces/rotas desta camada (pode repetir)")
+    parser.add_argument("--media", choices=list(CONNECTION_NAMES), action="append",
+                        help="exporta só enlaces/rotas deste tipo de conexão (pode repetir)")
+    parser.add_argument("--criticality", metavar="N", type=int,
+                        help="ranking dos N enlaces e switches cuja falha isolada mais desconecta hosts (0 = todos)")
+    parser.add_argument("--replay", metavar="TRACE",
+                        help="reproduz um trace (timestamp, src, dst, bytes em .csv ou .jsonl, '-' = stdin) na rede da --config")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="intervalo em segundos da utilização por enlace do --replay (padrão: 1)")
+    parser.add_argument("--serve", metavar="ENDERECO",
+                        help="serviço HTTP local com a rede da --config em memória (host:porta ou socket Unix)")
+    parser.add_argument("--cache", metavar="ARQUIVO",
+                        help="cache de rotas persistente: carregado no início e gravado ao sair")
+    parser.add_argument("--cache-mb", type=float,
+                        help=f"limite de memória do cache de rotas em MB (padrão: {RESULT_CACHE_BYTES >> 20})")
+    parser.add_argument("--metrics", metavar="ARQUIVO",
+                        help="liga a instrumentação e grava as métricas ao sair (.json ou texto Prometheus)")
+    parser.add_argument("--profile", metavar="ARQUIVO",
+                        help="grava o perfil cProfile da primeira medição XProbe do modo interativo")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        enable_metrics(args.metrics)
+    if args.cache_mb is not None:
+        route_cache.max_bytes = int(args.cache_mb * 2 ** 20)
+    if args.cache:
+        route_cache.load(args.cache)
+        atexit.register(_save_route_cache, args.cache)
+
+    if args.batch is not None:
+        return batch_main(args.config, args.batch, args.output, args.snapshot)
+    if args.render is not None:
+        return render_main(args.config, args.render, args.detail, args.snapshot)
+    if args.criticality is not None:
+        return criticality_main(args.config, args.criticality, args.snapshot)
+    if args.replay is not None:
+        return replay_main(args.config, args.replay, args.format, args.interval, args.snapshot)
+    if args.serve is not None:
+        return serve_main(args.config, args.serve, args.snapshot)
+    if args.export is not None:
+        return export_main(args.config, args.export, args.output, args.format, args.layer, args.media, args.snapshot)
+
+    interactive(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())